@@ -1,23 +1,33 @@
 from bokeh.plotting import figure, output_file, show, save
 from bokeh.models import LinearColorMapper, BasicTicker, PrintfTickFormatter, ColorBar
 from bokeh.transform import transform, linear_cmap
-from bokeh.palettes import Viridis3, Viridis256, Inferno256
+from bokeh.palettes import Viridis3, Viridis256, Inferno256, Category20
 from bokeh.models import HoverTool
 from bokeh.models.widgets import Panel, Tabs
 from bokeh.models import Range1d
 import pandas as pd
+import numpy as np
 import holoviews as hv
 from holoviews import opts, dim, Palette
 hv.extension('bokeh')
 import panel as pn
 pn.extension()
 from bokeh.plotting import figure, ColumnDataSource
-from collections import deque
 from bokeh.layouts import row, column, gridplot, layout, grid
 import time
 from threading import Lock, Thread
 from rti_python.Ensemble import Ensemble
 from rti_python.Post_Process.Average.AverageWaterColumn import AverageWaterColumn
+from rti_python_plot.utils.ring_buffer import RecordRingBuffer
+from rti_python_plot.utils.ens_dispatcher import bad_velocity_mask
+
+
+# Line colors for each selected bin
+BIN_COLORS = ['navy', 'skyblue', 'orange'] + list(Category20[20])
+
+# Number of beams in the profile plots and the line color for each beam
+PROFILE_NUM_BEAMS = 4
+BEAM_COLORS = ['yellow', 'navy', 'skyblue', 'orange']
 
 
 class RtiBokehPlotData:
@@ -30,50 +40,41 @@ class RtiBokehPlotData:
 
         self.rti_config = rti_config
 
-        self.cds = ColumnDataSource(data=dict(date=[],
-                                              wave_height=[],
-                                              earth_east_1=[],
-                                              earth_east_2=[],
-                                              earth_east_3=[],
-                                              earth_north_1=[],
-                                              earth_north_2=[],
-                                              earth_north_3=[],
-                                              mag_1=[],
-                                              mag_2=[],
-                                              mag_3=[],
-                                              dir_1=[],
-                                              dir_2=[],
-                                              dir_3=[],
-                                              bin_num=[],
-                                              bin_depth=[],
-                                              amp_0=[],
-                                              amp_1=[],
-                                              amp_2=[],
-                                              amp_3=[]))
-
-        self.buffer_datetime = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_wave_height = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_range_track = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_earth_east_1 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_earth_east_2 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_earth_east_3 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_earth_north_1 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_earth_north_2 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_earth_north_3 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_mag_1 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_mag_2 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_mag_3 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_dir_1 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_dir_2 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_dir_3 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_dash_df = deque(maxlen=int(self.rti_config.config['Waves']['ENS_IN_BURST'])*2)
-        self.buffer_dash_ens = deque(maxlen=int(self.rti_config.config['Waves']['ENS_IN_BURST']) * 2)
-        self.buffer_bin_num = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_bin_depth = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_amp_0 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_amp_1 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_amp_2 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
-        self.buffer_amp_3 = deque(maxlen=int(self.rti_config.config['PLOT']['BUFF_SIZE']))
+        # Selected bins to plot
+        self.selected_bins = self.get_selected_bins()
+
+        # Column names for each selected bin
+        self.east_columns = ['earth_east_' + str(index + 1) for index in range(len(self.selected_bins))]
+        self.north_columns = ['earth_north_' + str(index + 1) for index in range(len(self.selected_bins))]
+        self.mag_columns = ['mag_' + str(index + 1) for index in range(len(self.selected_bins))]
+        self.dir_columns = ['dir_' + str(index + 1) for index in range(len(self.selected_bins))]
+
+        # Time series columns in the ColumnDataSource
+        self.ts_columns = ['wave_height', 'range_track'] + self.east_columns + self.north_columns + self.mag_columns + self.dir_columns
+
+        # Profile columns in the ColumnDataSource for the profile
+        self.profile_columns = ['bin_num', 'bin_depth'] + \
+                               ['amp_' + str(beam) for beam in range(PROFILE_NUM_BEAMS)] + \
+                               ['corr_' + str(beam) for beam in range(PROFILE_NUM_BEAMS)] + \
+                               ['beam_vel_' + str(beam) for beam in range(PROFILE_NUM_BEAMS)]
+
+        # Bin numbers and depths for the profile
+        # Cached for the (blank, bin_size, num_bins) configuration
+        self.bin_depth_config = None
+        self.profile_bin_nums = np.empty(0)
+        self.profile_bin_depths = np.empty(0)
+
+        self.cds = ColumnDataSource(data=self.get_empty_ts_data())
+        self.cds_profile = ColumnDataSource(data=self.get_empty_profile_data())
+
+        # Buffer the time series data until the plot is updated
+        # Each record has the date and all the time series columns
+        ts_dtype = [('date', 'datetime64[ms]')] + [(col, 'f8') for col in self.ts_columns]
+        self.ts_buffer = RecordRingBuffer(ts_dtype, int(self.rti_config.config['PLOT']['BUFF_SIZE']))
+
+        # Latest profile to display
+        # Only the latest profile is plotted, so it is replaced with each ensemble
+        self.latest_profile = None
 
         self.thread_lock = Lock()
 
@@ -81,6 +82,42 @@ class RtiBokehPlotData:
         if int(self.rti_config.config['PLOT']['MAX_POINTS']) > 0:
             self.max_points = int(self.rti_config.config['PLOT']['MAX_POINTS'])
 
+    def get_selected_bins(self) -> np.ndarray:
+        """
+        Get the bins selected to plot from the config.
+        If selected_bins is set in the Waves section, use the comma separated list
+        of bins.  Otherwise use selected_bin_1, selected_bin_2 and selected_bin_3.
+        :return: Array of the selected bin numbers.
+        """
+        waves_config = self.rti_config.config['Waves']
+
+        if waves_config.get('selected_bins', '').strip():
+            bins = [int(bin_num) for bin_num in waves_config['selected_bins'].split(',') if bin_num.strip()]
+        else:
+            bins = [int(waves_config['selected_bin_1']),
+                    int(waves_config['selected_bin_2']),
+                    int(waves_config['selected_bin_3'])]
+
+        return np.array(bins, dtype=np.intp)
+
+    def get_empty_ts_data(self) -> dict:
+        """
+        Create the empty time series data for the ColumnDataSource.
+        :return: Dictionary with an empty list for each time series column.
+        """
+        ts_data = dict(date=[])
+        for col in self.ts_columns:
+            ts_data[col] = []
+
+        return ts_data
+
+    def get_empty_profile_data(self) -> dict:
+        """
+        Create the empty profile data for the ColumnDataSource.
+        :return: Dictionary with an empty list for each profile column.
+        """
+        return {col: [] for col in self.profile_columns}
+
     def create_bokeh_plots(self):
         """
         Create the bokeh plot.
@@ -89,27 +126,8 @@ class RtiBokehPlotData:
         Create all the plots and use the ColumnDataSource for the data.
         :return:
         """
-        self.cds = ColumnDataSource(data=dict(date=[],
-                                              wave_height=[],
-                                              range_track=[],
-                                              earth_east_1=[],
-                                              earth_east_2=[],
-                                              earth_east_3=[],
-                                              earth_north_1=[],
-                                              earth_north_2=[],
-                                              earth_north_3=[],
-                                              mag_1=[],
-                                              mag_2=[],
-                                              mag_3=[],
-                                              dir_1=[],
-                                              dir_2=[],
-                                              dir_3=[],
-                                              bin_num=[],
-                                              bin_depth=[],
-                                              amp_0=[],
-                                              amp_1=[],
-                                              amp_2=[],
-                                              amp_3=[]))
+        self.cds = ColumnDataSource(data=self.get_empty_ts_data())
+        self.cds_profile = ColumnDataSource(data=self.get_empty_profile_data())
 
         # Specify the selection tools to be made available
         select_tools = ['box_select', 'lasso_select', 'poly_select', 'tap', 'reset', 'previewsave', 'pan', 'wheel_zoom', 'box_zoom', 'hover']
@@ -121,46 +139,37 @@ class RtiBokehPlotData:
             ('Range Tracking Height (m)', '@range_track'),
         ], formatters={'date': 'datetime'})
 
-        # Format the tooltip
-        tooltips_vel_east = HoverTool(tooltips=[
-            ('Time', '@date{%F %T}'),
-            ('Velocity (m/s) Bin 1', '@earth_east_1'),
-            ('Velocity (m/s) Bin 2', '@earth_east_2'),
-            ('Velocity (m/s) Bin 3', '@earth_east_3'),
-        ], formatters={'date': 'datetime'})
+        # Format the tooltip for each selected bin
+        tooltips_vel_east = HoverTool(tooltips=[('Time', '@date{%F %T}')] +
+                                      [('Velocity (m/s) Bin ' + str(bin_num), '@' + col) for bin_num, col in zip(self.selected_bins, self.east_columns)],
+                                      formatters={'date': 'datetime'})
 
-        # Format the tooltip
-        tooltips_vel_north = HoverTool(tooltips=[
-            ('Time', '@date{%F %T}'),
-            ('Velocity (m/s) Bin 1', '@earth_north_1'),
-            ('Velocity (m/s) Bin 2', '@earth_north_2'),
-            ('Velocity (m/s) Bin 3', '@earth_north_3'),
-        ], formatters={'date': 'datetime'})
+        # Format the tooltip for each selected bin
+        tooltips_vel_north = HoverTool(tooltips=[('Time', '@date{%F %T}')] +
+                                       [('Velocity (m/s) Bin ' + str(bin_num), '@' + col) for bin_num, col in zip(self.selected_bins, self.north_columns)],
+                                       formatters={'date': 'datetime'})
 
-        # Format the tooltip
-        tooltips_mag = HoverTool(tooltips=[
-            ('Time', '@date{%F %T}'),
-            ('Velocity (m/s) Bin 1', '@mag_1'),
-            ('Velocity (m/s) Bin 2', '@mag_2'),
-            ('Velocity (m/s) Bin 3', '@mag_3'),
-        ], formatters={'date': 'datetime'})
+        # Format the tooltip for each selected bin
+        tooltips_mag = HoverTool(tooltips=[('Time', '@date{%F %T}')] +
+                                 [('Velocity (m/s) Bin ' + str(bin_num), '@' + col) for bin_num, col in zip(self.selected_bins, self.mag_columns)],
+                                 formatters={'date': 'datetime'})
 
-        # Format the tooltip
-        tooltips_dir = HoverTool(tooltips=[
-            ('Time', '@date{%F %T}'),
-            ('Velocity (deg) Bin 1', '@dir_1'),
-            ('Velocity (deg) Bin 2', '@dir_2'),
-            ('Velocity (deg) Bin 3', '@dir_3'),
-        ], formatters={'date': 'datetime'})
+        # Format the tooltip for each selected bin
+        tooltips_dir = HoverTool(tooltips=[('Time', '@date{%F %T}')] +
+                                 [('Velocity (deg) Bin ' + str(bin_num), '@' + col) for bin_num, col in zip(self.selected_bins, self.dir_columns)],
+                                 formatters={'date': 'datetime'})
 
         # Format the tooltip Amplitude
-        tooltips_amp = HoverTool(tooltips=[
-            ('Bin', '@bin_num'),
-            ('Bin Depth (m)', '@bin_depth'),
-            ('Beam 0 (dB)', '@amp_0'),
-            ('Beam 1 (dB)', '@amp_1'),
-            ('Beam 2 (dB)', '@amp_2'),
-            ('Beam 3 (dB)', '@amp_3')])
+        tooltips_amp = HoverTool(tooltips=[('Bin', '@bin_num'), ('Bin Depth (m)', '@bin_depth')] +
+                                 [('Beam ' + str(beam) + ' (dB)', '@amp_' + str(beam)) for beam in range(PROFILE_NUM_BEAMS)])
+
+        # Format the tooltip Correlation
+        tooltips_corr = HoverTool(tooltips=[('Bin', '@bin_num'), ('Bin Depth (m)', '@bin_depth')] +
+                                  [('Beam ' + str(beam), '@corr_' + str(beam)) for beam in range(PROFILE_NUM_BEAMS)])
+
+        # Format the tooltip Beam Velocity
+        tooltips_beam_vel = HoverTool(tooltips=[('Bin', '@bin_num'), ('Bin Depth (m)', '@bin_depth')] +
+                                      [('Beam ' + str(beam) + ' (m/s)', '@beam_vel_' + str(beam)) for beam in range(PROFILE_NUM_BEAMS)])
 
         max_display = 200
 
@@ -172,54 +181,89 @@ class RtiBokehPlotData:
         self.line_wave_height = self.plot_range.line(x='date', y='wave_height', line_width=2, legend="Pressure", source=self.cds, color='navy', name="wave_height")
         self.line_range_track = self.plot_range.line(x='date', y='range_track', line_width=2, legend="Range Track", source=self.cds, color='orange', name="range track")
 
-        legend_bin_1 = "Bin" + self.rti_config.config['Waves']['selected_bin_1']
-        legend_bin_2 = "Bin" + self.rti_config.config['Waves']['selected_bin_2']
-        legend_bin_3 = "Bin" + self.rti_config.config['Waves']['selected_bin_3']
-
         self.plot_earth_east = figure(x_axis_type='datetime', title="Earth Velocity East")
         self.plot_earth_east.x_range.follow_interval = max_display
         self.plot_earth_east.xaxis.axis_label = "Time"
         self.plot_earth_east.yaxis.axis_label = "Velocity (m/s)"
         self.plot_earth_east.add_tools(tooltips_vel_east)
-        self.line_east_1 = self.plot_earth_east.line(x='date', y='earth_east_1', line_width=2, source=self.cds, legend=legend_bin_1, color='navy', name="east_1")
-        self.line_east_2 = self.plot_earth_east.line(x='date', y='earth_east_2', line_width=2, source=self.cds, legend=legend_bin_2, color='skyblue', name="east_2")
-        self.line_east_3 = self.plot_earth_east.line(x='date', y='earth_east_3', line_width=2, source=self.cds, legend=legend_bin_3, color='orange', name="east_3")
+        self.lines_east = self.create_bin_lines(self.plot_earth_east, self.east_columns)
 
         self.plot_earth_north = figure(x_axis_type='datetime', title="Earth Velocity North")
         self.plot_earth_north.x_range.follow_interval = max_display
         self.plot_earth_north.xaxis.axis_label = "Time"
         self.plot_earth_north.yaxis.axis_label = "Velocity (m/s)"
         self.plot_earth_north.add_tools(tooltips_vel_north)
-        self.line_north_1 = self.plot_earth_north.line(x='date', y='earth_north_1', line_width=2, source=self.cds, legend=legend_bin_1, color='navy', name="north_1")
-        self.line_north_2 = self.plot_earth_north.line(x='date', y='earth_north_2', line_width=2, source=self.cds, legend=legend_bin_2, color='skyblue', name="north_2")
-        self.line_north_3 = self.plot_earth_north.line(x='date', y='earth_north_3', line_width=2, source=self.cds, legend=legend_bin_3, color='orange', name="north_3")
+        self.lines_north = self.create_bin_lines(self.plot_earth_north, self.north_columns)
 
         self.plot_mag = figure(x_axis_type='datetime', title="Water Velocity")
         self.plot_mag.x_range.follow_interval = max_display
         self.plot_mag.xaxis.axis_label = "Time"
         self.plot_mag.yaxis.axis_label = "Velocity (m/s)"
         self.plot_mag.add_tools(tooltips_mag)
-        self.line_mag_1 = self.plot_mag.line(x='date', y='mag_1', line_width=2, source=self.cds, legend=legend_bin_1, color='navy', name="mag_1")
-        self.line_mag_2 = self.plot_mag.line(x='date', y='mag_2', line_width=2, source=self.cds, legend=legend_bin_2, color='skyblue', name="mag_2")
-        self.line_mag_3 = self.plot_mag.line(x='date', y='mag_3', line_width=2, source=self.cds, legend=legend_bin_3, color='orange', name="mag_3")
+        self.lines_mag = self.create_bin_lines(self.plot_mag, self.mag_columns)
 
         self.plot_dir = figure(x_axis_type='datetime', title="Water Direction")
         self.plot_dir.x_range.follow_interval = max_display
         self.plot_dir.xaxis.axis_label = "Time"
         self.plot_dir.yaxis.axis_label = "Direction (degrees)"
         self.plot_dir.add_tools(tooltips_dir)
-        self.line_dir_1 = self.plot_dir.line(x='date', y='dir_1', line_width=2, source=self.cds, legend=legend_bin_1, color='navy', name="dir_1")
-        self.line_dir_2 = self.plot_dir.line(x='date', y='dir_2', line_width=2, source=self.cds, legend=legend_bin_2, color='skyblue', name="dir_2")
-        self.line_dir_3 = self.plot_dir.line(x='date', y='dir_3', line_width=2, source=self.cds, legend=legend_bin_3, color='orange', name="dir_3")
+        self.lines_dir = self.create_bin_lines(self.plot_dir, self.dir_columns)
 
         self.plot_amp = figure(title="Amplitude")
         self.plot_amp.xaxis.axis_label = "dB"
         self.plot_amp.yaxis.axis_label = "Bin"
         self.plot_amp.add_tools(tooltips_amp)
-        self.line_amp_0 = self.plot_amp.line(x='bin_num', y='amp_0', line_width=2, source=self.cds, legend="Beam 0", color='yellow', name="amp_0")
-        self.line_amp_1 = self.plot_amp.line(x='bin_num', y='amp_1', line_width=2, source=self.cds, legend="Beam 1", color='navy', name="amp_1")
-        self.line_amp_2 = self.plot_amp.line(x='bin_num', y='amp_2', line_width=2, source=self.cds, legend="Beam 2", color='skyblue', name="amp_2")
-        self.line_amp_3 = self.plot_amp.line(x='bin_num', y='amp_3', line_width=2, source=self.cds, legend="Beam 3", color='orange', name="amp_3")
+        self.lines_amp = self.create_beam_lines(self.plot_amp, 'amp_')
+
+        self.plot_corr = figure(title="Correlation")
+        self.plot_corr.xaxis.axis_label = "Correlation"
+        self.plot_corr.yaxis.axis_label = "Bin"
+        self.plot_corr.add_tools(tooltips_corr)
+        self.lines_corr = self.create_beam_lines(self.plot_corr, 'corr_')
+
+        self.plot_beam_vel = figure(title="Beam Velocity")
+        self.plot_beam_vel.xaxis.axis_label = "Velocity (m/s)"
+        self.plot_beam_vel.yaxis.axis_label = "Bin"
+        self.plot_beam_vel.add_tools(tooltips_beam_vel)
+        self.lines_beam_vel = self.create_beam_lines(self.plot_beam_vel, 'beam_vel_')
+
+    def create_beam_lines(self, plot, prefix: str) -> list:
+        """
+        Create a profile line in the plot for each beam.
+        :param plot: Figure to add the lines to.
+        :param prefix: Prefix of the profile column.  The beam number is added to the prefix.
+        :return: List of the lines created.
+        """
+        lines = []
+        for beam in range(PROFILE_NUM_BEAMS):
+            lines.append(plot.line(x='bin_num',
+                                   y=prefix + str(beam),
+                                   line_width=2,
+                                   source=self.cds_profile,
+                                   legend="Beam " + str(beam),
+                                   color=BEAM_COLORS[beam],
+                                   name=prefix + str(beam)))
+
+        return lines
+
+    def create_bin_lines(self, plot, columns: list) -> list:
+        """
+        Create a line in the plot for each selected bin.
+        :param plot: Figure to add the lines to.
+        :param columns: Column in the ColumnDataSource for each selected bin.
+        :return: List of the lines created.
+        """
+        lines = []
+        for index, (bin_num, col) in enumerate(zip(self.selected_bins, columns)):
+            lines.append(plot.line(x='date',
+                                   y=col,
+                                   line_width=2,
+                                   source=self.cds,
+                                   legend="Bin" + str(bin_num),
+                                   color=BIN_COLORS[index % len(BIN_COLORS)],
+                                   name=col))
+
+        return lines
 
     def setup_bokeh_server(self, doc):
         """
@@ -242,7 +286,7 @@ class RtiBokehPlotData:
         ], sizing_mode='stretch_both')
 
         plot_layout_profile = layout([
-            [self.plot_amp]
+            [self.plot_amp, self.plot_corr, self.plot_beam_vel]
         ], sizing_mode='stretch_both')
 
         # Create tabs
@@ -264,9 +308,9 @@ class RtiBokehPlotData:
         Update the plot with live data.
         This will be called by the bokeh callback.
 
-        Take all the data from the buffers and populate
-        the ColumnDataSource.  All the lists in the ColumnDataSource
-        must have the same size.
+        Take all the new records from the ring buffer and populate
+        the ColumnDataSource.  Each record has a value for every column,
+        so all the columns in the ColumnDataSource have the same size.
 
         Call Stream to update the plot.  This will append the latest data
         to the plot.
@@ -278,100 +322,119 @@ class RtiBokehPlotData:
         #t = time.process_time()
         with self.thread_lock:
 
-            # Verify that a least one complete dataset has been received
-            if len(self.buffer_datetime) > 0 and len(self.buffer_wave_height) > 0 and len(self.buffer_range_track) > 0 and len(self.buffer_earth_east_1) > 0 and len(self.buffer_earth_east_2) > 0 and len(self.buffer_earth_east_3) > 0 and len(self.buffer_earth_north_1) > 0 and len(self.buffer_earth_north_2) > 0 and len(self.buffer_earth_north_3) > 0 and len(self.buffer_mag_1) > 0 and len(self.buffer_mag_2) > 0 and len(self.buffer_mag_3) > 0 and len(self.buffer_dir_1) > 0 and len(self.buffer_dir_2) > 0 and len(self.buffer_dir_3) > 0:
-
-                date_list = []
-                wave_height_list = []
-                range_track_list = []
-                earth_east_1 = []
-                earth_east_2 = []
-                earth_east_3 = []
-                earth_north_1 = []
-                earth_north_2 = []
-                earth_north_3 = []
-                mag_1 = []
-                mag_2 = []
-                mag_3 = []
-                dir_1 = []
-                dir_2 = []
-                dir_3 = []
-                bin_num = []
-                bin_depth = []
-                amp_0 = []
-                amp_1 = []
-                amp_2 = []
-                amp_3 = []
-
-                while self.buffer_datetime:
-                    date_list.append(self.buffer_datetime.popleft())
-                while self.buffer_wave_height:
-                    wave_height_list.append(self.buffer_wave_height.popleft())
-                while self.buffer_range_track:
-                    range_track_list.append(self.buffer_range_track.popleft())
-                while self.buffer_earth_east_1:
-                    earth_east_1.append(self.buffer_earth_east_1.popleft())
-                while self.buffer_earth_east_2:
-                    earth_east_2.append(self.buffer_earth_east_2.popleft())
-                while self.buffer_earth_east_3:
-                    earth_east_3.append(self.buffer_earth_east_3.popleft())
-                while self.buffer_earth_north_1:
-                    earth_north_1.append(self.buffer_earth_north_1.popleft())
-                while self.buffer_earth_north_2:
-                    earth_north_2.append(self.buffer_earth_north_2.popleft())
-                while self.buffer_earth_north_3:
-                    earth_north_3.append(self.buffer_earth_north_3.popleft())
-                while self.buffer_mag_1:
-                    mag_1.append(self.buffer_mag_1.popleft())
-                while self.buffer_mag_2:
-                    mag_2.append(self.buffer_mag_2.popleft())
-                while self.buffer_mag_3:
-                    mag_3.append(self.buffer_mag_3.popleft())
-                while self.buffer_dir_1:
-                    dir_1.append(self.buffer_dir_1.popleft())
-                while self.buffer_dir_2:
-                    dir_2.append(self.buffer_dir_2.popleft())
-                while self.buffer_dir_3:
-                    dir_3.append(self.buffer_dir_3.popleft())
-                while self.buffer_bin_num:
-                    bin_num.append(self.buffer_bin_num.popleft())
-                while self.buffer_bin_depth:
-                    bin_depth.append(self.buffer_bin_depth.popleft())
-                while self.buffer_amp_0:
-                    amp_0.append(self.buffer_amp_0.popleft())
-                while self.buffer_amp_1:
-                    amp_1.append(self.buffer_amp_1.popleft())
-                while self.buffer_amp_2:
-                    amp_2.append(self.buffer_amp_2.popleft())
-                while self.buffer_amp_3:
-                    amp_3.append(self.buffer_amp_3.popleft())
-
-                # Set the new data
-                new_data = {'date': date_list,
-                            'wave_height': wave_height_list,
-                            'range_track': range_track_list,
-                            'earth_east_1': earth_east_1,
-                            'earth_east_2': earth_east_2,
-                            'earth_east_3': earth_east_3,
-                            'earth_north_1': earth_north_1,
-                            'earth_north_2': earth_north_2,
-                            'earth_north_3': earth_north_3,
-                            'mag_1': mag_1,
-                            'mag_2': mag_2,
-                            'mag_3': mag_3,
-                            'dir_1': dir_1,
-                            'dir_2': dir_2,
-                            'dir_3': dir_3,
-                            'bin_num': bin_num,
-                            'bin_depth': bin_depth,
-                            'amp_0': amp_0,
-                            'amp_1': amp_1,
-                            'amp_2': amp_2,
-                            'amp_3': amp_3}
-
-                self.cds.stream(new_data, rollover=self.max_points)
+            # Stream all the new time series data
+            # Each column is a contiguous array
+            if len(self.ts_buffer) > 0:
+                self.cds.stream(self.ts_buffer.read(), rollover=self.max_points)
+
+            # Replace the profile with the latest profile
+            if self.latest_profile:
+                self.cds_profile.data = self.latest_profile
+                self.latest_profile = None
         #print("Update Plot: " + str(time.process_time() - t))
 
+    def add_selected_bins(self, ts_row: dict, earth_vel, mag, direction):
+        """
+        Add the Earth Velocity East and North, Magnitude and Direction for all the
+        selected bins to the time series values.  All the bins are gathered with a
+        single index into each array.  Bins that do not exist and bad velocity
+        values are set to 0.0.
+        :param ts_row: Time series values to add the data to.
+        :param earth_vel: Earth Velocity data [bin][beam].
+        :param mag: Magnitude data [bin].
+        :param direction: Direction data [bin].
+        """
+        earth_vel = RtiBokehPlotData.to_float_matrix(earth_vel, 2)
+
+        ts_row.update(zip(self.east_columns, self.gather_selected_bins(earth_vel[:, 0])))
+        ts_row.update(zip(self.north_columns, self.gather_selected_bins(earth_vel[:, 1])))
+        ts_row.update(zip(self.mag_columns, self.gather_selected_bins(np.asarray(mag, dtype=np.float64).ravel())))
+        ts_row.update(zip(self.dir_columns, self.gather_selected_bins(np.asarray(direction, dtype=np.float64).ravel())))
+
+    def gather_selected_bins(self, values: np.ndarray) -> np.ndarray:
+        """
+        Get the values for all the selected bins.
+        :param values: Value for each bin.
+        :return: Value for each selected bin.  Missing bins and bad velocity are 0.0.
+        """
+        selected_values = np.zeros(len(self.selected_bins))
+
+        # Only index the bins that exist
+        valid = (self.selected_bins >= 0) & (self.selected_bins < len(values))
+        selected_values[valid] = values[self.selected_bins[valid]]
+
+        # Replace bad velocity
+        selected_values[bad_velocity_mask(selected_values)] = 0.0
+
+        return selected_values
+
+    @staticmethod
+    def to_float_matrix(values, min_cols: int) -> np.ndarray:
+        """
+        Convert the [bin][beam] list to a 2D float array.  If the rows do not all have
+        the same number of beams, the missing values are NaN.
+        :param values: List of lists of values.
+        :param min_cols: Minimum number of columns in the array.
+        :return: 2D float array.
+        """
+        try:
+            matrix = np.asarray(values, dtype=np.float64)
+        except ValueError:
+            matrix = None
+
+        if matrix is not None and matrix.ndim == 2 and matrix.shape[1] >= min_cols:
+            return matrix
+
+        # Fill the rows individually
+        num_cols = max([min_cols] + [len(row) for row in values])
+        matrix = np.full((len(values), num_cols), np.nan)
+        for index, row in enumerate(values):
+            matrix[index, :len(row)] = row
+
+        return matrix
+
+    def get_bin_depths(self, blank: float, bin_size: float, num_bins: int):
+        """
+        Get the bin numbers and bin depths for the profile.  The arrays are only
+        recalculated when the configuration changes.
+        :param blank: Blank distance (first bin range).
+        :param bin_size: Bin size.
+        :param num_bins: Number of bins.
+        :return: Array of bin numbers and array of bin depths.
+        """
+        bin_depth_config = (blank, bin_size, num_bins)
+        if bin_depth_config != self.bin_depth_config:
+            self.profile_bin_nums = np.arange(num_bins)
+            self.profile_bin_depths = blank + (self.profile_bin_nums * bin_size)
+            self.bin_depth_config = bin_depth_config
+
+        return self.profile_bin_nums, self.profile_bin_depths
+
+    def get_beam_profile(self, prefix: str, values, num_bins: int, replace_bad_vel: bool = False) -> dict:
+        """
+        Get a profile column for each beam from the [bin][beam] data.
+        Each column is a slice of the profile matrix.  Missing bins and
+        beams are NaN.
+        :param prefix: Prefix of the profile column.  The beam number is added to the prefix.
+        :param values: Data [bin][beam].
+        :param num_bins: Number of bins in the profile.
+        :param replace_bad_vel: Replace the bad velocity values with NaN.
+        :return: Dictionary of column name to array of values.
+        """
+        # Store each beam as a row so each column is contiguous
+        profile = np.full((PROFILE_NUM_BEAMS, num_bins), np.nan)
+
+        if len(values) > 0:
+            matrix = RtiBokehPlotData.to_float_matrix(values, 1)
+            num_rows = min(num_bins, matrix.shape[0])
+            num_beams = min(PROFILE_NUM_BEAMS, matrix.shape[1])
+            profile[:num_beams, :num_rows] = matrix[:num_rows, :num_beams].T
+
+        if replace_bad_vel:
+            profile[bad_velocity_mask(profile)] = np.nan
+
+        return {prefix + str(beam): profile[beam] for beam in range(PROFILE_NUM_BEAMS)}
+
     def process_ens_group(self, fourbeam_ens, vert_ens):
         """
         Add the Ensemble group to the plot buffers.
@@ -388,19 +451,17 @@ class RtiBokehPlotData:
         #t = time.process_time()
         with self.thread_lock:
 
-            # Selected bins
-            bin_1 = int(self.rti_config.config['Waves']['selected_bin_1'])
-            bin_2 = int(self.rti_config.config['Waves']['selected_bin_2'])
-            bin_3 = int(self.rti_config.config['Waves']['selected_bin_3'])
+            # Time series values for this group
+            ts_row = dict()
 
             # Vertical beam data
             if vert_ens:
                 if vert_ens.IsAncillaryData:
-                    self.buffer_wave_height.append(vert_ens.AncillaryData.TransducerDepth)  # Xdcr Depth
+                    ts_row['wave_height'] = vert_ens.AncillaryData.TransducerDepth  # Xdcr Depth
                 if vert_ens.IsEnsembleData:
-                    self.buffer_datetime.append(vert_ens.EnsembleData.datetime())           # Datetime
+                    ts_row['date'] = vert_ens.EnsembleData.datetime()           # Datetime
                 if vert_ens.IsRangeTracking:
-                    self.buffer_range_track.append(vert_ens.RangeTracking.avg_range())      # Range Tracking
+                    ts_row['range_track'] = vert_ens.RangeTracking.avg_range()      # Range Tracking
 
             # 4 Beam data
             if fourbeam_ens:
@@ -408,125 +469,57 @@ class RtiBokehPlotData:
                 # Check if no vertical beam exists
                 if not vert_ens:
                     if fourbeam_ens.IsAncillaryData:
-                        self.buffer_wave_height.append(fourbeam_ens.AncillaryData.TransducerDepth)  # Xdcr Depth
+                        ts_row['wave_height'] = fourbeam_ens.AncillaryData.TransducerDepth  # Xdcr Depth
 
                     if fourbeam_ens.IsEnsembleData:
-                        self.buffer_datetime.append(fourbeam_ens.EnsembleData.datetime())           # Datetime
+                        ts_row['date'] = fourbeam_ens.EnsembleData.datetime()           # Datetime
                     if fourbeam_ens.IsRangeTracking:
-                        self.buffer_range_track.append(fourbeam_ens.RangeTracking.avg_range())      # Range Tracking
+                        ts_row['range_track'] = fourbeam_ens.RangeTracking.avg_range()      # Range Tracking
                     # No Ancillary Pressure data but there is range tracking data, use Range Tracking
                     if not fourbeam_ens.IsAncillaryData and fourbeam_ens.IsRangeTracking:
-                        self.buffer_range_track.append(fourbeam_ens.RangeTracking.avg_range())  # Range Tracking
+                        ts_row['range_track'] = fourbeam_ens.RangeTracking.avg_range()  # Range Tracking
                     # If no Range Tracking, but Ancillary Data Pressure exist, use Pressure data
                     if not fourbeam_ens.IsRangeTracking and fourbeam_ens.IsAncillaryData:
-                        self.buffer_wave_height.append(fourbeam_ens.AncillaryData.TransducerDepth)  # Xdcr Depth
+                        ts_row['wave_height'] = fourbeam_ens.AncillaryData.TransducerDepth  # Xdcr Depth
 
                 if fourbeam_ens.IsAncillaryData and fourbeam_ens.IsEnsembleData and fourbeam_ens.IsAmplitude:
                     # Set the Bin Num and Bin Depth
                     num_bins = fourbeam_ens.EnsembleData.NumBins
-                    bin_size = fourbeam_ens.AncillaryData.BinSize
-                    blank = fourbeam_ens.AncillaryData.FirstBinRange
-
-                    bin_nums = []
-                    bin_depths = []
-                    amp_0 = []
-                    amp_1 = []
-                    amp_2 = []
-                    amp_3 = []
-
-                    for bin_num in range(num_bins):
-                        bin_nums.append(bin_num)
-                        bin_depths.append(blank + (bin_num * bin_size))
-
-                        if fourbeam_ens.Amplitude.num_elements > 0:
-                            amp_0.append(fourbeam_ens.Amplitude.Amplitude[bin_num][0])
-                        if fourbeam_ens.Amplitude.num_elements > 1:
-                            amp_1.append(fourbeam_ens.Amplitude.Amplitude[bin_num][1])
-                        if fourbeam_ens.Amplitude.num_elements > 2:
-                            amp_2.append(fourbeam_ens.Amplitude.Amplitude[bin_num][2])
-                        if fourbeam_ens.Amplitude.num_elements > 3:
-                            amp_3.append(fourbeam_ens.Amplitude.Amplitude[bin_num][3])
-
-                    # Set the buffer
-                    self.buffer_bin_num.append(bin_nums)
-                    self.buffer_bin_depth.append(bin_depths)
-                    self.buffer_amp_0.append(amp_0)
-                    self.buffer_amp_1.append(amp_1)
-                    self.buffer_amp_2.append(amp_2)
-                    self.buffer_amp_3.append(amp_3)
-
-                if fourbeam_ens.IsEarthVelocity:
-                    # East Bin 1
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Velocities[bin_1][0]):
-                        self.buffer_earth_east_1.append(fourbeam_ens.EarthVelocity.Velocities[bin_1][0])
-                    else:
-                        self.buffer_earth_east_1.append(0.0)
-
-                    # East Bin 2
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Velocities[bin_2][0]):
-                        self.buffer_earth_east_2.append(fourbeam_ens.EarthVelocity.Velocities[bin_2][0])
-                    else:
-                        self.buffer_earth_east_2.append(0.0)
-
-                    # East Bin 3
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Velocities[bin_3][0]):
-                        self.buffer_earth_east_3.append(fourbeam_ens.EarthVelocity.Velocities[bin_3][0])
-                    else:
-                        self.buffer_earth_east_3.append(0.0)
-
-                    # North Bin 1
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Velocities[bin_1][1]):
-                        self.buffer_earth_north_1.append(fourbeam_ens.EarthVelocity.Velocities[bin_1][1])
-                    else:
-                        self.buffer_earth_north_1.append(0.0)
+                    bin_nums, bin_depths = self.get_bin_depths(fourbeam_ens.AncillaryData.FirstBinRange,
+                                                               fourbeam_ens.AncillaryData.BinSize,
+                                                               num_bins)
 
-                    # North Bin 2
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Velocities[bin_2][1]):
-                        self.buffer_earth_north_2.append(fourbeam_ens.EarthVelocity.Velocities[bin_2][1])
-                    else:
-                        self.buffer_earth_north_2.append(0.0)
-
-                    # North Bin 3
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Velocities[bin_3][1]):
-                        self.buffer_earth_north_3.append(fourbeam_ens.EarthVelocity.Velocities[bin_3][1])
-                    else:
-                        self.buffer_earth_north_3.append(0.0)
+                    profile = {'bin_num': bin_nums, 'bin_depth': bin_depths}
 
-                    # Mag 1
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Magnitude[bin_1]):
-                        self.buffer_mag_1.append(fourbeam_ens.EarthVelocity.Magnitude[bin_1])
-                    else:
-                        self.buffer_mag_1.append(0.0)
+                    # Amplitude
+                    profile.update(self.get_beam_profile('amp_', fourbeam_ens.Amplitude.Amplitude, num_bins))
 
-                    # Mag 2
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Magnitude[bin_2]):
-                        self.buffer_mag_2.append(fourbeam_ens.EarthVelocity.Magnitude[bin_2])
+                    # Correlation
+                    if fourbeam_ens.IsCorrelation:
+                        profile.update(self.get_beam_profile('corr_', fourbeam_ens.Correlation.Correlation, num_bins))
                     else:
-                        self.buffer_mag_2.append(0.0)
+                        profile.update(self.get_beam_profile('corr_', [], num_bins))
 
-                    # Mag 3
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Magnitude[bin_3]):
-                        self.buffer_mag_3.append(fourbeam_ens.EarthVelocity.Magnitude[bin_3])
+                    # Beam Velocity
+                    if fourbeam_ens.IsBeamVelocity:
+                        profile.update(self.get_beam_profile('beam_vel_', fourbeam_ens.BeamVelocity.Velocities, num_bins, True))
                     else:
-                        self.buffer_mag_3.append(0.0)
+                        profile.update(self.get_beam_profile('beam_vel_', [], num_bins))
 
-                    # Dir 1
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Direction[bin_1]):
-                        self.buffer_dir_1.append(fourbeam_ens.EarthVelocity.Direction[bin_1])
-                    else:
-                        self.buffer_dir_1.append(0.0)
+                    # Set the latest profile
+                    self.latest_profile = profile
 
-                    # Dir 2
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Direction[bin_2]):
-                        self.buffer_dir_2.append(fourbeam_ens.EarthVelocity.Direction[bin_2])
-                    else:
-                        self.buffer_dir_2.append(0.0)
+                if fourbeam_ens.IsEarthVelocity:
+                    # Add the selected bins
+                    self.add_selected_bins(ts_row,
+                                           fourbeam_ens.EarthVelocity.Velocities,
+                                           fourbeam_ens.EarthVelocity.Magnitude,
+                                           fourbeam_ens.EarthVelocity.Direction)
 
-                    # Dir 3
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_ens.EarthVelocity.Direction[bin_3]):
-                        self.buffer_dir_3.append(fourbeam_ens.EarthVelocity.Direction[bin_3])
-                    else:
-                        self.buffer_dir_3.append(0.0)
+            # Add the values as a single record
+            # A record is only useful with a date to plot against
+            if 'date' in ts_row:
+                self.ts_buffer.append(ts_row)
 
         #print("Process ENS: " + str(time.process_time() - t))
 
@@ -548,23 +541,21 @@ class RtiBokehPlotData:
         #t = time.process_time()
         with self.thread_lock:
 
-            # Selected bins
-            bin_1 = int(self.rti_config.config['Waves']['selected_bin_1'])
-            bin_2 = int(self.rti_config.config['Waves']['selected_bin_2'])
-            bin_3 = int(self.rti_config.config['Waves']['selected_bin_3'])
+            # Time series values for this group
+            ts_row = dict()
 
             if vert_awc:
                 # Datetime
                 if vert_awc[AverageWaterColumn.INDEX_LAST_TIME]:
-                    self.buffer_datetime.append(vert_awc[AverageWaterColumn.INDEX_LAST_TIME])                # Should only be 1 value
+                    ts_row['date'] = vert_awc[AverageWaterColumn.INDEX_LAST_TIME]                # Should only be 1 value
 
                 # Xdcr Depth
                 if vert_awc[AverageWaterColumn.INDEX_XDCR_DEPTH] and len(vert_awc[AverageWaterColumn.INDEX_XDCR_DEPTH]) > 0:
-                    self.buffer_wave_height.append(vert_awc[AverageWaterColumn.INDEX_XDCR_DEPTH][-1])        # Should only be 1 value
+                    ts_row['wave_height'] = vert_awc[AverageWaterColumn.INDEX_XDCR_DEPTH][-1]        # Should only be 1 value
 
                 # Range Tracking
                 if vert_awc[AverageWaterColumn.INDEX_RANGE_TRACK] and len(vert_awc[AverageWaterColumn.INDEX_RANGE_TRACK]) > 0:
-                    self.buffer_range_track.append(vert_awc[AverageWaterColumn.INDEX_RANGE_TRACK][-1])       # Should only be 1 beam
+                    ts_row['range_track'] = vert_awc[AverageWaterColumn.INDEX_RANGE_TRACK][-1]       # Should only be 1 beam
 
             # 4 Beam data
             if fourbeam_awc:
@@ -573,123 +564,26 @@ class RtiBokehPlotData:
                 if not vert_awc:
                     # Datetime
                     if fourbeam_awc[AverageWaterColumn.INDEX_LAST_TIME]:
-                        self.buffer_datetime.append(fourbeam_awc[AverageWaterColumn.INDEX_LAST_TIME])  # Should only be 1 value
+                        ts_row['date'] = fourbeam_awc[AverageWaterColumn.INDEX_LAST_TIME]  # Should only be 1 value
 
                     # Xdcr Depth
                     if fourbeam_awc[AverageWaterColumn.INDEX_XDCR_DEPTH] and len(fourbeam_awc[AverageWaterColumn.INDEX_XDCR_DEPTH]) > 0:
-                        self.buffer_wave_height.append(fourbeam_awc[AverageWaterColumn.INDEX_XDCR_DEPTH][-1])  # Should only be 1 value
+                        ts_row['wave_height'] = fourbeam_awc[AverageWaterColumn.INDEX_XDCR_DEPTH][-1]  # Should only be 1 value
 
                     # Range Tracking
                     if fourbeam_awc[AverageWaterColumn.INDEX_RANGE_TRACK] and len(fourbeam_awc[AverageWaterColumn.INDEX_RANGE_TRACK]) > 0:
-                        self.buffer_range_track.append(fourbeam_awc[AverageWaterColumn.INDEX_RANGE_TRACK][-1])  # Should only be 1 beam
-
-                # East Bin 1
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH]) > bin_1 and len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_1]) > 0:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_1][0]):        # Check for bad velocity
-                        self.buffer_earth_east_1.append(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_1][0])
-                    else:
-                        self.buffer_earth_east_1.append(0.0)
-                else:
-                    self.buffer_earth_east_1.append(0.0)
-
-                # East Bin 2
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH]) > bin_2 and len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_2]) > 0:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_2][0]):        # Check for bad velocity
-                        self.buffer_earth_east_2.append(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_2][0])
-                    else:
-                        self.buffer_earth_east_2.append(0.0)
-                else:
-                    self.buffer_earth_east_2.append(0.0)
-
-                # East Bin 3
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH]) > bin_3 and len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_3]) > 0:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_3][0]):        # Check for bad velocity
-                        self.buffer_earth_east_3.append(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_3][0])
-                    else:
-                        self.buffer_earth_east_3.append(0.0)
-                else:
-                    self.buffer_earth_east_3.append(0.0)
-
-                # North Bin 1
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH]) > bin_1 and len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_1]) > 1:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_1][1]):        # Check for bad velocity
-                        self.buffer_earth_north_1.append(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_1][1])
-                    else:
-                        self.buffer_earth_north_1.append(0.0)
-                else:
-                    self.buffer_earth_north_1.append(0.0)
-
-                # North Bin 2
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH]) > bin_2 and len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_2]) > 1:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_2][1]):        # Check for bad velocity
-                        self.buffer_earth_north_2.append(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_2][1])
-                    else:
-                        self.buffer_earth_north_2.append(0.0)
-                else:
-                    self.buffer_earth_north_2.append(0.0)
-
-                # North Bin 3
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH]) > bin_3 and len(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_3]) > 1:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_3][1]):        # Check for bad velocity
-                        self.buffer_earth_north_3.append(fourbeam_awc[AverageWaterColumn.INDEX_EARTH][bin_3][1])
-                    else:
-                        self.buffer_earth_north_3.append(0.0)
-                else:
-                    self.buffer_earth_north_3.append(0.0)
-
-                # Mag 1
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_MAG]) > bin_1:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_MAG][bin_1]):            # Check for bad velocity
-                        self.buffer_mag_1.append(fourbeam_awc[AverageWaterColumn.INDEX_MAG][bin_1])
-                    else:
-                        self.buffer_mag_1.append(0.0)
-                else:
-                    self.buffer_mag_1.append(0.0)
-
-                # Mag 2
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_MAG]) > bin_2:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_MAG][bin_2]):
-                        self.buffer_mag_2.append(fourbeam_awc[AverageWaterColumn.INDEX_MAG][bin_2])
-                    else:
-                        self.buffer_mag_2.append(0.0)
-                else:
-                    self.buffer_mag_2.append(0.0)
-
-                # Mag 3
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_MAG]) > bin_3:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_MAG][bin_3]):
-                        self.buffer_mag_3.append(fourbeam_awc[AverageWaterColumn.INDEX_MAG][bin_3])
-                    else:
-                        self.buffer_mag_3.append(0.0)
-                else:
-                    self.buffer_mag_3.append(0.0)
-
-                # Dir 1
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_DIR]) > bin_1:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_DIR][bin_1]):
-                        self.buffer_dir_1.append(fourbeam_awc[AverageWaterColumn.INDEX_DIR][bin_1])
-                    else:
-                        self.buffer_dir_1.append(0.0)
-                else:
-                    self.buffer_dir_1.append(0.0)
-
-                # Dir 2
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_DIR]) > bin_2:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_DIR][bin_2]):
-                        self.buffer_dir_2.append(fourbeam_awc[AverageWaterColumn.INDEX_DIR][bin_2])
-                    else:
-                        self.buffer_dir_2.append(0.0)
-                else:
-                    self.buffer_dir_2.append(0.0)
-
-                # Dir 3
-                if len(fourbeam_awc[AverageWaterColumn.INDEX_DIR]) > bin_3:
-                    if not Ensemble.Ensemble.is_bad_velocity(fourbeam_awc[AverageWaterColumn.INDEX_DIR][bin_3]):
-                        self.buffer_dir_3.append(fourbeam_awc[AverageWaterColumn.INDEX_DIR][bin_3])
-                    else:
-                        self.buffer_dir_3.append(0.0)
-                else:
-                    self.buffer_dir_3.append(0.0)
+                        ts_row['range_track'] = fourbeam_awc[AverageWaterColumn.INDEX_RANGE_TRACK][-1]  # Should only be 1 beam
+
+                # Add the selected bins
+                self.add_selected_bins(ts_row,
+                                       fourbeam_awc[AverageWaterColumn.INDEX_EARTH],
+                                       fourbeam_awc[AverageWaterColumn.INDEX_MAG],
+                                       fourbeam_awc[AverageWaterColumn.INDEX_DIR])
+
+            # Add the values as a single record
+            # A record is only useful with a date to plot against
+            if 'date' in ts_row:
+                self.ts_buffer.append(ts_row)
 
         #print("Process AWC: " + str(time.process_time() - t))
 
@@ -4,7 +4,11 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, ENS_COLUMNS_HPR, ENS_COLUMNS_SOS_WATER_TEMP, ENS_COLUMNS_TEMP, ENS_COLUMNS_PRESSURE
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.utils.column_buffer import ColumnBuffer, ColumnSummary, ENS_DF_COLUMNS, ENS_DF_DTYPES
+from rti_python_plot.plotly.plotly_history_trace import create_history_traces, create_envelope_traces, line_color
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, DecodedEnsembleColumns, DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA
 
 
 class PlotlyAncillaryLine:
@@ -14,6 +18,9 @@ class PlotlyAncillaryLine:
     will be given live or through an sqlite database file.
     """
 
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA)
+
     def __init__(self,
                  plot_heading: bool = True,
                  plot_pitch: bool = True,
@@ -22,10 +29,18 @@ class PlotlyAncillaryLine:
                  plot_sys_temp: bool = True,
                  plot_pressure: bool = True,
                  plot_xdcr_depth: bool = True,
-                 plot_sos: bool = True):
-
+                 plot_sos: bool = True,
+                 max_ens: int = None,
+                 max_age=None,
+                 summary_interval=None):
+        """
+        Set which ancillary data to plot and create the buffer to store the data.
+        :param max_ens: Maximum number of ensembles to keep.  None to keep all.
+        :param max_age: Maximum time span to keep, from the latest ensemble.  Ex: "6h".  None to keep all.
+        :param summary_interval: If given, the evicted data is kept as a min/mean/max summary with this interval.  Ex: "10min".
+        """
         # Column for the dataframe
-        self.df_columns = ["dt", "type", "ss_code", "ss_config", "bin_num", "beam", "blank", "bin_size", "val"]
+        self.df_columns = ENS_DF_COLUMNS
 
         # Determine which plots to include
         self.plot_heading = plot_heading
@@ -37,50 +52,116 @@ class PlotlyAncillaryLine:
         self.plot_xdcr_depth = plot_xdcr_depth
         self.sos = plot_sos
 
-        # Create a buffer for all the ensemble data
-        self.df_all_data = DataFrame({}, columns=self.df_columns)
+        # Summary of the data evicted from the buffer
+        self.summary = ColumnSummary(summary_interval) if summary_interval else None
+
+        # Create a buffer for the ensemble data
+        self.buffer = ColumnBuffer(self.df_columns, ENS_DF_DTYPES, max_ens=max_ens, max_age=max_age, summary=self.summary)
 
     def add_ens(self, ens):
         """
         Accumulate the ensemble Ancillary data
         """
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
 
-        # Get the data from the SystemSetup
-        if ens.IsAncillaryData and ens.IsEnsembleData:
-            # Get the information about the ensemble
-            dt = ens.EnsembleData.datetime()
-            ss_config = ens.EnsembleData.SubsystemConfig
-            ss_code = ens.EnsembleData.SysFirmwareSubsystemCode
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
+        """
+        Accumulate the Ancillary data from the decoded ensemble.
+        Only the data selected to plot is accumulated.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        # Get the data from the Ancillary data
+        if decoded_ens.is_ancillary_data and decoded_ens.is_ensemble_data:
+            selected = self.selected_data()
+
+            # Add the data to the buffer
+            if selected:
+                anc_types = [anc_type for anc_type, _ in selected]
+                anc_vals = [getattr(decoded_ens, attr) for _, attr in selected]
+                self.buffer.append_columns(decoded_ens.long_form(anc_types, anc_vals))
+
+    def add_decoded_columns(self, ens_columns: DecodedEnsembleColumns):
+        """
+        Accumulate the Ancillary data of multiple decoded ensembles at once.
+        Only the data selected to plot is accumulated.
+        :param ens_columns: Decoded ensembles stored as columns.
+        """
+        selected = self.selected_data()
+        if not selected:
+            return
 
-            # Get the dataframe with the voltage data
-            df_anc = ens.AncillaryData.encode_df(dt, ss_code, ss_config)
+        rows = ens_columns.column("is_ancillary_data") & ens_columns.column("is_ensemble_data")
+        num_rows = int(rows.sum())
 
-            # Merge the data to the global dataframe buffer
-            if self.df_all_data.empty:
-                self.df_all_data = df_anc
-            else:
-                self.df_all_data = pd.concat([self.df_all_data, df_anc])
+        # Each row of the matrix is the selected values of an ensemble
+        anc_types = np.tile(np.asarray([anc_type for anc_type, _ in selected], dtype=object), num_rows)
+        anc_vals = np.column_stack([ens_columns.column(attr)[rows] for _, attr in selected])
 
-    def get_plot_hpr(self):
+        # Add the data to the buffer
+        self.buffer.append_columns(ens_columns.long_form(anc_types, anc_vals, rows, len(selected)),
+                                   chunk_sizes=np.full(num_rows, len(selected), dtype=np.int64))
+
+    def selected_data(self) -> list:
+        """
+        Get the ancillary data selected to plot.
+        :return: List of the data type and the DecodedEnsemble value name.
+        """
+        selected = []
+        if self.plot_heading:
+            selected.append((Ensemble.CSV_HEADING, "heading"))
+        if self.plot_pitch:
+            selected.append((Ensemble.CSV_PITCH, "pitch"))
+        if self.plot_roll:
+            selected.append((Ensemble.CSV_ROLL, "roll"))
+        if self.plot_water_temp:
+            selected.append((Ensemble.CSV_WATER_TEMP, "water_temp"))
+        if self.plot_sys_temp:
+            selected.append((Ensemble.CSV_SYS_TEMP, "sys_temp"))
+        if self.plot_pressure:
+            selected.append((Ensemble.CSV_PRESSURE, "pressure"))
+        if self.plot_xdcr_depth:
+            selected.append((Ensemble.CSV_XDCR_DEPTH, "xdcr_depth"))
+        if self.sos:
+            selected.append((Ensemble.CSV_SOS, "sos"))
+
+        return selected
+
+    def get_plot_hpr(self, target_points: int = None, x_range: tuple = None):
         """
         Get the Plotly Voltage Line Plot.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
+        :param x_range: Optional (start, end) datetimes.  Only the data in this time range is plotted.
         """
         # Load the data from the file
         plot_title = "Heading Pitch Roll"
 
+        # Get all the accumulated data
+        df_all_data = self.buffer.to_df()
+
+        # Only plot the zoomed time range
+        if x_range:
+            df_all_data = df_all_data.loc[(df_all_data['dt'] >= pd.Timestamp(x_range[0])) & (df_all_data['dt'] <= pd.Timestamp(x_range[1]))]
+
         # Get all the voltage data
-        df_hpr = self.df_all_data.loc[(self.df_all_data['type'] == Ensemble.CSV_HEADING) | (self.df_all_data['type'] == Ensemble.CSV_PITCH) | (self.df_all_data['type'] == Ensemble.CSV_ROLL)]
-        df_heading = self.df_all_data.loc[self.df_all_data['type'] == Ensemble.CSV_HEADING]
-        df_pitch = self.df_all_data.loc[self.df_all_data['type'] == Ensemble.CSV_PITCH]
-        df_roll = self.df_all_data.loc[self.df_all_data['type'] == Ensemble.CSV_ROLL]
+        df_hpr = df_all_data.loc[(df_all_data['type'] == Ensemble.CSV_HEADING) | (df_all_data['type'] == Ensemble.CSV_PITCH) | (df_all_data['type'] == Ensemble.CSV_ROLL)]
+        df_heading = df_all_data.loc[df_all_data['type'] == Ensemble.CSV_HEADING]
+        df_pitch = df_all_data.loc[df_all_data['type'] == Ensemble.CSV_PITCH]
+        df_roll = df_all_data.loc[df_all_data['type'] == Ensemble.CSV_ROLL]
 
         # Create each line plot
-        line_heading = go.Scatter(x=df_heading['dt'], y=df_heading['val'], mode='lines', name='Heading')
-        line_pitch = go.Scatter(x=df_pitch['dt'], y=df_pitch['val'], mode='lines', name='Pitch')
-        line_roll = go.Scatter(x=df_roll['dt'], y=df_roll['val'], mode='lines', name='Roll')
+        line_heading = create_line_trace(df_heading['dt'], df_heading['val'], target_points, mode='lines', name='Heading', line=dict(color=line_color(0)), legendgroup='Heading')
+        line_pitch = create_line_trace(df_pitch['dt'], df_pitch['val'], target_points, mode='lines', name='Pitch', line=dict(color=line_color(1)), legendgroup='Pitch')
+        line_roll = create_line_trace(df_roll['dt'], df_roll['val'], target_points, mode='lines', name='Roll', line=dict(color=line_color(2)), legendgroup='Roll')
 
         # Create the figure
         fig_hpr = go.Figure()
+
+        # Add the history of the evicted data
+        if self.summary:
+            df_summary = self.summary.to_df()
+            for index, (data_type, name) in enumerate([(Ensemble.CSV_HEADING, 'Heading'), (Ensemble.CSV_PITCH, 'Pitch'), (Ensemble.CSV_ROLL, 'Roll')]):
+                fig_hpr.add_traces(create_history_traces(df_summary.loc[df_summary['type'] == data_type], name, line_color(index), name))
+
         fig_hpr.add_trace(line_heading)
         fig_hpr.add_trace(line_pitch)
         fig_hpr.add_trace(line_roll)
@@ -95,31 +176,38 @@ class PlotlyAncillaryLine:
         return fig_hpr, df_hpr
 
     @staticmethod
-    def get_sqlite_plot_hpr(db_file_path: str, plot_title: str):
+    def get_sqlite_plot_hpr(db_file_path: str, plot_title: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Create the plot for heading pitch and roll and get the data.
-        :param db_file_path: SQLite database file path.
+        :param db_file_path: SQLite database file path or an RtiSqliteDb.
         :param plot_title: Plot title.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        df_hpr = pd.read_sql_query("SELECT dateTime, heading, pitch, roll from ensembles; ", conn)
-
-        # Close SQLite connection
-        conn.close()
-
-        # Create line plots
-        line_heading = go.Scatter(x=df_hpr['dateTime'], y=df_hpr['heading'], mode='lines', name='Heading')
-        line_pitch = go.Scatter(x=df_hpr['dateTime'], y=df_hpr['pitch'], mode='lines', name='Pitch')
-        line_roll = go.Scatter(x=df_hpr['dateTime'], y=df_hpr['roll'], mode='lines', name='Roll')
-
-        # Create the figure
-        fig_hpr = go.Figure()
-        fig_hpr.add_trace(line_heading)
-        fig_hpr.add_trace(line_pitch)
-        fig_hpr.add_trace(line_roll)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
+
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_hpr = db.ensembles_buckets(ENS_COLUMNS_HPR, num_buckets, window)
+            fig_hpr = go.Figure(data=create_envelope_traces(df_hpr, 'heading', 'Heading') +
+                                     create_envelope_traces(df_hpr, 'pitch', 'Pitch') +
+                                     create_envelope_traces(df_hpr, 'roll', 'Roll'))
+        else:
+            # Get the columns from the ensembles table
+            df_hpr = db.ensembles_columns(ENS_COLUMNS_HPR, window)
+
+            # Create line plots
+            line_heading = create_line_trace(df_hpr['dateTime'], df_hpr['heading'], target_points, mode='lines', name='Heading')
+            line_pitch = create_line_trace(df_hpr['dateTime'], df_hpr['pitch'], target_points, mode='lines', name='Pitch')
+            line_roll = create_line_trace(df_hpr['dateTime'], df_hpr['roll'], target_points, mode='lines', name='Roll')
+
+            # Create the figure
+            fig_hpr = go.Figure()
+            fig_hpr.add_trace(line_heading)
+            fig_hpr.add_trace(line_pitch)
+            fig_hpr.add_trace(line_roll)
 
         # Set the plot titles
         fig_hpr.update_layout(
@@ -131,29 +219,35 @@ class PlotlyAncillaryLine:
         return fig_hpr, df_hpr
 
     @staticmethod
-    def get_sqlite_plot_sos_watertemp(db_file_path: str, plot_title: str):
+    def get_sqlite_plot_sos_watertemp(db_file_path: str, plot_title: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Create the plot for Speed of Sound and Water Temp and get the data.
-        :param db_file_path: SQLite database file path.
+        :param db_file_path: SQLite database file path or an RtiSqliteDb.
         :param plot_title: Plot title.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        df = pd.read_sql_query("SELECT dateTime, waterTemp, sos from ensembles; ", conn)
-
-        # Close SQLite connection
-        conn.close()
-
-        # Create line plots
-        line_heading = go.Scatter(x=df['dateTime'], y=df['waterTemp'], mode='lines', name='Water Temp')
-        line_pitch = go.Scatter(x=df['dateTime'], y=df['sos'], mode='lines', name='Speed of Sound')
-
-        # Create the figure
-        fig = go.Figure()
-        fig.add_trace(line_heading)
-        fig.add_trace(line_pitch)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
+
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df = db.ensembles_buckets(ENS_COLUMNS_SOS_WATER_TEMP, num_buckets, window)
+            fig = go.Figure(data=create_envelope_traces(df, 'waterTemp', 'Water Temp') +
+                                 create_envelope_traces(df, 'sos', 'Speed of Sound'))
+        else:
+            # Get the columns from the ensembles table
+            df = db.ensembles_columns(ENS_COLUMNS_SOS_WATER_TEMP, window)
+
+            # Create line plots
+            line_heading = create_line_trace(df['dateTime'], df['waterTemp'], target_points, mode='lines', name='Water Temp')
+            line_pitch = create_line_trace(df['dateTime'], df['sos'], target_points, mode='lines', name='Speed of Sound')
+
+            # Create the figure
+            fig = go.Figure()
+            fig.add_trace(line_heading)
+            fig.add_trace(line_pitch)
 
         # Set the plot titles
         fig.update_layout(
@@ -165,29 +259,35 @@ class PlotlyAncillaryLine:
         return fig, df
 
     @staticmethod
-    def get_sqlite_plot_temp(db_file_path: str, plot_title: str):
+    def get_sqlite_plot_temp(db_file_path: str, plot_title: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Create the plot for Speed of Sound and Water Temp and get the data.
-        :param db_file_path: SQLite database file path.
+        :param db_file_path: SQLite database file path or an RtiSqliteDb.
         :param plot_title: Plot title.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        df = pd.read_sql_query("SELECT dateTime, waterTemp, sysTemp from ensembles; ", conn)
-
-        # Close SQLite connection
-        conn.close()
-
-        # Create line plots
-        line_heading = go.Scatter(x=df['dateTime'], y=df['waterTemp'], mode='lines', name='Water Temp')
-        line_pitch = go.Scatter(x=df['dateTime'], y=df['sysTemp'], mode='lines', name='System Temp')
-
-        # Create the figure
-        fig = go.Figure()
-        fig.add_trace(line_heading)
-        fig.add_trace(line_pitch)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
+
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df = db.ensembles_buckets(ENS_COLUMNS_TEMP, num_buckets, window)
+            fig = go.Figure(data=create_envelope_traces(df, 'waterTemp', 'Water Temp') +
+                                 create_envelope_traces(df, 'sysTemp', 'System Temp'))
+        else:
+            # Get the columns from the ensembles table
+            df = db.ensembles_columns(ENS_COLUMNS_TEMP, window)
+
+            # Create line plots
+            line_heading = create_line_trace(df['dateTime'], df['waterTemp'], target_points, mode='lines', name='Water Temp')
+            line_pitch = create_line_trace(df['dateTime'], df['sysTemp'], target_points, mode='lines', name='System Temp')
+
+            # Create the figure
+            fig = go.Figure()
+            fig.add_trace(line_heading)
+            fig.add_trace(line_pitch)
 
         # Set the plot titles
         fig.update_layout(
@@ -199,27 +299,32 @@ class PlotlyAncillaryLine:
         return fig, df
 
     @staticmethod
-    def get_sqlite_plot_pressure(db_file_path: str, plot_title: str):
+    def get_sqlite_plot_pressure(db_file_path: str, plot_title: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Create the plot for Speed of Sound and Water Temp and get the data.
-        :param db_file_path: SQLite database file path.
+        :param db_file_path: SQLite database file path or an RtiSqliteDb.
         :param plot_title: Plot title.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        df = pd.read_sql_query("SELECT dateTime, pressure, xdcrDepth from ensembles; ", conn)
-
-        # Close SQLite connection
-        conn.close()
-
-        # Create line plots
-        line_depth = go.Scatter(x=df['dateTime'], y=df['xdcrDepth'], mode='lines', name='System Temp')
-
-        # Create the figure
-        fig = go.Figure()
-        fig.add_trace(line_depth)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
+
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df = db.ensembles_buckets(ENS_COLUMNS_PRESSURE, num_buckets, window)
+            fig = go.Figure(data=create_envelope_traces(df, 'xdcrDepth', 'System Temp'))
+        else:
+            # Get the columns from the ensembles table
+            df = db.ensembles_columns(ENS_COLUMNS_PRESSURE, window)
+
+            # Create line plots
+            line_depth = create_line_trace(df['dateTime'], df['xdcrDepth'], target_points, mode='lines', name='System Temp')
+
+            # Create the figure
+            fig = go.Figure()
+            fig.add_trace(line_depth)
 
         # Set the plot titles
         fig.update_layout(
@@ -4,7 +4,9 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, QUERY_BT_BEAM_VEL
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.plotly.plotly_history_trace import create_envelope_traces
 
 
 class PlotlyBottomTrackBeamVelocityLine:
@@ -16,32 +18,20 @@ class PlotlyBottomTrackBeamVelocityLine:
 
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 88.8):
+    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 88.8, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Given the sqlite database, pull out all the data and plot it to fig.  Then return the figure
         and the dataframe of all the data plotted.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
         :param filter: Flag if the data should be filtered.
         :param filter_max: Maximum value to look for.  Default value is BAD_VELOCITY 88.88
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         :return Plotly figure and dataframe of all data plotted.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        query_str = "SELECT dateTime, bottomtrack.beamVelBeam0, bottomtrack.beamVelBeam1, bottomtrack.beamVelBeam2, bottomtrack.beamVelBeam3  from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id;"
-        df_bt_range = pd.read_sql_query(query_str, conn)
-        # Close SQLite connection
-        conn.close()
-
-        # Filter data
-        # Check if any of the values exceed the filter_max.
-        # Use the absolute value to compare against
-        if filter:
-            df_bt_range['beamVelBeam0'] = df_bt_range['beamVelBeam0'].apply(lambda x: x if x and abs(x) <= filter_max else None)
-            df_bt_range['beamVelBeam1'] = df_bt_range['beamVelBeam1'].apply(lambda x: x if x and abs(x) <= filter_max else None)
-            df_bt_range['beamVelBeam2'] = df_bt_range['beamVelBeam2'].apply(lambda x: x if x and abs(x) <= filter_max else None)
-            df_bt_range['beamVelBeam3'] = df_bt_range['beamVelBeam3'].apply(lambda x: x if x and abs(x) <= filter_max else None)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
 
         # Load the data from the file
         if filter:
@@ -49,36 +39,34 @@ class PlotlyBottomTrackBeamVelocityLine:
         else:
             plot_title = "Bottom Track Beam Velocity"
 
-        # Create the Bottom Track Beam Velocity Beam 0 Line
-        b0_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['beamVelBeam0'],
-            name="Beam Vel Beam 0"
-        )
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_bt_range = db.read_bucket_df(QUERY_BT_BEAM_VEL, ["beamVelBeam0", "beamVelBeam1", "beamVelBeam2", "beamVelBeam3"], num_buckets, window, max_abs=filter_max if filter else None)
+            plots = create_envelope_traces(df_bt_range, 'beamVelBeam0', "Beam Vel Beam 0") + \
+                    create_envelope_traces(df_bt_range, 'beamVelBeam1', "Beam Vel Beam 1") + \
+                    create_envelope_traces(df_bt_range, 'beamVelBeam2', "Beam Vel Beam 2") + \
+                    create_envelope_traces(df_bt_range, 'beamVelBeam3', "Beam Vel Beam 3")
+        else:
+            # Query and get a dataframe result
+            # Filter the values that exceed the filter_max in the query
+            # Use the absolute value to compare against
+            df_bt_range = db.read_filtered_df(QUERY_BT_BEAM_VEL, ["beamVelBeam0", "beamVelBeam1", "beamVelBeam2", "beamVelBeam3"], window,
+                                              max_abs=filter_max if filter else None)
 
-        # Create the Bottom Track Beam Velocity Beam 1 Line
-        b1_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['beamVelBeam1'],
-            name="Beam Vel Beam 1"
-        )
+            # Create the Bottom Track Beam Velocity Beam 0 Line
+            b0_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['beamVelBeam0'], target_points, name="Beam Vel Beam 0")
 
-        # Create the Bottom Track Beam Velocity Beam 2 Line
-        b2_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['beamVelBeam2'],
-            name="Beam Vel Beam 2"
-        )
+            # Create the Bottom Track Beam Velocity Beam 1 Line
+            b1_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['beamVelBeam1'], target_points, name="Beam Vel Beam 1")
 
-        # Create the Bottom Track Beam Velocity Beam 3 Line
-        b3_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['beamVelBeam3'],
-            name="Beam Vel Beam 3"
-        )
+            # Create the Bottom Track Beam Velocity Beam 2 Line
+            b2_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['beamVelBeam2'], target_points, name="Beam Vel Beam 2")
+
+            # Create the Bottom Track Beam Velocity Beam 3 Line
+            b3_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['beamVelBeam3'], target_points, name="Beam Vel Beam 3")
 
-        # Combine all the plots
-        plots = [b0_line_plot, b1_line_plot, b2_line_plot, b3_line_plot]
+            # Combine all the plots
+            plots = [b0_line_plot, b1_line_plot, b2_line_plot, b3_line_plot]
 
         # Create the figure
         fig = go.Figure(data=plots)
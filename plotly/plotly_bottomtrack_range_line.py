@@ -4,7 +4,11 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, QUERY_BT_RANGE
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.utils.column_buffer import ColumnBuffer, ColumnSummary, ENS_DF_COLUMNS, ENS_DF_DTYPES
+from rti_python_plot.plotly.plotly_history_trace import create_history_traces, create_envelope_traces, line_color
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, DecodedEnsembleColumns, DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK
 
 
 class PlotlyBottomTrackRangeLine:
@@ -14,81 +18,105 @@ class PlotlyBottomTrackRangeLine:
     sqlite database file.
     """
 
-    def __init__(self):
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK)
+
+    def __init__(self, max_ens: int = None, max_age=None, summary_interval=None):
         """
         Create the dataframe to store the data from the ensembles.
+        :param max_ens: Maximum number of ensembles to keep.  None to keep all.
+        :param max_age: Maximum time span to keep, from the latest ensemble.  Ex: "6h".  None to keep all.
+        :param summary_interval: If given, the evicted data is kept as a min/mean/max summary with this interval.  Ex: "10min".
         """
         # Column for the dataframe
-        self.df_columns = ["dt", "type", "ss_code", "ss_config", "bin_num", "beam", "blank", "bin_size", "val"]
-        # Use the load_data. notation to use variable within inner function
-        self.df_all_data = DataFrame({}, columns=self.df_columns)
+        self.df_columns = ENS_DF_COLUMNS
+        # Summary of the data evicted from the buffer for each beam
+        self.summary = ColumnSummary(summary_interval, group_columns=("type", "beam")) if summary_interval else None
+        # Buffer to accumulate the ensemble data
+        self.buffer = ColumnBuffer(self.df_columns, ENS_DF_DTYPES, max_ens=max_ens, max_age=max_age, summary=self.summary)
 
     def add_ens(self, ens):
         """
-        Accumulate the Voltage data
+        Accumulate the Bottom Track Range data
+        """
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
+
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
         """
-        # Get the data from the SystemSetup
-        if ens.IsAncillaryData and ens.IsEnsembleData and ens.IsBottomTrack:
-            # Get the information about the ensemble
-            dt = ens.EnsembleData.datetime()
-            ss_config = ens.EnsembleData.SubsystemConfig
-            ss_code = ens.EnsembleData.SysFirmwareSubsystemCode
-
-            # Get the dataframe with the voltage data
-            df_ss = ens.BottomTrack.encode_df(dt, ss_code, ss_config)
-
-            # Merge the data to the global dataframe buffer
-            if self.df_all_data.empty:
-                self.df_all_data = df_ss
-            else:
-                self.df_all_data = pd.concat([self.df_all_data, df_ss])
-
-    def get_plot(self):
+        Accumulate the Bottom Track Range data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        # Get the data from the Bottom Track
+        if decoded_ens.is_ancillary_data and decoded_ens.is_ensemble_data and decoded_ens.is_bottom_track:
+            # Add the range for each beam to the buffer
+            bt_range = decoded_ens.bt_range
+            self.buffer.append_columns(decoded_ens.long_form(Ensemble.CSV_BT_RANGE, bt_range, beam=np.arange(len(bt_range))))
+
+    def add_decoded_columns(self, ens_columns: DecodedEnsembleColumns):
+        """
+        Accumulate the Bottom Track Range data of multiple decoded ensembles at once.
+        :param ens_columns: Decoded ensembles stored as columns.
+        """
+        rows = ens_columns.column("is_ancillary_data") & ens_columns.column("is_ensemble_data") & ens_columns.column("is_bottom_track")
+
+        # Get the range of each beam and the beam number within the ensemble
+        bt_range, counts = ens_columns.array_column("bt_range", rows)
+        beam = np.arange(len(bt_range)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        # Add the range for each beam to the buffer
+        self.buffer.append_columns(ens_columns.long_form(Ensemble.CSV_BT_RANGE, bt_range, rows, counts, beam=beam),
+                                   chunk_sizes=counts)
+
+    def get_plot(self, target_points: int = None, x_range: tuple = None):
         """
         Get the Plotly Voltage Line Plot.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
+        :param x_range: Optional (start, end) datetimes.  Only the data in this time range is plotted.
         :return Plotly figure and a dataframe of the data used for the plot.
         """
         # Load the data from the file
         plot_title = "Voltage"
 
+        # Get all the accumulated data
+        df_all_data = self.buffer.to_df()
+
+        # Only plot the zoomed time range
+        if x_range:
+            df_all_data = df_all_data.loc[(df_all_data['dt'] >= pd.Timestamp(x_range[0])) & (df_all_data['dt'] <= pd.Timestamp(x_range[1]))]
+
         # Get all the voltage data
-        data = self.df_all_data.loc[self.df_all_data['type'] == Ensemble.CSV_BT_RANGE]
+        data = df_all_data.loc[df_all_data['type'] == Ensemble.CSV_BT_RANGE]
 
         # Get the data to plot
         dates = data['dt']
         vals = data['val']
 
         # Create the Bottom Track Range Line
-        b0_line_plot = go.Scatter(
-            x=dates,
-            y=vals.loc[data['beam'] == 0],
-            name='Beam0'
-        )
+        b0_line_plot = create_line_trace(dates.loc[data['beam'] == 0], vals.loc[data['beam'] == 0], target_points, name='Beam0',
+                                         line=dict(color=line_color(0)), legendgroup='Beam0')
 
         # Create the Bottom Track Range Line
-        b1_line_plot = go.Scatter(
-            x=dates,
-            y=vals.loc[data['beam'] == 1],
-            name='Beam1'
-        )
+        b1_line_plot = create_line_trace(dates.loc[data['beam'] == 1], vals.loc[data['beam'] == 1], target_points, name='Beam1',
+                                         line=dict(color=line_color(1)), legendgroup='Beam1')
 
         # Create the Bottom Track Range Line
-        b2_line_plot = go.Scatter(
-            x=dates,
-            y=vals.loc[data['beam'] == 2],
-            name='Beam2'
-        )
+        b2_line_plot = create_line_trace(dates.loc[data['beam'] == 2], vals.loc[data['beam'] == 2], target_points, name='Beam2',
+                                         line=dict(color=line_color(2)), legendgroup='Beam2')
 
         # Create the Bottom Track Range Line
-        b3_line_plot = go.Scatter(
-            x=dates,
-            y=vals.loc[data['beam'] == 3],
-            name='Beam3'
-        )
+        b3_line_plot = create_line_trace(dates.loc[data['beam'] == 3], vals.loc[data['beam'] == 3], target_points, name='Beam3',
+                                         line=dict(color=line_color(3)), legendgroup='Beam3')
 
         # Combine all the plots
         plots = [b0_line_plot, b1_line_plot, b2_line_plot, b3_line_plot]
 
+        # Add the history of the evicted data
+        if self.summary:
+            df_summary = self.summary.to_df()
+            df_summary = df_summary.loc[df_summary['type'] == Ensemble.CSV_BT_RANGE]
+            for beam in range(4):
+                plots = create_history_traces(df_summary.loc[df_summary['beam'] == beam], 'Beam' + str(beam), line_color(beam), 'Beam' + str(beam)) + plots
+
         # Create the figure
         fig = go.Figure(data=plots)
 
@@ -102,55 +130,47 @@ class PlotlyBottomTrackRangeLine:
         return fig, data
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str):
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Given the sqlite database, pull out all the data and plot it to fig.  Then return the figure
         and the dataframe of all the data plotted.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         :return Plotly figure and dataframe of all data plotted.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        query_str = "SELECT dateTime, bottomtrack.rangeBeam0, bottomtrack.rangeBeam1, bottomtrack.rangeBeam2, bottomtrack.rangeBeam3  from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id;"
-        df_bt_range = pd.read_sql_query(query_str, conn)
-        # Close SQLite connection
-        conn.close()
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
 
         # Load the data from the file
         plot_title = "Bottom Track Range"
 
-        # Create the Bottom Track Range Beam 0 Line
-        b0_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['rangeBeam0'],
-            name="Range Beam 0"
-        )
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_bt_range = db.read_bucket_df(QUERY_BT_RANGE, ["rangeBeam0", "rangeBeam1", "rangeBeam2", "rangeBeam3"], num_buckets, window)
+            plots = create_envelope_traces(df_bt_range, 'rangeBeam0', "Range Beam 0") + \
+                    create_envelope_traces(df_bt_range, 'rangeBeam1', "Range Beam 1") + \
+                    create_envelope_traces(df_bt_range, 'rangeBeam2', "Range Beam 2") + \
+                    create_envelope_traces(df_bt_range, 'rangeBeam3', "Range Beam 3")
+        else:
+            # Query and get a dataframe result
+            df_bt_range = db.read_window_df(QUERY_BT_RANGE, window)
 
-        # Create the Bottom Track Range Beam 1 Line
-        b1_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['rangeBeam1'],
-            name="Range Beam 1"
-        )
+            # Create the Bottom Track Range Beam 0 Line
+            b0_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['rangeBeam0'], target_points, name="Range Beam 0")
 
-        # Create the Bottom Track Range Beam 2 Line
-        b2_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['rangeBeam2'],
-            name="Range Beam 2"
-        )
+            # Create the Bottom Track Range Beam 1 Line
+            b1_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['rangeBeam1'], target_points, name="Range Beam 1")
 
-        # Create the Bottom Track Range Beam 3 Line
-        b3_line_plot = go.Scatter(
-            x=df_bt_range['dateTime'],
-            y=df_bt_range['rangeBeam3'],
-            name="Range Beam 3"
-        )
+            # Create the Bottom Track Range Beam 2 Line
+            b2_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['rangeBeam2'], target_points, name="Range Beam 2")
 
-        # Combine all the plots
-        plots = [b0_line_plot, b1_line_plot, b2_line_plot, b3_line_plot]
+            # Create the Bottom Track Range Beam 3 Line
+            b3_line_plot = create_line_trace(df_bt_range['dateTime'], df_bt_range['rangeBeam3'], target_points, name="Range Beam 3")
+
+            # Combine all the plots
+            plots = [b0_line_plot, b1_line_plot, b2_line_plot, b3_line_plot]
 
         # Create the figure
         fig = go.Figure(data=plots)
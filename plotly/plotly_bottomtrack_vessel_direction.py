@@ -4,7 +4,9 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, QUERY_BT_VESSEL_DIR
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.plotly.plotly_history_trace import create_envelope_traces
 
 
 class PlotlyBottomTrackVesselDirectionLine:
@@ -16,28 +18,20 @@ class PlotlyBottomTrackVesselDirectionLine:
 
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 360):
+    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 360, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Given the sqlite database, pull out all the data and plot it to fig.  Then return the figure
         and the dataframe of all the data plotted.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
         :param filter: Flag if the data should be filtered.
         :param filter_max: Maximum value to look for.  Default value is BAD_VELOCITY 88.88
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         :return Plotly figure and dataframe of all data plotted.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        query_str = "SELECT dateTime, bottomtrack.vesselDirection from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id;"
-        df_bt_dir = pd.read_sql_query(query_str, conn)
-        # Close SQLite connection
-        conn.close()
-
-        # Filter data
-        # Check if any of the values are BAD_VELOCITY.
-        if filter:
-            df_bt_dir['vesselDirection'] = df_bt_dir['vesselDirection'].apply(lambda x: x if not Ensemble.is_bad_velocity(x) else None)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
 
         # Load the data from the file
         if filter:
@@ -45,15 +39,21 @@ class PlotlyBottomTrackVesselDirectionLine:
         else:
             plot_title = "Bottom Track Vessel Direction"
 
-        # Create the Bottom Track Speed Line
-        line_plot = go.Scatter(
-            x=df_bt_dir['dateTime'],
-            y=df_bt_dir['vesselDirection'],
-            name="Vessel Direction"
-        )
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_bt_dir = db.read_bucket_df(QUERY_BT_VESSEL_DIR, ["vesselDirection"], num_buckets, window, bad_value=Ensemble.BadVelocity if filter else None)
+            plots = create_envelope_traces(df_bt_dir, 'vesselDirection', "Vessel Direction")
+        else:
+            # Query and get a dataframe result
+            # Filter the BAD_VELOCITY values in the query
+            df_bt_dir = db.read_filtered_df(QUERY_BT_VESSEL_DIR, ["vesselDirection"], window,
+                                            bad_value=Ensemble.BadVelocity if filter else None)
+
+            # Create the Bottom Track Speed Line
+            line_plot = create_line_trace(df_bt_dir['dateTime'], df_bt_dir['vesselDirection'], target_points, name="Vessel Direction")
 
-        # Combine all the plots
-        plots = [line_plot]
+            # Combine all the plots
+            plots = [line_plot]
 
         # Create the figure
         fig = go.Figure(data=plots)
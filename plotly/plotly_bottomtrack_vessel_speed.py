@@ -4,7 +4,9 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, QUERY_BT_VESSEL_SPEED
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.plotly.plotly_history_trace import create_envelope_traces
 
 
 class PlotlyBottomTrackVesselSpeedLine:
@@ -16,29 +18,20 @@ class PlotlyBottomTrackVesselSpeedLine:
 
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 88.8):
+    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 88.8, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Given the sqlite database, pull out all the data and plot it to fig.  Then return the figure
         and the dataframe of all the data plotted.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
         :param filter: Flag if the data should be filtered.
         :param filter_max: Maximum value to look for.  Default value is BAD_VELOCITY 88.88
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         :return Plotly figure and dataframe of all data plotted.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        query_str = "SELECT dateTime, bottomtrack.vesselSpeed from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id;"
-        df_bt_speed = pd.read_sql_query(query_str, conn)
-        # Close SQLite connection
-        conn.close()
-
-        # Filter data
-        # Check if any of the values exceed the filter_max.
-        # Use the absolute value to compare against
-        if filter:
-            df_bt_speed['vesselSpeed'] = df_bt_speed['vesselSpeed'].apply(lambda x: x if abs(x) <= filter_max else None)
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
 
         # Load the data from the file
         if filter:
@@ -46,15 +39,22 @@ class PlotlyBottomTrackVesselSpeedLine:
         else:
             plot_title = "Bottom Track Vessel Speed"
 
-        # Create the Bottom Track Speed Line
-        line_plot = go.Scatter(
-            x=df_bt_speed['dateTime'],
-            y=df_bt_speed['vesselSpeed'],
-            name="Vessel Speed"
-        )
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_bt_speed = db.read_bucket_df(QUERY_BT_VESSEL_SPEED, ["vesselSpeed"], num_buckets, window, max_abs=filter_max if filter else None)
+            plots = create_envelope_traces(df_bt_speed, 'vesselSpeed', "Vessel Speed")
+        else:
+            # Query and get a dataframe result
+            # Filter the values that exceed the filter_max in the query
+            # Use the absolute value to compare against
+            df_bt_speed = db.read_filtered_df(QUERY_BT_VESSEL_SPEED, ["vesselSpeed"], window,
+                                              max_abs=filter_max if filter else None)
+
+            # Create the Bottom Track Speed Line
+            line_plot = create_line_trace(df_bt_speed['dateTime'], df_bt_speed['vesselSpeed'], target_points, name="Vessel Speed")
 
-        # Combine all the plots
-        plots = [line_plot]
+            # Combine all the plots
+            plots = [line_plot]
 
         # Create the figure
         fig = go.Figure(data=plots)
@@ -0,0 +1,160 @@
+import base64
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+# Data arrays of the traces that are encoded
+ENCODED_PROPERTIES = ("x", "y", "z")
+
+# Range of the int32 typed array.  plotly.js has no int64 typed array.
+INT32_MIN = np.iinfo(np.int32).min
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def encode_array(values, float32: bool = True, parse_dates: bool = False):
+    """
+    Encode the values as a base64 typed array for plotly.js.
+    The typed array is much smaller than a JSON list of numbers and the
+    browser does not need to parse each number.
+    Datetimes are encoded as float64 epoch milliseconds, because plotly.js
+    reads numbers on a date axis as milliseconds.
+    :param values: Array, list or Series of numbers or datetimes.  Can be 2D, like a heatmap z matrix.
+    :param float32: Flag to encode the float values as float32.  Datetimes are always float64.
+    :param parse_dates: Flag to also encode datetime strings.  Ex: the dateTime column of the sqlite database.
+    :return: Typed array spec and a flag if the values are datetimes.  None if the values can not be encoded.
+    """
+    arr = _to_datetime64(values, parse_dates)
+    is_time = arr is not None
+    if is_time:
+        # Epoch milliseconds.  NaT is NaN.
+        nat = np.isnat(arr)
+        arr = arr.astype('datetime64[ns]').astype(np.int64) / 1e6
+        arr[nat] = np.nan
+        dtype = 'f8'
+    else:
+        arr = np.asarray(values)
+        if arr.dtype.kind == 'f':
+            dtype = 'f4' if float32 else 'f8'
+        elif arr.dtype.kind in ('i', 'u'):
+            # Use int32 if all the values fit, else float64
+            if arr.size and (arr.min() < INT32_MIN or arr.max() > INT32_MAX):
+                dtype = 'f8'
+            else:
+                dtype = 'i4'
+        else:
+            return None
+
+    if arr.ndim not in (1, 2) or arr.size == 0:
+        return None
+
+    # Typed arrays are little endian and in row order
+    data = np.ascontiguousarray(arr, dtype='<' + dtype)
+    spec = {"dtype": dtype, "bdata": base64.b64encode(data.tobytes()).decode('ascii')}
+    if data.ndim == 2:
+        spec["shape"] = str(data.shape[0]) + ", " + str(data.shape[1])
+
+    return spec, is_time
+
+
+def encode_figure(fig, float32: bool = True) -> go.Figure:
+    """
+    Encode the data arrays of the figure as base64 typed arrays.
+    The figure sent to the browser is then a few times smaller and faster to
+    parse, like for the heatmaps and the long line plots.  The x and y values
+    that are datetimes are sent as epoch milliseconds and their axis is set
+    to a date axis.  The given figure is not changed.
+    :param fig: Plotly figure.
+    :param float32: Flag to encode the float values as float32.
+    :return: New figure with the encoded data.
+    """
+    fig = go.Figure(fig)
+
+    for trace in fig.data:
+        for prop in ENCODED_PROPERTIES:
+            if prop not in trace:
+                continue
+
+            values = trace[prop]
+            if values is None or isinstance(values, dict):
+                continue
+
+            encoded = encode_array(values, float32, parse_dates=(prop == 'x'))
+            if encoded is None:
+                continue
+            spec, is_time = encoded
+
+            try:
+                trace[prop] = spec
+            except ValueError:
+                # Older plotly versions do not accept typed arrays, so keep the values
+                continue
+
+            # Numbers are only displayed as dates on a date axis
+            if is_time and prop in ('x', 'y'):
+                axis = fig.layout[_axis_name(trace, prop)]
+                if axis.type is None:
+                    axis.type = 'date'
+
+    return fig
+
+
+def to_json(fig, float32: bool = True) -> str:
+    """
+    Get the JSON of the figure with the data encoded as typed arrays.
+    :param fig: Plotly figure.
+    :param float32: Flag to encode the float values as float32.
+    :return: JSON string of the figure.
+    """
+    return encode_figure(fig, float32).to_json()
+
+
+def write_html(fig, file_path: str, float32: bool = True, **kwargs):
+    """
+    Save the figure to an HTML file with the data encoded as typed arrays.
+    :param fig: Plotly figure.
+    :param file_path: File path of the HTML file.
+    :param float32: Flag to encode the float values as float32.
+    :param kwargs: Other options for plotly write_html().  Ex: include_plotlyjs="cdn"
+    """
+    encode_figure(fig, float32).write_html(file_path, **kwargs)
+
+
+def _to_datetime64(values, parse_dates: bool):
+    """
+    Convert the values to datetime64 if they are datetimes.
+    :param values: Values to check.
+    :param parse_dates: Flag to also parse datetime strings.
+    :return: Array of datetime64[ns] or None if the values are not datetimes.
+    """
+    arr = np.asarray(values)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype('datetime64[ns]')
+    if arr.ndim != 1 or arr.dtype.kind not in ('O', 'U', 'S') or arr.size == 0:
+        return None
+
+    kind = pd.api.types.infer_dtype(arr, skipna=True)
+    if kind not in ('datetime', 'datetime64', 'date') and not (kind == 'string' and parse_dates):
+        return None
+
+    try:
+        dates = pd.DatetimeIndex(pd.to_datetime(arr, format='ISO8601' if kind == 'string' else None))
+    except (ValueError, TypeError):
+        return None
+
+    # Display the local time of the dates, like the datetime strings
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+
+    return dates.to_numpy(dtype='datetime64[ns]')
+
+
+def _axis_name(trace, prop: str) -> str:
+    """
+    Get the layout name of the axis of the trace.
+    :param trace: Plotly trace.
+    :param prop: "x" or "y".
+    :return: Layout axis name.  Ex: "xaxis" or "xaxis2"
+    """
+    axis_ref = getattr(trace, prop + 'axis', None) or prop
+    return prop + 'axis' + axis_ref[1:]
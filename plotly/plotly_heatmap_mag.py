@@ -4,8 +4,13 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, QUERY_HEATMAP_BT_RANGE, QUERY_HEATMAP_MAG
 from collections import deque
+from rti_python_plot.utils.ensemble_cube import EnsembleCube, HEATMAP_PYRAMID_LEVELS
+from rti_python_plot.utils.lttb import lttb_downsample
+from rti_python_plot.plotly.plotly_trace_factory import create_scatter_trace, use_webgl
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK, DATASET_EARTH_VELOCITY
+
 
 class PlotlyHeatmapMag:
     """
@@ -14,88 +19,145 @@ class PlotlyHeatmapMag:
     sqlite database file.
     """
 
-    def __init__(self):
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK, DATASET_EARTH_VELOCITY)
+
+    def __init__(self, cache_dir: str = None, pyramid_levels: int = HEATMAP_PYRAMID_LEVELS):
         """
-        Initialize the queues to hold all the ensemble data.
-        The queues will contain all the accumulated information.
+        Initialize the cube and queues to hold all the ensemble data.
+        The cube and queues will contain all the accumulated information.
+        :param cache_dir: Optional directory to store the magnitude data in memory mapped files.
+        :param pyramid_levels: Number of time averaged levels to keep for long time ranges.  0 for no levels.
         """
         self.bad_velocity = Ensemble.BadVelocity
+        self.cache_dir = cache_dir
+        self.pyramid_levels = pyramid_levels
+
+        # Magnitude data [ensembles, bins]
+        self.cube = self.create_cube()
 
-        #self.queue_mag = deque(maxlen=max_display_points)
-        self.list_mag = []
-        self.queue_dt = deque()
-        self.queue_bin_depth = deque()
         self.queue_bt_dt = deque()
         self.queue_bt_range = deque()
-        self.queue_bottom = deque()
-        self.bin_depth_list = []
-        self.blank = 0.0
-        self.bin_size = 0.0
-        self.is_upward_looking = False
-
-    def get_sqlite_plot(self, db_file_path: str):
-        """
-        Get the data from the sqlite file.
-        Then add it to the queue so it will be plotted on the next update.
-        """
-        # Create a connection to the sqlite file
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        df_bt_range = pd.read_sql_query('SELECT ensembles.ensnum, ensembles.dateTime, ensembles.numbeams, ensembles.numbins, '
-                                        'ensembles.binsize, ensembles.rangefirstbin, '
-                                        'rangebeam0, rangebeam1, rangebeam2, rangebeam3, avgRange '
-                                        'FROM ensembles '
-                                        'INNER JOIN bottomtrack ON ensembles.id = bottomtrack.ensindex '
-                                        'WHERE ensembles.project_id = 1 '
-                                        'ORDER BY ensembles.ensnum ASC;', conn)
-
-        df_mag = pd.read_sql_query('SELECT ensembles.dateTime, ensembles.subsystemCode, ensembles.SubsystemConfig, '
-                                   'earthMagDir.bin, ensembles.rangeFirstBin, ensembles.binSize, ensembles.isUpwardLooking, earthMagDir.mag '
-                                   'FROM ensembles '
-                                   'INNER JOIN earthMagDir ON ensembles.id = earthMagDir.ensindex '
-                                   'WHERE ensembles.project_id = 1 '
-                                   'ORDER BY ensembles.dateTime ASC;', conn)
-
-        # Close SQLite connection
-        conn.close()
-
-        # Find all the unique datetime to separate the ensembles
-        # Then add them to the queue
-        unique_dt = df_mag.dateTime.unique()
-        self.queue_dt.extend(unique_dt)
-
-        # Set the depth list
-        # Get the first dt to get all the bins associated with a specific datetime (ensemble)
-        first_dt = unique_dt.flat[0]
-        first_ens = df_mag.loc[df_mag['dateTime'] == first_dt]
-        self.is_upward_looking = bool(first_ens['isUpwardLooking'].iloc[0])
-        self.bin_size = first_ens['binSize'].iloc[0]
-        self.blank = first_ens['rangeFirstBin'].iloc[0]
-
-        # Get all the unique bin numbers
-        # Sort them to be in order
-        unique_bin_num = df_mag.bin.unique()
-        unique_bin_num.sort()
-
-        for bin_num in unique_bin_num:
-            # Add the bins depths to the list
-            self.bin_depth_list.append(self.blank + (self.bin_size * bin_num))
-
-            # Get all the values for each bin
-            bin_mags = df_mag.loc[df_mag['bin'] == bin_num]
+
+    def create_cube(self) -> EnsembleCube:
+        """
+        Create an empty cube for the magnitude data.
+        :return: Cube for the magnitude data [ensembles, bins].
+        """
+        return EnsembleCube({"mag": 1}, cache_dir=self.cache_dir, pyramid_levels=self.pyramid_levels)
+
+    def add_ens(self, ens):
+        """
+        Accumulate the Magnitude and Bottom Track Range data.
+        :param ens: Ensemble data to accumulate.
+        """
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
+
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
+        """
+        Accumulate the Magnitude and Bottom Track Range data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        if not decoded_ens.is_ensemble_data:
+            return
+
+        # Get the Magnitude data
+        if decoded_ens.is_ancillary_data and decoded_ens.is_earth_velocity:
+            self.cube.set_bin_config(decoded_ens.blank, decoded_ens.bin_size, decoded_ens.is_upward_looking)
+
+            # Remove any bad velocity data
+            mag = np.where(decoded_ens.mag >= self.bad_velocity, np.nan, decoded_ens.mag)
+            self.cube.append(decoded_ens.dt, {"mag": mag})
+
+        # Get the Bottom Track Range
+        if decoded_ens.is_bottom_track:
+            self.queue_bt_dt.append(decoded_ens.dt)
+            self.queue_bt_range.append(decoded_ens.bt_avg_range)
+
+    def get_plot(self, start=None, end=None, max_columns: int = None):
+        """
+        Get the Plotly Magnitude Heatmap of the accumulated ensemble data.
+        Only the data within the time window is read.
+        :param start: Optional start datetime of the time window.
+        :param end: Optional end datetime of the time window.
+        :param max_columns: If given, plot the time averaged level with at most this many columns.  Usually the width of the plot in pixels.
+        :return: Plotly figure and a dataframe of the data used for the plot.
+        """
+        index = self.cube.window(start, end)
+        return self.create_figure(index, max_columns), self.get_mag_df(index)
+
+    def get_mag_df(self, index: slice = None) -> DataFrame:
+        """
+        Get the Magnitude data as a DataFrame.  Each row is an ensemble
+        and each column is a bin depth.
+        :param index: Optional slice of the ensembles from the cube window().
+        :return: DataFrame of the magnitude data.
+        """
+        return DataFrame(self.cube.heatmap("mag", index=index).T,
+                         index=self.cube.time_axis(index),
+                         columns=self.cube.bin_depths())
+
+    def get_sqlite_plot(self, db_file_path: str, window: QueryWindow = None, max_columns: int = None):
+        """
+        Get the data from the sqlite file and plot it.
+        The data accumulated before is replaced, so calling this again reads the window again.
+        Each ensemble is a column of the heatmap, so ensembles of different projects
+        with the same time are not combined.  Use a window with a project_id to plot a single project.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param max_columns: If given, plot the time averaged level with at most this many columns.  Usually the width of the plot in pixels.
+        """
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
+
+        df_bt_range = db.read_window_df(QUERY_HEATMAP_BT_RANGE, window)
+        df_mag = db.read_window_df(QUERY_HEATMAP_MAG, window)
+
+        # Start with an empty cube and queues
+        self.cube.close()
+        self.cube = self.create_cube()
+        self.queue_bt_dt.clear()
+        self.queue_bt_range.clear()
+
+        # Add the data to the cube
+        self.add_sqlite_df(df_bt_range, df_mag)
+
+        return self.create_figure(max_columns=max_columns), df_mag
+
+    def add_sqlite_df(self, df_bt_range: DataFrame, df_mag: DataFrame):
+        """
+        Add the rows of the heatmap queries to the cube.
+        The rows must be newer than the data already in the cube.
+        This is used to add the new rows from an SqliteTailFollower.
+        :param df_bt_range: Result of QUERY_HEATMAP_BT_RANGE.
+        :param df_mag: Result of QUERY_HEATMAP_MAG.
+        """
+        if not df_mag.empty:
+            # Set the bin configuration from the first ensemble
+            self.cube.set_bin_config(df_mag['rangeFirstBin'].iloc[0],
+                                     df_mag['binSize'].iloc[0],
+                                     bool(df_mag['isUpwardLooking'].iloc[0]))
+
+            # Get an integer code for each ensemble to separate the ensembles
+            # The rows are in time order, so the codes are in time order
+            # The bin number is the code for the bin
+            ens_codes, unique_ens = pd.factorize(df_mag['ensId'])
+            _, first_rows = np.unique(ens_codes, return_index=True)
+            unique_dt = df_mag['dateTime'].to_numpy()[first_rows]
+            bin_codes = df_mag['bin'].to_numpy(dtype=np.intp)
 
             # Remove any bad velocity data
             # Bad velocity is greater than 88.88
-            # Convert to numpy array first then remove value
-            bin_mags_np = np.array(bin_mags['mag'].tolist())
-            bin_mags_list = np.where(bin_mags_np >= self.bad_velocity, None, bin_mags_np).tolist()
+            mag_vals = df_mag['mag'].to_numpy(dtype=np.float64)
+            mag_vals = np.where(mag_vals >= self.bad_velocity, np.nan, mag_vals)
 
-            # Add a deque to the list for each bin
-            self.list_mag.append([])
+            # Create the magnitude matrix [ensembles, bins] in one pass
+            mag = np.full((len(unique_ens), bin_codes.max() + 1), np.nan, dtype=np.float32)
+            mag[ens_codes, bin_codes] = mag_vals
 
-            # Set all the magnitude values to the list
-            self.list_mag[bin_num].extend(bin_mags_list)
+            # Add the magnitude data to the cube
+            # The heatmap is a [bin x time] view of the cube
+            self.cube.extend(pd.to_datetime(unique_dt), {"mag": mag})
 
         # Get all the range values for the bottom track line
         self.queue_bt_range.extend(df_bt_range['avgRange'].tolist())
@@ -103,35 +165,65 @@ class PlotlyHeatmapMag:
         # Get the datetime for the bottom track values
         self.queue_bt_dt.extend(df_bt_range['dateTime'].tolist())
 
+    def create_figure(self, index: slice = None, max_columns: int = None):
+        """
+        Create the heatmap figure from the cube and the bottom track range.
+        :param index: Optional slice of the ensembles from the cube window().
+        :param max_columns: If given, plot the time averaged level with at most this many columns.  Usually the width of the plot in pixels.
+        :return: Plotly figure.
+        """
+        # Load the data from the file
+        plot_title = "Water Magnitude"
+
+        bin_depths = self.cube.bin_depths()
+        dates = self.cube.time_axis(index)
+
+        # Get the bottom track range within the time window
+        bt_dt = pd.to_datetime(list(self.queue_bt_dt))
+        bt_range = np.asarray(self.queue_bt_range, dtype=np.float64)
+        if len(dates) > 0 and len(bt_dt) > 0:
+            in_window = (bt_dt >= dates[0]) & (bt_dt <= dates[-1])
+            bt_dt = bt_dt[in_window]
+            bt_range = bt_range[in_window]
+
+        # Reduce the bottom track line to the width of the plot
+        bt_dt, bt_range = lttb_downsample(bt_dt, bt_range, max_columns)
+
         # Create a line at the bottom of the plot to connect to the bottom track line
         # Make the length of the list the same as the number of range values
-        self.queue_bottom.extend([max(self.bin_depth_list)]*len(df_bt_range['avgRange'].tolist()))
+        bottom = [bin_depths.max() if len(bin_depths) else 0.0] * len(bt_range)
 
-        # Load the data from the file
-        plot_title = "Water Magnitude"
+        # Both lines must be the same type for the fill between them
+        webgl = use_webgl(len(bt_range))
 
-        # Create the Voltage Line
-        bt_line = go.Scatter(
-            x=list(self.queue_bt_dt),
-            y=list(self.queue_bt_range),
+        # Create the Bottom Track Range Line
+        bt_line = create_scatter_trace(
+            bt_dt,
+            bt_range,
+            webgl=webgl,
             #name="Bottom Track Range (m)",
             showlegend=False,
             line=dict(color='rgba(255, 69, 0, 255)', width=2),
         )
 
-        # Create the Voltage Line
-        bottom_line = go.Scatter(
-            x=list(self.queue_bt_dt),
-            y=list(self.queue_bottom),
+        # Create the Bottom Line
+        bottom_line = create_scatter_trace(
+            bt_dt,
+            bottom,
+            webgl=webgl,
             fill='tonexty',
             showlegend=False,
             line=dict(color='rgba(105, 105, 105, 255)', width=10),
             fillcolor='rgba(105, 105, 105, 255)'
         )
 
-        mag_data = go.Heatmap( z=self.list_mag,
-                               x=list(self.queue_dt),
-                               y=self.bin_depth_list,
+        # Get the time averaged level that fits in the plot width
+        level, level_index = self.cube.level(max_columns, index)
+
+        # The z matrix is a view of the cube [bins, ensembles]
+        mag_data = go.Heatmap( z=level.heatmap("mag", index=level_index),
+                               x=level.time_axis(level_index),
+                               y=bin_depths,
                                hoverongaps=False,
                                name='Magnitude',
                                colorscale='Cividis')
@@ -142,7 +234,7 @@ class PlotlyHeatmapMag:
         # Create the figure
         fig = go.Figure(data=plots)
 
-        if self.is_upward_looking:
+        if self.cube.is_upward_looking:
             # Set the plot titles
             fig.update_layout(
                 title=plot_title,
@@ -160,4 +252,4 @@ class PlotlyHeatmapMag:
                 #showlegend=True
             )
 
-        return fig, df_mag
+        return fig
@@ -0,0 +1,149 @@
+import re
+from pandas import DataFrame
+import plotly.colors
+from rti_python_plot.plotly.plotly_trace_factory import create_scatter_trace, use_webgl
+
+
+# Colors of the lines.  The history of a line uses a lighter shade of the line color.
+LINE_COLORS = plotly.colors.qualitative.Plotly
+
+
+def line_color(index: int) -> str:
+    """
+    Get the color of the line.
+    :param index: Index of the line in the plot.
+    :return: Color of the line.
+    """
+    return LINE_COLORS[index % len(LINE_COLORS)]
+
+
+def lighter_color(color: str, amount: float = 0.5, alpha: float = 1.0) -> str:
+    """
+    Mix the color with white.
+    :param color: Hex or rgb/rgba color.  Ex: '#636EFA' or 'rgba(128, 128, 128, 255)'
+    :param amount: Amount of white to mix in.  0 is the color and 1 is white.
+    :param alpha: Opacity of the color.
+    :return: rgba color.
+    """
+    if color.startswith('#'):
+        rgb = plotly.colors.hex_to_rgb(color)
+    else:
+        rgb = [float(val) for val in re.findall(r"[\d.]+", color)[:3]]
+
+    rgb = [int(round(val + (255 - val) * amount)) for val in rgb]
+    return 'rgba(' + str(rgb[0]) + ', ' + str(rgb[1]) + ', ' + str(rgb[2]) + ', ' + str(alpha) + ')'
+
+
+def create_history_traces(df_summary: DataFrame, name: str, color: str = 'rgba(128, 128, 128, 255)', legendgroup: str = None) -> list:
+    """
+    Create the traces to display the summary of the data evicted from a ColumnBuffer.
+    The min and max are displayed as a shaded band and the mean as a dotted line,
+    in a lighter shade of the color of the line.
+    :param df_summary: Summary DataFrame for a single group from ColumnSummary.to_df().
+    :param name: Name of the data.
+    :param color: Color of the line of the data.
+    :param legendgroup: Optional legend group of the line of the data, so the history is hidden with the line.
+    :return: List of plotly traces.
+    """
+    if df_summary is None or df_summary.empty:
+        return []
+
+    legendgroup = legendgroup or name + ' History'
+
+    dates = df_summary['dt']
+
+    # All the lines must be the same type for the fill between them
+    webgl = use_webgl(len(dates))
+
+    # Max line.  The min line fills up to this line
+    max_line = create_scatter_trace(
+        dates,
+        df_summary['max'],
+        webgl=webgl,
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip',
+        legendgroup=legendgroup
+    )
+
+    # Min line
+    min_line = create_scatter_trace(
+        dates,
+        df_summary['min'],
+        webgl=webgl,
+        mode='lines',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor=lighter_color(color, 0.6, 0.3),
+        showlegend=False,
+        hoverinfo='skip',
+        legendgroup=legendgroup
+    )
+
+    # Mean line
+    mean_line = create_scatter_trace(
+        dates,
+        df_summary['mean'],
+        webgl=webgl,
+        mode='lines',
+        line=dict(color=lighter_color(color, 0.4), dash='dot'),
+        name=name + ' History',
+        legendgroup=legendgroup
+    )
+
+    return [max_line, min_line, mean_line]
+
+
+def create_envelope_traces(df_buckets: DataFrame, column: str, name: str, x_column: str = 'dateTime') -> list:
+    """
+    Create the traces to display the time buckets from RtiSqliteDb.read_bucket_df().
+    The min and max are displayed as a shaded band and the mean as a line.
+    :param df_buckets: Bucket DataFrame with the <column>_min, <column>_mean and <column>_max columns.
+    :param column: Column to display.
+    :param name: Name of the data.
+    :param x_column: Column with the datetime of each bucket.
+    :return: List of plotly traces.
+    """
+    dates = df_buckets[x_column]
+
+    # All the lines must be the same type for the fill between them
+    webgl = use_webgl(len(dates))
+
+    # Max line.  The min line fills up to this line
+    max_line = create_scatter_trace(
+        dates,
+        df_buckets[column + '_max'],
+        webgl=webgl,
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip',
+        legendgroup=name
+    )
+
+    # Min line
+    min_line = create_scatter_trace(
+        dates,
+        df_buckets[column + '_min'],
+        webgl=webgl,
+        mode='lines',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor='rgba(128, 128, 128, 0.3)',
+        showlegend=False,
+        hoverinfo='skip',
+        legendgroup=name
+    )
+
+    # Mean line
+    mean_line = create_scatter_trace(
+        dates,
+        df_buckets[column + '_mean'],
+        webgl=webgl,
+        mode='lines',
+        name=name,
+        legendgroup=name
+    )
+
+    return [max_line, min_line, mean_line]
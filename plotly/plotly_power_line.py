@@ -4,7 +4,11 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, ENS_COLUMNS_VOLTAGE
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.utils.column_buffer import ColumnBuffer, ColumnSummary, ENS_DF_COLUMNS, ENS_DF_DTYPES
+from rti_python_plot.plotly.plotly_history_trace import create_history_traces, create_envelope_traces, line_color
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, DecodedEnsembleColumns, DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_SYSTEM_SETUP
 
 
 class PlotlyPowerLine:
@@ -14,59 +18,85 @@ class PlotlyPowerLine:
     sqlite database file.
     """
 
-    def __init__(self):
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_SYSTEM_SETUP)
+
+    def __init__(self, max_ens: int = None, max_age=None, summary_interval=None):
         """
         Create the dataframe to store the data from the ensembles.
+        :param max_ens: Maximum number of ensembles to keep.  None to keep all.
+        :param max_age: Maximum time span to keep, from the latest ensemble.  Ex: "6h".  None to keep all.
+        :param summary_interval: If given, the evicted data is kept as a min/mean/max summary with this interval.  Ex: "10min".
         """
         # Column for the dataframe
-        self.df_columns = ["dt", "type", "ss_code", "ss_config", "bin_num", "beam", "blank", "bin_size", "val"]
-        # Use the load_data. notation to use variable within inner function
-        self.df_all_data = DataFrame({}, columns=self.df_columns)
+        self.df_columns = ENS_DF_COLUMNS
+        # Summary of the data evicted from the buffer
+        self.summary = ColumnSummary(summary_interval) if summary_interval else None
+        # Buffer to accumulate the ensemble data
+        self.buffer = ColumnBuffer(self.df_columns, ENS_DF_DTYPES, max_ens=max_ens, max_age=max_age, summary=self.summary)
 
     def add_ens(self, ens):
         """
         Accumulate the Voltage data
         """
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
+
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
+        """
+        Accumulate the Voltage data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data.
+        """
         # Get the data from the SystemSetup
-        if ens.IsAncillaryData and ens.IsEnsembleData and ens.IsSystemSetup:
-            # Get the information about the ensemble
-            dt = ens.EnsembleData.datetime()
-            ss_config = ens.EnsembleData.SubsystemConfig
-            ss_code = ens.EnsembleData.SysFirmwareSubsystemCode
-
-            # Get the dataframe with the voltage data
-            df_ss = ens.SystemSetup.encode_df(dt, ss_code, ss_config)
-
-            # Merge the data to the global dataframe buffer
-            if self.df_all_data.empty:
-                self.df_all_data = df_ss
-            else:
-                self.df_all_data = pd.concat([self.df_all_data, df_ss])
-
-    def get_plot(self):
+        if decoded_ens.is_ancillary_data and decoded_ens.is_ensemble_data and decoded_ens.is_system_setup:
+            # Add the voltage data to the buffer
+            self.buffer.append_columns(decoded_ens.long_form(Ensemble.CSV_VOLTAGE, decoded_ens.voltage))
+
+    def add_decoded_columns(self, ens_columns: DecodedEnsembleColumns):
+        """
+        Accumulate the Voltage data of multiple decoded ensembles at once.
+        :param ens_columns: Decoded ensembles stored as columns.
+        """
+        rows = ens_columns.column("is_ancillary_data") & ens_columns.column("is_ensemble_data") & ens_columns.column("is_system_setup")
+
+        # Add the voltage of each ensemble to the buffer
+        self.buffer.append_columns(ens_columns.long_form(Ensemble.CSV_VOLTAGE, ens_columns.column("voltage")[rows], rows),
+                                   chunk_sizes=np.ones(rows.sum(), dtype=np.int64))
+
+    def get_plot(self, target_points: int = None, x_range: tuple = None):
         """
         Get the Plotly Voltage Line Plot.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
+        :param x_range: Optional (start, end) datetimes.  Only the data in this time range is plotted.
         :return Plotly figure and a dataframe of the data used for the plot.
         """
         # Load the data from the file
         plot_title = "Voltage"
 
+        # Get all the accumulated data
+        df_all_data = self.buffer.to_df()
+
+        # Only plot the zoomed time range
+        if x_range:
+            df_all_data = df_all_data.loc[(df_all_data['dt'] >= pd.Timestamp(x_range[0])) & (df_all_data['dt'] <= pd.Timestamp(x_range[1]))]
+
         # Get all the voltage data
-        data = self.df_all_data.loc[self.df_all_data['type'] == Ensemble.CSV_VOLTAGE]
+        data = df_all_data.loc[df_all_data['type'] == Ensemble.CSV_VOLTAGE]
 
         # Get the data to plot
         dates = data['dt']
         vals = data['val']
 
         # Create the Bottom Track Range Line
-        line_plot = go.Scatter(
-            x=dates,
-            y=vals
-        )
+        line_plot = create_line_trace(dates, vals, target_points, name='Voltage', line=dict(color=line_color(0)), legendgroup='Voltage')
 
         # Combine all the plots
         plots = [line_plot]
 
+        # Add the history of the evicted data
+        if self.summary:
+            df_summary = self.summary.to_df()
+            plots = create_history_traces(df_summary.loc[df_summary['type'] == Ensemble.CSV_VOLTAGE], "Voltage", line_color(0), "Voltage") + plots
+
         # Create the figure
         fig = go.Figure(data=plots)
 
@@ -80,33 +110,35 @@ class PlotlyPowerLine:
         return fig, data
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str):
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Given the sqlite database, pull out all the data and plot it to fig.  Then return the figure
         and the dataframe of all the data plotted.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         :return Plotly figure and dataframe of all data plotted.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        df_volt = pd.read_sql_query("SELECT dateTime, Voltage from ensembles; ", conn)
-
-        # Close SQLite connection
-        conn.close()
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
 
         # Load the data from the file
         plot_title = "Voltage"
 
-        # Create the Voltage Line
-        line_plot = go.Scatter(
-            x=df_volt['dateTime'],
-            y=df_volt['Voltage']
-        )
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_volt = db.ensembles_buckets(ENS_COLUMNS_VOLTAGE, num_buckets, window)
+            plots = create_envelope_traces(df_volt, 'Voltage', "Voltage")
+        else:
+            # Get the columns from the ensembles table
+            df_volt = db.ensembles_columns(ENS_COLUMNS_VOLTAGE, window)
 
-        # Combine all the plots
-        plots = [line_plot]
+            # Create the Voltage Line
+            line_plot = create_line_trace(df_volt['dateTime'], df_volt['Voltage'], target_points)
+
+            # Combine all the plots
+            plots = [line_plot]
 
         # Create the figure
         fig = go.Figure(data=plots)
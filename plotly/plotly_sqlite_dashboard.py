@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow
+from rti_python_plot.plotly.plotly_power_line import PlotlyPowerLine
+from rti_python_plot.plotly.plotly_status_line import PlotlyStatusLine
+from rti_python_plot.plotly.plotly_ancillary_line import PlotlyAncillaryLine
+from rti_python_plot.plotly.plotly_bottomtrack_range_line import PlotlyBottomTrackRangeLine
+from rti_python_plot.plotly.plotly_bottomtrack_beam_vel_line import PlotlyBottomTrackBeamVelocityLine
+from rti_python_plot.plotly.plotly_bottomtrack_vessel_speed import PlotlyBottomTrackVesselSpeedLine
+from rti_python_plot.plotly.plotly_bottomtrack_vessel_direction import PlotlyBottomTrackVesselDirectionLine
+from rti_python_plot.plotly.plotly_heatmap_mag import PlotlyHeatmapMag
+
+
+class DashboardPlot:
+    """
+    Result of a plot loaded by the PlotlySqliteDashboard.
+    """
+
+    def __init__(self, title: str, fig=None, df=None, error: Exception = None):
+        """
+        Set the result of the plot.
+        :param title: Title of the plot.
+        :param fig: Plotly figure.  None if there was an error.
+        :param df: Dataframe of the data plotted.  None if there was an error.
+        :param error: Error creating the plot.  None if there was no error.
+        """
+        self.title = title
+        self.fig = fig
+        self.df = df
+        self.error = error
+
+
+class PlotlySqliteDashboard:
+    """
+    Create all the sqlite plots for a dashboard at the same time.
+    Each plot is created in a thread of a thread pool.  Each thread uses its
+    own read only connection to the database, so the queries run at the same
+    time and the page is loaded in about the time of the slowest plot.
+    The results are returned in the order the plots were added.
+
+    dashboard = PlotlySqliteDashboard(db_file_path)
+    dashboard.add_all_plots()
+    for plot in dashboard.load():
+        plot.fig.show()
+    """
+
+    def __init__(self, db_file_path, window: QueryWindow = None, num_buckets: int = None, target_points: int = None, max_workers: int = None):
+        """
+        Initialize the dashboard.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, the line plots display the min/mean/max of this many time buckets.
+        :param target_points: If given, each line is reduced to this many points with LTTB.
+        :param max_workers: Number of threads.  Default is one for each plot, up to the number of CPUs plus 4.
+        """
+        self.db = RtiSqliteDb.get(db_file_path)
+        self.window = window
+        self.num_buckets = num_buckets
+        self.target_points = target_points
+        self.max_workers = max_workers
+
+        # Title, function and arguments of each plot
+        self.plots = []
+
+    def add_plot(self, title: str, func, *args, **kwargs):
+        """
+        Add a plot to the dashboard.
+        :param title: Title of the plot.
+        :param func: Function to create the plot.  It must return the figure and the dataframe.
+        :param args: Arguments for the function.
+        :param kwargs: Keyword arguments for the function.
+        """
+        self.plots.append((title, func, args, kwargs))
+
+    def add_all_plots(self):
+        """
+        Add all the sqlite plots to the dashboard.
+        """
+        db = self.db
+        window = self.window
+        num_buckets = self.num_buckets
+        target_points = self.target_points
+
+        self.add_plot("Voltage", PlotlyPowerLine.get_sqlite_plot, db, window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Status", PlotlyStatusLine.get_sqlite_plot, db, window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Heading/Pitch/Roll", PlotlyAncillaryLine.get_sqlite_plot_hpr, db, "Heading/Pitch/Roll", window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Water Temp/Speed of Sound", PlotlyAncillaryLine.get_sqlite_plot_sos_watertemp, db, "Water Temp/Speed of Sound", window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Water Temp/System Temp", PlotlyAncillaryLine.get_sqlite_plot_temp, db, "Water Temp/System Temp", window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Depth/Pressure", PlotlyAncillaryLine.get_sqlite_plot_pressure, db, "Depth/Pressure", window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Bottom Track Range", PlotlyBottomTrackRangeLine.get_sqlite_plot, db, window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Bottom Track Beam Velocity", PlotlyBottomTrackBeamVelocityLine.get_sqlite_plot, db, window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Bottom Track Vessel Speed", PlotlyBottomTrackVesselSpeedLine.get_sqlite_plot, db, window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Bottom Track Vessel Direction", PlotlyBottomTrackVesselDirectionLine.get_sqlite_plot, db, window=window, num_buckets=num_buckets, target_points=target_points)
+        self.add_plot("Water Magnitude", PlotlyHeatmapMag().get_sqlite_plot, db, window=window)
+
+    def load(self) -> list:
+        """
+        Create all the plots at the same time.
+        An error in one plot does not stop the other plots.
+        :return: List of DashboardPlot in the order the plots were added.
+        """
+        if not self.plots:
+            return []
+
+        max_workers = self.max_workers or min(len(self.plots), (os.cpu_count() or 1) + 4)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="SqliteDashboard") as executor:
+            futures = [(title, executor.submit(self._create_plot, func, args, kwargs)) for title, func, args, kwargs in self.plots]
+
+            # Get the results in the order the plots were added
+            results = []
+            for title, future in futures:
+                try:
+                    fig, df = future.result()
+                    results.append(DashboardPlot(title, fig, df))
+                except Exception as ex:
+                    results.append(DashboardPlot(title, error=ex))
+
+        return results
+
+    def _create_plot(self, func, args: tuple, kwargs: dict):
+        """
+        Create the plot in a worker thread.
+        The connection of the thread is closed when done, because the thread exits with the pool.
+        :param func: Function to create the plot.
+        :param args: Arguments for the function.
+        :param kwargs: Keyword arguments for the function.
+        :return: Figure and dataframe.
+        """
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.db.release_connection()
@@ -4,7 +4,11 @@ import plotly.graph_objects as go
 import numpy as np
 import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
-import sqlite3
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, ENS_COLUMNS_STATUS
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.utils.column_buffer import ColumnBuffer
+from rti_python_plot.plotly.plotly_history_trace import create_envelope_traces
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, DecodedEnsembleColumns, DATASET_ENSEMBLE_DATA
 
 
 class PlotlyStatusLine:
@@ -14,58 +18,83 @@ class PlotlyStatusLine:
     sqlite database file.
     """
 
-    def __init__(self):
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA,)
+
+    def __init__(self, max_ens: int = None, max_age=None):
         """
         Create the dataframe to store the data from the ensembles.
+        The status is a bit field, so the evicted data is not summarized.
+        :param max_ens: Maximum number of ensembles to keep.  None to keep all.
+        :param max_age: Maximum time span to keep, from the latest ensemble.  Ex: "6h".  None to keep all.
         """
         # Column for the dataframe
         self.df_columns = ["dt", "type", "ss_code", "ss_config", "status"]
-        # Use the load_data. notation to use variable within inner function
-        self.df_all_data = DataFrame({}, columns=self.df_columns)
+        # Buffer to accumulate the ensemble data
+        self.buffer = ColumnBuffer(self.df_columns, {"dt": "datetime64[ns]"}, max_ens=max_ens, max_age=max_age)
 
     def add_ens(self, ens):
         """
         Accumulate the Status data
         """
-        # Get the data from the Ensemble
-        if ens.IsEnsembleData:
-            # Get the information about the ensemble
-            dt = ens.EnsembleData.datetime()
-            ss_config = ens.EnsembleData.SubsystemConfig
-            ss_code = ens.EnsembleData.SysFirmwareSubsystemCode
-
-            # Create the DF strings
-            df_result = []
-            df_result.append([dt, Ensemble.CSV_STATUS, ss_code, ss_config, ens.EnsembleData.Status])
-
-            df_ss = DataFrame(df_result, columns=self.df_columns)
-
-            # Merge the data to the global dataframe buffer
-            if self.df_all_data.empty:
-                self.df_all_data = df_ss
-            else:
-                self.df_all_data = pd.concat([self.df_all_data, df_ss])
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
 
-    def get_plot(self):
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
+        """
+        Accumulate the Status data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        # Get the data from the Ensemble
+        if decoded_ens.is_ensemble_data:
+            # Add the status to the buffer
+            self.buffer.append_row([decoded_ens.dt,
+                                    Ensemble.CSV_STATUS,
+                                    decoded_ens.ss_code,
+                                    decoded_ens.ss_config,
+                                    decoded_ens.status])
+
+    def add_decoded_columns(self, ens_columns: DecodedEnsembleColumns):
+        """
+        Accumulate the Status data of multiple decoded ensembles at once.
+        :param ens_columns: Decoded ensembles stored as columns.
+        """
+        rows = ens_columns.column("is_ensemble_data")
+        num_rows = int(rows.sum())
+
+        # Add the status of each ensemble to the buffer
+        self.buffer.append_columns({"dt": ens_columns.column("dt")[rows],
+                                    "type": np.full(num_rows, Ensemble.CSV_STATUS, dtype=object),
+                                    "ss_code": ens_columns.column("ss_code")[rows].astype(object),
+                                    "ss_config": ens_columns.column("ss_config")[rows].astype(object),
+                                    "status": ens_columns.column("status")[rows].astype(object)},
+                                   chunk_sizes=np.ones(num_rows, dtype=np.int64))
+
+    def get_plot(self, target_points: int = None, x_range: tuple = None):
         """
         Get the Plotly Voltage Line Plot.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
+        :param x_range: Optional (start, end) datetimes.  Only the data in this time range is plotted.
         :return Plotly figure and a dataframe of the data used for the plot.
         """
         # Load the data from the file
         plot_title = "Status"
 
+        # Get all the accumulated data
+        df_all_data = self.buffer.to_df()
+
+        # Only plot the zoomed time range
+        if x_range:
+            df_all_data = df_all_data.loc[(df_all_data['dt'] >= pd.Timestamp(x_range[0])) & (df_all_data['dt'] <= pd.Timestamp(x_range[1]))]
+
         # Get all the voltage data
-        data = self.df_all_data.loc[self.df_all_data['type'] == Ensemble.CSV_STATUS]
+        data = df_all_data.loc[df_all_data['type'] == Ensemble.CSV_STATUS]
 
         # Get the data to plot
         dates = data['dt']
         vals = data['status']
 
         # Create the Bottom Track Range Line
-        line_plot = go.Scatter(
-            x=dates,
-            y=vals
-        )
+        line_plot = create_line_trace(dates, vals, target_points)
 
         # Combine all the plots
         plots = [line_plot]
@@ -83,33 +112,35 @@ class PlotlyStatusLine:
         return fig, data
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str):
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None):
         """
         Given the sqlite database, pull out all the data and plot it to fig.  Then return the figure
         and the dataframe of all the data plotted.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, get the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The dataframe keeps all the points.
         :return Plotly figure and dataframe of all data plotted.
         """
-        # Get an SQLite connection
-        conn = sqlite3.connect(db_file_path)
-
-        # Query and get a dataframe result
-        df_status = pd.read_sql_query("SELECT dateTime, status from ensembles; ", conn)
-
-        # Close SQLite connection
-        conn.close()
+        # Get the database
+        db = RtiSqliteDb.get(db_file_path)
 
         # Load the data from the file
         plot_title = "Status"
 
-        # Create the Voltage Line
-        line_plot = go.Scatter(
-            x=df_status['dateTime'],
-            y=df_status['status']
-        )
+        if num_buckets:
+            # Get the min/mean/max of each time bucket
+            df_status = db.ensembles_buckets(ENS_COLUMNS_STATUS, num_buckets, window)
+            plots = create_envelope_traces(df_status, 'status', "Status")
+        else:
+            # Get the columns from the ensembles table
+            df_status = db.ensembles_columns(ENS_COLUMNS_STATUS, window)
 
-        # Combine all the plots
-        plots = [line_plot]
+            # Create the Voltage Line
+            line_plot = create_line_trace(df_status['dateTime'], df_status['status'], target_points)
+
+            # Combine all the plots
+            plots = [line_plot]
 
         # Create the figure
         fig = go.Figure(data=plots)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+def extend_traces(fig: go.Figure, df: pd.DataFrame, x_column: str, y_columns: list, max_points: int = None):
+    """
+    Append the new rows to the existing traces of the figure.
+    Trace i gets the y_columns[i] values, so the traces must be in the same order as the columns.
+    :param fig: Plotly figure to update.
+    :param df: DataFrame of the new rows.
+    :param x_column: Column for the x values of all the traces.
+    :param y_columns: Column for the y values of each trace.
+    :param max_points: Maximum number of points to keep in each trace.  None to keep all.
+    :return: Plotly figure.
+    """
+    if df is None or df.empty:
+        return fig
+
+    new_x = df[x_column].to_numpy()
+    with fig.batch_update():
+        for trace, y_column in zip(fig.data, y_columns):
+            x = _append(trace.x, new_x)
+            y = _append(trace.y, df[y_column].to_numpy())
+
+            # Remove the oldest points
+            if max_points and len(x) > max_points:
+                x = x[-max_points:]
+                y = y[-max_points:]
+
+            trace.x = x
+            trace.y = y
+
+    return fig
+
+
+def _append(values, new_values: np.ndarray) -> np.ndarray:
+    """
+    Append the new values to the trace values.
+    :param values: Current values of the trace.  None if empty.
+    :param new_values: Values to add.
+    :return: Array of all the values.
+    """
+    if values is None or len(values) == 0:
+        return new_values
+    return np.concatenate([np.asarray(values), new_values])
@@ -0,0 +1,59 @@
+import plotly.graph_objects as go
+from rti_python_plot.utils.lttb import lttb_downsample
+
+
+# Number of points in a trace before it is drawn with WebGL instead of SVG.
+# Change this value to change the threshold of all the plots.
+WEBGL_THRESHOLD = 5000
+
+
+def use_webgl(num_points: int, webgl_threshold: int = None) -> bool:
+    """
+    Check if a trace with this many points should be drawn with WebGL.
+    :param num_points: Number of points in the trace.
+    :param webgl_threshold: Number of points to use WebGL.  None to use WEBGL_THRESHOLD.
+    :return: True if the trace should be a Scattergl.
+    """
+    if webgl_threshold is None:
+        webgl_threshold = WEBGL_THRESHOLD
+
+    return num_points > webgl_threshold
+
+
+def create_scatter_trace(x, y, webgl: bool = None, webgl_threshold: int = None, **kwargs):
+    """
+    Create a Scatter trace.  If there are more points than the threshold,
+    a Scattergl trace is created so the browser can pan and zoom smoothly.
+    The default mode of a Scattergl is markers, so the mode is set to lines
+    to look the same as a Scatter with many points.
+    :param x: X values.
+    :param y: Y values.
+    :param webgl: Force the type of trace.  None to check the number of points.
+    :param webgl_threshold: Number of points to use WebGL.  None to use WEBGL_THRESHOLD.
+    :param kwargs: Other properties of the trace.  Ex: name, mode, line
+    :return: Scatter or Scattergl trace.
+    """
+    if webgl is None:
+        webgl = use_webgl(len(y), webgl_threshold)
+
+    if webgl:
+        kwargs.setdefault('mode', 'lines')
+        return go.Scattergl(x=x, y=y, **kwargs)
+
+    return go.Scatter(x=x, y=y, **kwargs)
+
+
+def create_line_trace(x, y, target_points: int = None, webgl: bool = None, webgl_threshold: int = None, **kwargs):
+    """
+    Create a line trace.  The line is reduced to target_points with LTTB,
+    then drawn with WebGL if there are still more points than the threshold.
+    :param x: X values in increasing order.  Numbers or datetimes.
+    :param y: Y values.
+    :param target_points: If given, reduce the line to this many points with LTTB.
+    :param webgl: Force the type of trace.  None to check the number of points.
+    :param webgl_threshold: Number of points to use WebGL.  None to use WEBGL_THRESHOLD.
+    :param kwargs: Other properties of the trace.  Ex: name, mode, line
+    :return: Scatter or Scattergl trace.
+    """
+    x, y = lttb_downsample(x, y, target_points)
+    return create_scatter_trace(x, y, webgl, webgl_threshold, **kwargs)
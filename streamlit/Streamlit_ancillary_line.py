@@ -7,6 +7,9 @@ import datetime
 from rti_python.Ensemble.Ensemble import Ensemble
 import sqlite3
 from rti_python_plot.plotly.plotly_ancillary_line import PlotlyAncillaryLine
+from rti_python_plot.utils.rti_sqlite_db import QueryWindow
+from rti_python_plot.streamlit.streamlit_zoom import select_buffer_time_range, select_sqlite_window
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
 
 
 class StreamlitAncillaryLine:
@@ -15,6 +18,9 @@ class StreamlitAncillaryLine:
     from an sqlite file.
     """
 
+    # Datasets used from the ensemble
+    DATASETS = PlotlyAncillaryLine.DATASETS
+
     def __init__(self,
                  plot_heading: bool = True,
                  plot_pitch: bool = True,
@@ -23,7 +29,10 @@ class StreamlitAncillaryLine:
                  plot_sys_temp: bool = True,
                  plot_pressure: bool = True,
                  plot_xdcr_depth: bool = True,
-                 plot_sos: bool = True):
+                 plot_sos: bool = True,
+                 max_ens: int = None,
+                 max_age=None,
+                 summary_interval=None):
 
         # Set the options for the plot
         self.plotly_ancillary = PlotlyAncillaryLine(plot_heading=plot_heading,
@@ -33,7 +42,10 @@ class StreamlitAncillaryLine:
                                                     plot_sys_temp=plot_sys_temp,
                                                     plot_pressure=plot_pressure,
                                                     plot_xdcr_depth=plot_xdcr_depth,
-                                                    plot_sos=plot_sos)
+                                                    plot_sos=plot_sos,
+                                                    max_ens=max_ens,
+                                                    max_age=max_age,
+                                                    summary_interval=summary_interval)
 
     def add_ens(self, ens):
         """
@@ -42,15 +54,36 @@ class StreamlitAncillaryLine:
         """
         self.plotly_ancillary.add_ens(ens)
 
-    def get_plot_hpr(self):
+    def add_decoded_ens(self, decoded_ens):
+        """
+        Accumulate the ensemble Ancillary data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data from the EnsembleDispatcher.
+        """
+        self.plotly_ancillary.add_decoded_ens(decoded_ens)
+
+    def add_decoded_columns(self, ens_columns):
+        """
+        Accumulate the ensemble Ancillary data of multiple decoded ensembles at once.
+        :param ens_columns: Decoded ensembles stored as columns from the EnsembleParallelLoader.
+        """
+        self.plotly_ancillary.add_decoded_columns(ens_columns)
+
+    def get_plot_hpr(self, target_points: int = None, zoom_key: str = None):
         """
         Get the Plotly Voltage Line Plot.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The table keeps all the points.
+        :param zoom_key: If given, display a slider with this key to zoom into a time range.  The zoomed range is downsampled again.
         """
         # Load the data from the file
         plot_title = "Heading Pitch Roll"
 
         # Get the data from the accumulate plot
-        fig_hpr, df_hpr = self.plotly_ancillary.get_plot_hpr()
+        # Zoom into the selected time range
+        x_range = None
+        if zoom_key:
+            x_range = select_buffer_time_range(zoom_key, self.plotly_ancillary.buffer)
+
+        fig_hpr, df_hpr = self.plotly_ancillary.get_plot_hpr(target_points, x_range)
 
         # Create a Header
         st.subheader(plot_title)
@@ -59,17 +92,25 @@ class StreamlitAncillaryLine:
         st.write(df_hpr)
 
         # Create a streamlit plot
-        st.plotly_chart(fig_hpr)
+        st.plotly_chart(encode_figure(fig_hpr))
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str):
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None, zoom_key: str = None):
         """
         Get the plots from the sqlite database file.
-        :param db_file_path: Path to sqlite database file.
+        :param db_file_path: Path to sqlite database file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, plot the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The table keeps all the points.
+        :param zoom_key: If given, display a slider with this key to zoom into a time range.  The data is queried again for the range.
         """
+        # Zoom into the selected time range
+        if zoom_key:
+            window = select_sqlite_window(zoom_key, db_file_path, window)
+
         # Get an SQLite data plot
         plot_title = "Heading/Pitch/Roll"
-        fig_hpr, df_hpr = PlotlyAncillaryLine().get_sqlite_plot_hpr(db_file_path, plot_title)
+        fig_hpr, df_hpr = PlotlyAncillaryLine().get_sqlite_plot_hpr(db_file_path, plot_title, window=window, num_buckets=num_buckets, target_points=target_points)
 
         # Create a Header
         st.subheader(plot_title)
@@ -78,12 +119,12 @@ class StreamlitAncillaryLine:
         st.write(df_hpr)
 
         # Create a streamlit plot
-        st.plotly_chart(fig_hpr)
+        st.plotly_chart(encode_figure(fig_hpr))
 
         ################################
         # Get an SQLite data plot
         plot_title = "Water Temp/Speed of Sound"
-        fig_sos, df_sos = PlotlyAncillaryLine().get_sqlite_plot_sos_watertemp(db_file_path, plot_title)
+        fig_sos, df_sos = PlotlyAncillaryLine().get_sqlite_plot_sos_watertemp(db_file_path, plot_title, window=window, num_buckets=num_buckets, target_points=target_points)
 
         # Create a Header
         st.subheader(plot_title)
@@ -92,12 +133,12 @@ class StreamlitAncillaryLine:
         st.write(df_sos)
 
         # Create a streamlit plot
-        st.plotly_chart(fig_sos)
+        st.plotly_chart(encode_figure(fig_sos))
 
         ################################
         # Get an SQLite data plot
         plot_title = "Water Temp/System Temp"
-        fig_temp, df_temp = PlotlyAncillaryLine().get_sqlite_plot_temp(db_file_path, plot_title)
+        fig_temp, df_temp = PlotlyAncillaryLine().get_sqlite_plot_temp(db_file_path, plot_title, window=window, num_buckets=num_buckets, target_points=target_points)
 
         # Create a Header
         st.subheader(plot_title)
@@ -106,10 +147,10 @@ class StreamlitAncillaryLine:
         st.write(df_temp)
 
         # Create a streamlit plot
-        st.plotly_chart(fig_temp)
+        st.plotly_chart(encode_figure(fig_temp))
 
         plot_title = "Depth/Pressure"
-        fig_pressure, df_pressure = PlotlyAncillaryLine().get_sqlite_plot_pressure(db_file_path, plot_title)
+        fig_pressure, df_pressure = PlotlyAncillaryLine().get_sqlite_plot_pressure(db_file_path, plot_title, window=window, num_buckets=num_buckets, target_points=target_points)
 
         # Create a Header
         st.subheader(plot_title)
@@ -118,5 +159,5 @@ class StreamlitAncillaryLine:
         st.write(df_pressure)
 
         # Create a streamlit plot
-        st.plotly_chart(fig_pressure)
+        st.plotly_chart(encode_figure(fig_pressure))
 
@@ -1,5 +1,8 @@
 import streamlit as st
 from rti_python_plot.plotly.plotly_bottomtrack_vessel_speed import PlotlyBottomTrackVesselSpeedLine
+from rti_python_plot.utils.rti_sqlite_db import QueryWindow
+from rti_python_plot.streamlit.streamlit_zoom import select_sqlite_window
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
 
 
 class StreamlitBottomTrackVesselSpeedLine:
@@ -9,15 +12,23 @@ class StreamlitBottomTrackVesselSpeedLine:
     """
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 88.8):
+    def get_sqlite_plot(db_file_path: str, filter: bool = True, filter_max: float = 88.8, window: QueryWindow = None, num_buckets: int = None, target_points: int = None, zoom_key: str = None):
         """
         Use streamlit to plot the plotly plot for the Bottom Track Vessel Speed.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
         :param filter: Flag if the data should be filtered.
         :param filter_max: Maximum value to look for.  Default value is BAD_VELOCITY 88.88
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, plot the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The table keeps all the points.
+        :param zoom_key: If given, display a slider with this key to zoom into a time range.  The data is queried again for the range.
         """
+        # Zoom into the selected time range
+        if zoom_key:
+            window = select_sqlite_window(zoom_key, db_file_path, window)
+
         # Get an SQLite plotly data
-        fig, df_bt_speed = PlotlyBottomTrackVesselSpeedLine().get_sqlite_plot(db_file_path, filter=filter, filter_max=filter_max)
+        fig, df_bt_speed = PlotlyBottomTrackVesselSpeedLine().get_sqlite_plot(db_file_path, filter=filter, filter_max=filter_max, window=window, num_buckets=num_buckets, target_points=target_points)
 
         # Load the data from the file
         if filter:
@@ -32,5 +43,5 @@ class StreamlitBottomTrackVesselSpeedLine:
         st.write(df_bt_speed)
 
         # Create a streamlit plot
-        st.plotly_chart(fig)
+        st.plotly_chart(encode_figure(fig))
 
@@ -1,5 +1,8 @@
 import streamlit as st
 from rti_python_plot.plotly.plotly_heatmap_mag import PlotlyHeatmapMag
+from rti_python_plot.utils.rti_sqlite_db import QueryWindow
+from rti_python_plot.utils.ensemble_cube import HEATMAP_PYRAMID_LEVELS
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
 
 
 class StreamlitMagHeatmap:
@@ -8,24 +11,40 @@ class StreamlitMagHeatmap:
     This will get a plotly plot and use streamlit to display the data.
     """
 
-    def __init__(self):
-        self.plotly_hm = PlotlyHeatmapMag()
+    # Datasets used from the ensemble
+    DATASETS = PlotlyHeatmapMag.DATASETS
+
+    def __init__(self, cache_dir: str = None, pyramid_levels: int = HEATMAP_PYRAMID_LEVELS):
+        """
+        Create the plotly heatmap.
+        :param cache_dir: Optional directory to store the magnitude data in memory mapped files.
+        :param pyramid_levels: Number of time averaged levels to keep for long time ranges.  0 for no levels.
+        """
+        self.plotly_hm = PlotlyHeatmapMag(cache_dir, pyramid_levels)
 
     def add_ens(self, ens):
         """
-        Accumulate the Voltage data
+        Accumulate the Magnitude data
         :param ens: Ensemble data to accumulate.
         """
         self.plotly_hm.add_ens(ens)
 
-    def get_plot(self):
+    def add_decoded_ens(self, decoded_ens):
         """
-        Get the Plotly Voltage Line Plot.
+        Accumulate the Magnitude data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data from the EnsembleDispatcher.
+        """
+        self.plotly_hm.add_decoded_ens(decoded_ens)
+
+    def get_plot(self, max_columns: int = None):
+        """
+        Get the Plotly Magnitude Heatmap.
+        :param max_columns: If given, plot the time averaged level with at most this many columns.  Usually the width of the plot in pixels.
         """
         # Load the data from the file
-        plot_title = "Voltage"
+        plot_title = "Water Magnitude"
 
-        fig, data = self.plotly_hm.get_plot()
+        fig, data = self.plotly_hm.get_plot(max_columns=max_columns)
 
         # Create a Header
         st.subheader(plot_title)
@@ -34,16 +53,18 @@ class StreamlitMagHeatmap:
         st.write(data)
 
         # Create a streamlit plot
-        st.plotly_chart(fig)
+        st.plotly_chart(encode_figure(fig))
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str):
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, max_columns: int = None):
         """
         Use streamlit to plot the plotly plot for the power.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param max_columns: If given, plot the time averaged level with at most this many columns.  Usually the width of the plot in pixels.
         """
         # Get an SQLite plotly data
-        fig, df_hm = PlotlyHeatmapMag().get_sqlite_plot(db_file_path)
+        fig, df_hm = PlotlyHeatmapMag().get_sqlite_plot(db_file_path, window=window, max_columns=max_columns)
 
         # Load the data from the file
         plot_title = "Water Magnitude"
@@ -55,5 +76,5 @@ class StreamlitMagHeatmap:
         st.write(df_hm)
 
         # Create a streamlit plot
-        st.plotly_chart(fig)
+        st.plotly_chart(encode_figure(fig))
 
@@ -1,5 +1,8 @@
 import streamlit as st
 from rti_python_plot.plotly.plotly_power_line import PlotlyPowerLine
+from rti_python_plot.utils.rti_sqlite_db import QueryWindow
+from rti_python_plot.streamlit.streamlit_zoom import select_buffer_time_range, select_sqlite_window
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
 
 
 class StreamlitPowerLine:
@@ -8,8 +11,17 @@ class StreamlitPowerLine:
     This will get a plotly plot and use streamlit to display the data.
     """
 
-    def __init__(self):
-        self.plotly_pwr = PlotlyPowerLine()
+    # Datasets used from the ensemble
+    DATASETS = PlotlyPowerLine.DATASETS
+
+    def __init__(self, max_ens: int = None, max_age=None, summary_interval=None):
+        """
+        Create the plotly plot.
+        :param max_ens: Maximum number of ensembles to keep.  None to keep all.
+        :param max_age: Maximum time span to keep, from the latest ensemble.  Ex: "6h".  None to keep all.
+        :param summary_interval: If given, the evicted data is kept as a min/mean/max summary with this interval.  Ex: "10min".
+        """
+        self.plotly_pwr = PlotlyPowerLine(max_ens, max_age, summary_interval)
 
     def add_ens(self, ens):
         """
@@ -18,14 +30,35 @@ class StreamlitPowerLine:
         """
         self.plotly_pwr.add_ens(ens)
 
-    def get_plot(self):
+    def add_decoded_ens(self, decoded_ens):
+        """
+        Accumulate the Voltage data from the decoded ensemble.
+        :param decoded_ens: Decoded ensemble data from the EnsembleDispatcher.
+        """
+        self.plotly_pwr.add_decoded_ens(decoded_ens)
+
+    def add_decoded_columns(self, ens_columns):
+        """
+        Accumulate the Voltage data of multiple decoded ensembles at once.
+        :param ens_columns: Decoded ensembles stored as columns from the EnsembleParallelLoader.
+        """
+        self.plotly_pwr.add_decoded_columns(ens_columns)
+
+    def get_plot(self, target_points: int = None, zoom_key: str = None):
         """
         Get the Plotly Voltage Line Plot.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The table keeps all the points.
+        :param zoom_key: If given, display a slider with this key to zoom into a time range.  The zoomed range is downsampled again.
         """
         # Load the data from the file
         plot_title = "Voltage"
 
-        fig, data = self.plotly_pwr.get_plot()
+        # Zoom into the selected time range
+        x_range = None
+        if zoom_key:
+            x_range = select_buffer_time_range(zoom_key, self.plotly_pwr.buffer)
+
+        fig, data = self.plotly_pwr.get_plot(target_points, x_range)
 
         # Create a Header
         st.subheader(plot_title)
@@ -34,16 +67,24 @@ class StreamlitPowerLine:
         st.write(data)
 
         # Create a streamlit plot
-        st.plotly_chart(fig)
+        st.plotly_chart(encode_figure(fig))
 
     @staticmethod
-    def get_sqlite_plot(db_file_path: str):
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None, zoom_key: str = None):
         """
         Use streamlit to plot the plotly plot for the power.
-        :param db_file_path: File path to the sqlite db file.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, plot the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The table keeps all the points.
+        :param zoom_key: If given, display a slider with this key to zoom into a time range.  The data is queried again for the range.
         """
+        # Zoom into the selected time range
+        if zoom_key:
+            window = select_sqlite_window(zoom_key, db_file_path, window)
+
         # Get an SQLite plotly data
-        fig, df_volt = PlotlyPowerLine().get_sqlite_plot(db_file_path)
+        fig, df_volt = PlotlyPowerLine().get_sqlite_plot(db_file_path, window=window, num_buckets=num_buckets, target_points=target_points)
 
         # Load the data from the file
         plot_title = "Voltage"
@@ -55,5 +96,5 @@ class StreamlitPowerLine:
         st.write(df_volt)
 
         # Create a streamlit plot
-        st.plotly_chart(fig)
+        st.plotly_chart(encode_figure(fig))
 
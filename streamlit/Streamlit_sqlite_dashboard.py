@@ -0,0 +1,44 @@
+import streamlit as st
+from rti_python_plot.plotly.plotly_sqlite_dashboard import PlotlySqliteDashboard
+from rti_python_plot.utils.rti_sqlite_db import QueryWindow
+from rti_python_plot.streamlit.streamlit_zoom import select_sqlite_window
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
+
+
+class StreamlitSqliteDashboard:
+    """
+    Display all the sqlite plots with streamlit.
+    The plots are created at the same time, then displayed in order.
+    """
+
+    @staticmethod
+    def get_sqlite_plot(db_file_path: str, window: QueryWindow = None, num_buckets: int = None, target_points: int = None, zoom_key: str = None):
+        """
+        Use streamlit to plot all the plotly plots from the sqlite database.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param num_buckets: If given, plot the min/mean/max of this many time buckets instead of every row.  Usually the width of the plot in pixels.
+        :param target_points: If given, reduce each line to this many points with LTTB.  The table keeps all the points.
+        :param zoom_key: If given, display a slider with this key to zoom into a time range.  The data is queried again for the range.
+        """
+        # Zoom into the selected time range
+        if zoom_key:
+            window = select_sqlite_window(zoom_key, db_file_path, window)
+
+        # Create all the plots at the same time
+        dashboard = PlotlySqliteDashboard(db_file_path, window=window, num_buckets=num_buckets, target_points=target_points)
+        dashboard.add_all_plots()
+
+        for plot in dashboard.load():
+            # Create a Header
+            st.subheader(plot.title)
+
+            if plot.error:
+                st.error("Error creating the plot: " + str(plot.error))
+                continue
+
+            # Display a table of the data
+            st.write(plot.df)
+
+            # Create a streamlit plot
+            st.plotly_chart(encode_figure(plot.fig))
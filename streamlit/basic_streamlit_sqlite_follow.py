@@ -0,0 +1,64 @@
+import time
+import streamlit as st
+import plotly.graph_objects as go
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
+from rti_python_plot.plotly.plotly_heatmap_mag import PlotlyHeatmapMag
+from rti_python_plot.plotly.plotly_trace_extend import extend_traces
+from rti_python_plot.plotly.plotly_trace_factory import create_scatter_trace, use_webgl
+from rti_python_plot.utils.rti_sqlite_db import QUERY_BT_RANGE, QUERY_HEATMAP_BT_RANGE, QUERY_HEATMAP_MAG
+from rti_python_plot.utils.sqlite_tail_follower import SqliteTailFollower
+
+
+# Seconds to wait before reading the new ensembles
+REFRESH_INTERVAL = 2.0
+
+# Maximum number of points kept in the line plot
+MAX_POINTS = 10000
+
+st.title("RTI SQLite Follow")
+
+
+@st.cache(allow_output_mutation=True)
+def start_following(db_file_path: str):
+    """
+    Create the follower and the plots.  This is cached, so every
+    rerun of the page only adds the new ensembles to the same plots.
+    :param db_file_path: File path to the sqlite db file.
+    :return: Follower, heatmap and bottom track range figure.
+    """
+    follower = SqliteTailFollower(db_file_path, {"BT Range": QUERY_BT_RANGE,
+                                                 "Heatmap BT Range": QUERY_HEATMAP_BT_RANGE,
+                                                 "Heatmap Magnitude": QUERY_HEATMAP_MAG})
+    heatmap = PlotlyHeatmapMag()
+
+    # Empty line for each beam.  The lines grow up to MAX_POINTS, so use WebGL if that is many points.
+    webgl = use_webgl(MAX_POINTS)
+    fig_bt_range = go.Figure(data=[create_scatter_trace([], [], webgl=webgl, name="Range Beam " + str(beam)) for beam in range(4)])
+    fig_bt_range.update_layout(title="Bottom Track Range", xaxis_title="DateTime", yaxis_title="Range (m)")
+
+    return follower, heatmap, fig_bt_range
+
+
+# Get the database to follow
+db_file_path = st.text_input("SQLite Database File Path")
+if not db_file_path:
+    st.stop()
+
+follower, heatmap, fig_bt_range = start_following(db_file_path)
+
+# Add the ensembles written since the last refresh
+new_data = follower.poll()
+if new_data:
+    heatmap.add_sqlite_df(new_data["Heatmap BT Range"], new_data["Heatmap Magnitude"])
+    extend_traces(fig_bt_range, new_data["BT Range"], "dateTime",
+                  ["rangeBeam0", "rangeBeam1", "rangeBeam2", "rangeBeam3"],
+                  max_points=MAX_POINTS)
+
+st.text("Last ensemble id: " + str(follower.last_id))
+
+st.plotly_chart(encode_figure(heatmap.create_figure()))
+st.plotly_chart(encode_figure(fig_bt_range))
+
+# Refresh the page to read the new ensembles
+time.sleep(REFRESH_INTERVAL)
+st.experimental_rerun()
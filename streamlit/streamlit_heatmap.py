@@ -4,15 +4,32 @@ import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
 import datetime
+from rti_python_plot.utils.column_buffer import ColumnBuffer, ENS_DF_COLUMNS, ENS_DF_DTYPES
+from rti_python_plot.utils.ensemble_cube import EnsembleCube, HEATMAP_PYRAMID_LEVELS
+from rti_python_plot.plotly.plotly_trace_factory import create_line_trace
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, bad_velocity_mask, DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK, DATASET_EARTH_VELOCITY
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
 
 
 class StreamlitHeatmap:
 
-    def __init__(self):
-        self.df_earth_columns = ["dt", "type", "ss_code", "ss_config", "bin_num", "beam", "blank", "bin_size", "val"]
-        # Use the load_data. notation to use variable within inner function
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK, DATASET_EARTH_VELOCITY)
+
+    def __init__(self, cache_dir: str = None, pyramid_levels: int = HEATMAP_PYRAMID_LEVELS):
+        """
+        Initialize the buffers to accumulate the ensemble data.
+        :param cache_dir: Optional directory to store the Magnitude and Direction in memory mapped files.
+        :param pyramid_levels: Number of time averaged levels to keep for long time ranges.  0 for no levels.
+        """
+        self.df_earth_columns = ENS_DF_COLUMNS
         self.ens_count = 0
-        self.df_all_earth = DataFrame({}, columns=self.df_earth_columns)
+
+        # Buffer to accumulate the Bottom Track Range data
+        self.buffer = ColumnBuffer(self.df_earth_columns, ENS_DF_DTYPES)
+
+        # Magnitude and Direction data [ensembles, bins]
+        self.cube = EnsembleCube({"mag": 1, "dir": 1}, cache_dir=cache_dir, pyramid_levels=pyramid_levels, pyramid_circular=("dir",))
 
         # Remove Ship Speed
         self.prev_bt_east = 0.0
@@ -33,103 +50,123 @@ class StreamlitHeatmap:
         :param ens: Ensemble to process.
         :return:
         """
-        if ens.EarthVelocity:
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
+
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
+        """
+        Accumulate the Earth Velocity data from the decoded ensemble.
+        The vessel speed is removed using the previous Bottom Track velocity.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        if decoded_ens.is_earth_velocity:
             # Remove Ship speed
-            ens.EarthVelocity.remove_vessel_speed(self.prev_bt_east,
-                                                  self.prev_bt_north,
-                                                  self.prev_bt_vertical)
+            earth_vel, mag, direction = decoded_ens.remove_vessel_speed(self.prev_bt_east,
+                                                                        self.prev_bt_north,
+                                                                        self.prev_bt_vertical)
 
             # Keep track of previous BT speed
-            if ens.IsBottomTrack and ens.BottomTrack.NumBeams >= 3:
-                self.prev_bt_east = ens.BottomTrack.EarthVelocity[0]
-                self.prev_bt_north = ens.BottomTrack.EarthVelocity[1]
-                self.prev_bt_vertical = ens.BottomTrack.EarthVelocity[2]
-                df_bt = ens.BottomTrack.encode_df(ens.EnsembleData.datetime(),
-                                                       ens.EnsembleData.SysFirmwareSubsystemCode,
-                                                       ens.EnsembleData.SubsystemConfig)
-
-                # Merge the data to the global buffer
-                if self.df_all_earth.empty:
-                    self.df_all_earth = df_bt
-                else:
-                    #df_all_earth.append(df_earth, ignore_index=True, sort=False)
-                    self.df_all_earth = pd.concat([self.df_all_earth, df_bt])
+            if decoded_ens.is_bottom_track and decoded_ens.bt_num_beams >= 3:
+                self.prev_bt_east = decoded_ens.bt_earth_vel[0]
+                self.prev_bt_north = decoded_ens.bt_earth_vel[1]
+                self.prev_bt_vertical = decoded_ens.bt_earth_vel[2]
+
+                # Add the Bottom Track Average Range to the buffer
+                self.buffer.append_columns(decoded_ens.long_form("BT_Avg_Range", decoded_ens.bt_avg_range))
 
             # Create Dataframe
-            if ens.IsAncillaryData and ens.IsEnsembleData:
-                self.blank = ens.AncillaryData.FirstBinRange
-                self.bin_size = ens.AncillaryData.BinSize
-
-                df_earth = ens.EarthVelocity.encode_df(ens.EnsembleData.datetime(),
-                                                       ens.EnsembleData.SysFirmwareSubsystemCode,
-                                                       ens.EnsembleData.SubsystemConfig,
-                                                       0.0,                                 # Replace BadVelocity
-                                                       0.0,                                 # Replace BadVelocity
-                                                       False,                               # Do not include bad velocity
-                                                       False)                               # Do not include bad velocity
+            if decoded_ens.is_ancillary_data and decoded_ens.is_ensemble_data:
+                self.blank = decoded_ens.blank
+                self.bin_size = decoded_ens.bin_size
 
                 # Check if upward or downward looking
-                self.is_upward_looking = ens.AncillaryData.is_upward_facing()
+                self.is_upward_looking = decoded_ens.is_upward_looking
 
                 self.ens_count = self.ens_count + 1
 
-                # Convert to dataframe
-                #df_earth = DataFrame(dict_earth, columns=df_earth_columns)
+                # Add the Magnitude and Direction for each bin to the cube
+                # Replace BadVelocity with NaN, so the time averaged levels skip the bad data
+                self.cube.set_bin_config(self.blank, self.bin_size, self.is_upward_looking)
+                self.cube.append(decoded_ens.dt, {"mag": np.where(bad_velocity_mask(mag), np.nan, mag),
+                                                  "dir": np.where(bad_velocity_mask(direction), np.nan, direction)})
 
-                # Merge the data to the global buffer
-                if self.df_all_earth.empty:
-                    self.df_all_earth = df_earth
-                else:
-                    #df_all_earth.append(df_earth, ignore_index=True, sort=False)
-                    self.df_all_earth = pd.concat([self.df_all_earth, df_earth])
+    def get_cube_df(self, name: str, start=None, end=None) -> DataFrame:
+        """
+        Get the data from the cube as a DataFrame.  Each row is an ensemble
+        and each column is a bin number.  Only the time window is read.
+        :param name: Quantity name in the cube.
+        :param start: Optional start datetime of the time window.
+        :param end: Optional end datetime of the time window.
+        :return: DataFrame of the data.
+        """
+        index = self.cube.window(start, end)
+        return DataFrame(self.cube.heatmap(name, index=index).T, index=self.cube.time_axis(index))
 
-    @st.cache
-    def get_mag_data(self):
+    def get_mag_data(self, start=None, end=None):
         """
-        Get the Water Velocity Magnitude data from the global dataframe.
+        Get the Water Velocity Magnitude data from the cube.
+        :param start: Optional start datetime of the time window.
+        :param end: Optional end datetime of the time window.
         """
-        return self.df_all_earth.loc[self.df_all_earth['type'] == "Magnitude"]
+        return self.get_cube_df("mag", start, end)
 
-    @st.cache
-    def get_dir_data(self):
+    def get_dir_data(self, start=None, end=None):
         """
-        Get the Water Direction data from the global dataframe.
+        Get the Water Direction data from the cube.
+        :param start: Optional start datetime of the time window.
+        :param end: Optional end datetime of the time window.
         """
-        return self.df_all_earth.loc[self.df_all_earth['type'] == "Direction"]
+        return self.get_cube_df("dir", start, end)
 
-    @st.cache
     def get_avg_range_data(self):
         """
         Get the Average Range data from the global dataframe.
         """
-        return self.df_all_earth.loc[self.df_all_earth['type'] == "BT_Avg_Range"]
+        df_all_earth = self.buffer.to_df()
+        return df_all_earth.loc[df_all_earth['type'] == "BT_Avg_Range"]
 
-    def get_plot(self, plot_type: str = "mag"):
+    def get_bt_range(self, index: slice = None) -> tuple:
         """
-        Get the Plotly Magnitude Heatmap.
+        Get the Bottom Track Average Range within the time of the cube window.
+        The buffer is in time order, so only the rows of the window are read.
+        :param index: Optional slice of the ensembles from the cube window().
+        :return: Datetime and range of each Bottom Track Average Range.
+        """
+        bt_dt = self.buffer.column("dt")
+        bt_range = self.buffer.column("val")
+
+        dates = self.cube.time_axis(index)
+        if len(dates) == 0:
+            return bt_dt[:0], bt_range[:0]
+
+        first = np.searchsorted(bt_dt, dates[0], side='left')
+        last = np.searchsorted(bt_dt, dates[-1], side='right')
+        return bt_dt[first:last], bt_range[first:last]
+
+    def get_figure(self, plot_type: str = "mag", start=None, end=None, max_columns: int = None) -> go.Figure:
+        """
+        Create the Plotly Heatmap figure.  Only the time window is read, and the
+        size of the figure depends on max_columns and not on the length of the record.
+        The z matrix is copied, so the figure can be displayed while more ensembles are added.
         :param plot_type: "mag" will plot magnitude data.  "dir" will plot direction data.
+        :param start: Optional start datetime of the time window to display.
+        :param end: Optional end datetime of the time window to display.
+        :param max_columns: If given, plot the time averaged level with at most this many columns and reduce the Bottom Track line to this many points.  Usually the width of the plot in pixels.
+        :return: Plotly figure.
         """
-        # Load the data from the file
         if plot_type == "dir":
-            data = self.get_dir_data()
+            quantity = "dir"
             plot_title = "Water Direction"
         else:
-            data = self.get_mag_data()
+            quantity = "mag"
             plot_title = "Water Velocity Magnitude"
 
-        # Get the bottom range values
-        bt_range = self.get_avg_range_data()
-
-        st.subheader("Heatmap")
-        bin_nums = data['bin_num']
-        bin_depth = (data['bin_num'] * self.bin_size) + self.blank
-        dates = data['dt']
-        z = data['val']
-
-        st.write(data)
-        st.write(bt_range)
-        #st.write(bin_nums)
-        #st.write(bin_depth)
+        # The z matrix is [bins, ensembles] of the cube
+        # Use the time averaged level that fits in the plot width
+        index = self.cube.window(start, end)
+        level, level_index = self.cube.level(max_columns, index)
+        bin_depth = self.cube.bin_depths()
+        dates = level.time_axis(level_index).copy()
+        z = np.array(level.heatmap(quantity, index=level_index))
 
         # Create the heatmap
         heatmap = go.Heatmap(
@@ -138,11 +175,9 @@ class StreamlitHeatmap:
             y=bin_depth,
             colorscale='Cividis')  # Viridis, Inferno, Cividis, RdBu, Bluered_r, ["red", "green", "blue"]), [(0, "red"), (0.5, "green"), (1, "blue")]
 
-        # Create the Bottom Track Range Line
-        bt_line = go.Scatter(
-            x=bt_range['dt'],
-            y=bt_range['val']
-        )
+        # Create the Bottom Track Range Line within the window
+        bt_dt, bt_range = self.get_bt_range(index)
+        bt_line = create_line_trace(bt_dt, bt_range, target_points=max_columns)
 
         plots = [heatmap, bt_line]
 
@@ -152,14 +187,34 @@ class StreamlitHeatmap:
             fig.update_layout(
                 title=plot_title,
                 xaxis_title="DateTime",
-                yaxis_title="Bin Number"
+                yaxis_title="Bin Depth (m)"
             )
         else:
             fig.update_layout(
                 title=plot_title,
                 xaxis_title="DateTime",
-                yaxis_title="Bin Number",
+                yaxis_title="Bin Depth (m)",
                 yaxis_autorange='reversed'  # Downward looking 'reversed'
             )
 
-        st.plotly_chart(fig)
\ No newline at end of file
+        return fig
+
+    def get_plot(self, plot_type: str = "mag", start=None, end=None, max_columns: int = None):
+        """
+        Display the Plotly Heatmap.
+        :param plot_type: "mag" will plot magnitude data.  "dir" will plot direction data.
+        :param start: Optional start datetime of the time window to display.
+        :param end: Optional end datetime of the time window to display.
+        :param max_columns: If given, plot the time averaged level with at most this many columns.  Usually the width of the plot in pixels.
+        """
+        fig = self.get_figure(plot_type, start, end, max_columns)
+        self.display_figure(fig)
+
+    @staticmethod
+    def display_figure(fig: go.Figure):
+        """
+        Display the heatmap figure from get_figure().
+        :param fig: Plotly figure.
+        """
+        st.subheader("Heatmap")
+        st.plotly_chart(encode_figure(fig))
@@ -4,15 +4,23 @@ import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
 import datetime
+from rti_python_plot.utils.column_buffer import ColumnBuffer, ENS_DF_COLUMNS, ENS_DF_DTYPES
+from rti_python_plot.plotly.plotly_trace_factory import create_scatter_trace
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, bad_velocity_mask, DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK, DATASET_EARTH_VELOCITY
+from rti_python_plot.plotly.plotly_figure_encoder import encode_figure
 
 
 class StreamlitMagDirLine:
 
+    # Datasets used from the ensemble
+    DATASETS = (DATASET_ENSEMBLE_DATA, DATASET_ANCILLARY_DATA, DATASET_BOTTOM_TRACK, DATASET_EARTH_VELOCITY)
+
     def __init__(self):
-        self.df_earth_columns = ["dt", "type", "ss_code", "ss_config", "bin_num", "beam", "blank", "bin_size", "val"]
-        # Use the load_data. notation to use variable within inner function
+        self.df_earth_columns = ENS_DF_COLUMNS
         self.ens_count = 0
-        self.df_all_earth = DataFrame({}, columns=self.df_earth_columns)
+
+        # Buffer to accumulate all the ensemble data
+        self.buffer = ColumnBuffer(self.df_earth_columns, ENS_DF_DTYPES)
 
         # Remove Ship Speed
         self.prev_bt_east = 0.0
@@ -33,56 +41,58 @@ class StreamlitMagDirLine:
         :param ens: Ensemble to process.
         :return:
         """
-        if ens.EarthVelocity:
+        self.add_decoded_ens(DecodedEnsemble(ens, self.DATASETS))
+
+    def add_decoded_ens(self, decoded_ens: DecodedEnsemble):
+        """
+        Accumulate the Earth Velocity data from the decoded ensemble.
+        The vessel speed is removed using the previous Bottom Track velocity.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        if decoded_ens.is_earth_velocity:
             # Remove Ship speed
-            ens.EarthVelocity.remove_vessel_speed(self.prev_bt_east,
-                                                  self.prev_bt_north,
-                                                  self.prev_bt_vertical)
+            earth_vel, mag, direction = decoded_ens.remove_vessel_speed(self.prev_bt_east,
+                                                                        self.prev_bt_north,
+                                                                        self.prev_bt_vertical)
 
             # Keep track of previous BT speed
-            if ens.IsBottomTrack and ens.BottomTrack.NumBeams >= 3:
-                self.prev_bt_east = ens.BottomTrack.EarthVelocity[0]
-                self.prev_bt_north = ens.BottomTrack.EarthVelocity[1]
-                self.prev_bt_vertical = ens.BottomTrack.EarthVelocity[2]
+            if decoded_ens.is_bottom_track and decoded_ens.bt_num_beams >= 3:
+                self.prev_bt_east = decoded_ens.bt_earth_vel[0]
+                self.prev_bt_north = decoded_ens.bt_earth_vel[1]
+                self.prev_bt_vertical = decoded_ens.bt_earth_vel[2]
 
             # Create Dataframe
-            if ens.IsAncillaryData and ens.IsEnsembleData:
-                df_earth = ens.EarthVelocity.encode_df(ens.EnsembleData.datetime(),
-                                                       ens.EnsembleData.SysFirmwareSubsystemCode,
-                                                       ens.EnsembleData.SubsystemConfig,
-                                                       0.0,                                 # Replace BadVelocity
-                                                       0.0,                                 # Replace BadVelocity
-                                                       False,                               # Do not include bad velocity
-                                                       False)                               # Do not include bad velocity
-
+            if decoded_ens.is_ancillary_data and decoded_ens.is_ensemble_data:
                 # Check if upward or downward looking
-                self.is_upward_looking = ens.AncillaryData.is_upward_facing()
+                self.is_upward_looking = decoded_ens.is_upward_looking
 
                 self.ens_count = self.ens_count + 1
 
-                # Convert to dataframe
-                #df_earth = DataFrame(dict_earth, columns=df_earth_columns)
-
-                # Merge the data to the global buffer
-                if self.df_all_earth.empty:
-                    self.df_all_earth = df_earth
-                else:
-                    #df_all_earth.append(df_earth, ignore_index=True, sort=False)
-                    self.df_all_earth = pd.concat([self.df_all_earth, df_earth])
+                # Add the Magnitude and Direction for each bin to the buffer
+                # Replace BadVelocity with 0.0
+                bin_nums = np.arange(len(mag))
+                self.buffer.append_columns(decoded_ens.long_form("Magnitude",
+                                                                 np.where(bad_velocity_mask(mag), 0.0, mag),
+                                                                 bin_num=bin_nums))
+                self.buffer.append_columns(decoded_ens.long_form("Direction",
+                                                                 np.where(bad_velocity_mask(direction), 0.0, direction),
+                                                                 bin_num=bin_nums))
 
     @st.cache
     def get_mag_data(self):
         """
         Get the Water Velocity Magnitude data from the global dataframe.
         """
-        return self.df_all_earth.loc[self.df_all_earth['type'] == "Magnitude"]
+        df_all_earth = self.buffer.to_df()
+        return df_all_earth.loc[df_all_earth['type'] == "Magnitude"]
 
     @st.cache
     def get_dir_data(self):
         """
         Get the Water Velocity Magnitude data from the global dataframe.
         """
-        return self.df_all_earth.loc[self.df_all_earth['type'] == "Direction"]
+        df_all_earth = self.buffer.to_df()
+        return df_all_earth.loc[df_all_earth['type'] == "Direction"]
 
     def get_bin_selector(self, min_bin:int=0, max_bin:int=200):
         self.selected_bins = st.multiselect(
@@ -93,17 +103,20 @@ class StreamlitMagDirLine:
 
         return self.selected_bins
 
-    def get_plot(self, plot_type:str="mag"):
+    def get_plot(self, plot_type:str="mag", data: DataFrame = None):
         """
         Get the Plotly Magnitude Line Plot.
         :param plot_type: "mag" will plot magnitude data.  "dir" will plot direction data.
+        :param data: Optional data already read with get_mag_data() or get_dir_data().  None to read the buffer.
         """
         # Load the data from the file
         if plot_type == "dir":
-            data = self.get_dir_data()
+            if data is None:
+                data = self.get_dir_data()
             plot_title = "Water Direction"
         else:
-            data = self.get_mag_data()
+            if data is None:
+                data = self.get_mag_data()
             plot_title = "Water Velocity Magnitude"
 
         # data = data.loc[data["bin_num"] == selected_bins[0]]
@@ -120,15 +133,12 @@ class StreamlitMagDirLine:
         vals = sel_bin_data['val']
 
         # Create the Bottom Track Range Line
-        line_plot = go.Scatter(
-            x=dates,
-            y=vals
-        )
+        line_plot = create_scatter_trace(dates, vals)
 
         plots = [line_plot]
 
         fig = go.Figure(data=plots)
 
-        st.plotly_chart(fig)
+        st.plotly_chart(encode_figure(fig))
 
         #st.line_chart(min_data)
\ No newline at end of file
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow
+
+
+def select_time_range(key: str, first, last, label: str = "Time Range") -> tuple:
+    """
+    Display a slider to zoom into a time range of a plot.
+    The selected range is kept in the session state, so it is the same on each rerun
+    of the page.  If the data grows, the selected range is kept within the data.
+    :param key: Unique key of the slider.
+    :param first: First datetime of the data.
+    :param last: Last datetime of the data.
+    :param label: Label of the slider.
+    :return: Start and end datetime of the selected range.
+    """
+    first = pd.Timestamp(first).to_pydatetime()
+    last = pd.Timestamp(last).to_pydatetime()
+    if first >= last:
+        return first, last
+
+    if key in st.session_state:
+        # Keep the selected range within the data
+        start, end = st.session_state[key]
+        start = min(max(start, first), last)
+        end = min(max(end, start), last)
+        st.session_state[key] = (start, end)
+        return st.slider(label, min_value=first, max_value=last, key=key)
+
+    return st.slider(label, min_value=first, max_value=last, value=(first, last), key=key)
+
+
+def select_buffer_time_range(key: str, buffer, label: str = "Time Range"):
+    """
+    Display a slider to zoom into the time range of the data in the buffer.
+    :param key: Unique key of the slider.
+    :param buffer: ColumnBuffer with a dt column.
+    :param label: Label of the slider.
+    :return: Start and end datetime of the selected range.  None if there is no data.
+    """
+    dates = buffer.column("dt")
+    if len(dates) == 0:
+        return None
+
+    return select_time_range(key, np.min(dates), np.max(dates), label)
+
+
+def select_sqlite_window(key: str, db_file_path, window: QueryWindow = None, label: str = "Time Range") -> QueryWindow:
+    """
+    Display a slider to zoom into the time range of the ensembles in the database.
+    The plot is queried again for the selected range, so the downsampled plot
+    gets more detail as the range gets smaller.
+    :param key: Unique key of the slider.
+    :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+    :param window: Ensembles to read.  None to read all the ensembles.
+    :param label: Label of the slider.
+    :return: Window of the selected time range.
+    """
+    time_range = RtiSqliteDb.get(db_file_path).time_range(window)
+    if time_range is None:
+        return window
+
+    start, end = select_time_range(key, time_range[0], time_range[1], label)
+    return (window or QueryWindow()).zoom(start, end)
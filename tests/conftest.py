@@ -0,0 +1,16 @@
+import os
+import sys
+import importlib.machinery
+import importlib.util
+
+
+# The repository is used as the rti_python_plot package.  If it is not cloned
+# in a folder named rti_python_plot on the path, register it under that name.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import rti_python_plot
+except ImportError:
+    spec = importlib.machinery.ModuleSpec("rti_python_plot", None, is_package=True)
+    spec.submodule_search_locations = [REPO_DIR]
+    sys.modules["rti_python_plot"] = importlib.util.module_from_spec(spec)
@@ -0,0 +1,64 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from rti_python_plot.utils.bad_value_filter import bad_value_mask, filter_values, filter_columns, sql_filter_case
+
+
+BAD_VELOCITY = 88.888
+
+
+def test_zero_is_good():
+    """
+    0.0 is a good value.  Only NaN, values larger than max_abs and the bad value are removed.
+    """
+    values = np.array([0.0, 1.5, -2.0, BAD_VELOCITY, np.nan, 150.0, -150.0])
+    filtered = filter_values(values, max_abs=100.0, bad_value=BAD_VELOCITY)
+
+    np.testing.assert_array_equal(filtered[:3], [0.0, 1.5, -2.0])
+    assert np.isnan(filtered[3:]).all()
+
+
+def test_mask_2d():
+    """
+    Multiple columns are checked at once.
+    """
+    mask = bad_value_mask([[0.0, BAD_VELOCITY + 0.0005], [np.inf, 3.0]], bad_value=BAD_VELOCITY)
+    np.testing.assert_array_equal(mask, [[False, True], [True, False]])
+
+
+def test_filter_columns():
+    """
+    Only the given columns are filtered.
+    """
+    df = pd.DataFrame({"a": [0.0, BAD_VELOCITY], "b": [BAD_VELOCITY, 1.0]})
+    df = filter_columns(df, ["a"], bad_value=BAD_VELOCITY)
+
+    assert df["a"].iloc[0] == 0.0
+    assert np.isnan(df["a"].iloc[1])
+    assert df["b"].iloc[0] == BAD_VELOCITY
+
+
+def test_sql_filter_case_text():
+    """
+    The SQL expression is the column if there is no filter, else a CASE that is NULL for the bad values.
+    """
+    assert sql_filter_case("rangeBeam0") == "rangeBeam0"
+    assert sql_filter_case("rangeBeam0", max_abs=100.0) == "CASE WHEN ABS(rangeBeam0) <= 100.0 THEN rangeBeam0 END"
+    assert sql_filter_case("vesselSpeed", max_abs=100.0, bad_value=BAD_VELOCITY) == \
+        "CASE WHEN ABS(vesselSpeed) <= 100.0 AND ABS(vesselSpeed - 88.888) > 0.001 THEN vesselSpeed END"
+
+
+def test_sql_filter_case_matches_filter_values():
+    """
+    The SQL filter gives the same result as filter_values(), including keeping 0.0.
+    """
+    values = [0.0, 1.5, -2.0, BAD_VELOCITY, 150.0, None]
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, val REAL);")
+    conn.executemany("INSERT INTO t (val) VALUES (?);", [(val,) for val in values])
+    rows = conn.execute("SELECT " + sql_filter_case("val", 100.0, BAD_VELOCITY) + " FROM t ORDER BY id;").fetchall()
+    conn.close()
+
+    sql_filtered = np.array([row[0] for row in rows], dtype=np.float64)
+    np.testing.assert_array_equal(sql_filtered, filter_values(np.array(values, dtype=np.float64), 100.0, BAD_VELOCITY))
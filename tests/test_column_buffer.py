@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from rti_python_plot.utils.column_buffer import ColumnBuffer, ColumnSummary, ENS_DF_COLUMNS, ENS_DF_DTYPES
+
+
+def ens_columns(index: int, num_beams: int = 1) -> dict:
+    """
+    Create the long form columns of an ensemble, one row for each beam.
+    The ensembles are 1 second apart.
+    :param index: Ensemble index.
+    :param num_beams: Number of rows.
+    :return: Dictionary of the columns.
+    """
+    return {"dt": np.full(num_beams, np.datetime64("2020-01-01T00:00:00", "ns") + np.timedelta64(index, "s")),
+            "type": np.full(num_beams, "Voltage", dtype=object),
+            "beam": np.arange(num_beams),
+            "val": np.full(num_beams, float(index))}
+
+
+def test_append_grows_and_keeps_order():
+    """
+    The buffer grows past the initial capacity and keeps the rows in order.
+    """
+    buffer = ColumnBuffer(ENS_DF_COLUMNS, ENS_DF_DTYPES, initial_capacity=4)
+    for i in range(100):
+        buffer.append_columns(ens_columns(i, 2))
+
+    df = buffer.to_df()
+    assert len(buffer) == 200
+    assert buffer.num_chunks == 100
+    np.testing.assert_array_equal(df["val"].to_numpy(), np.repeat(np.arange(100.0), 2))
+    assert df["bin_num"].isna().all()
+
+
+def test_max_ens_evicts_whole_ensembles():
+    """
+    max_ens keeps the latest ensembles, and all the rows of an ensemble are evicted together.
+    """
+    buffer = ColumnBuffer(ENS_DF_COLUMNS, ENS_DF_DTYPES, initial_capacity=4, max_ens=10)
+    for i in range(50):
+        buffer.append_columns(ens_columns(i, 4))
+
+    vals = buffer.column("val")
+    assert buffer.num_chunks == 10
+    assert len(buffer) == 40
+    np.testing.assert_array_equal(np.unique(vals), np.arange(40.0, 50.0))
+
+
+def test_max_age_evicts_old_ensembles():
+    """
+    max_age keeps the ensembles within the time span of the latest ensemble, including the start of the span.
+    """
+    buffer = ColumnBuffer(ENS_DF_COLUMNS, ENS_DF_DTYPES, max_age="10s")
+    for i in range(60):
+        buffer.append_columns(ens_columns(i))
+
+    np.testing.assert_array_equal(buffer.column("val"), np.arange(49.0, 60.0))
+
+
+def test_append_columns_chunk_sizes():
+    """
+    Multiple ensembles added at once are still separate chunks for max_ens.
+    """
+    buffer = ColumnBuffer(ENS_DF_COLUMNS, ENS_DF_DTYPES, max_ens=3)
+    data = {col: np.concatenate([ens_columns(i, 2)[col] for i in range(5)]) for col in ("dt", "type", "beam", "val")}
+    buffer.append_columns(data, chunk_sizes=[2, 2, 2, 2, 2])
+
+    assert buffer.num_chunks == 3
+    np.testing.assert_array_equal(buffer.column("val"), [2.0, 2.0, 3.0, 3.0, 4.0, 4.0])
+
+
+def test_eviction_into_summary():
+    """
+    The evicted rows are added to the summary, so the summary and the buffer
+    together have the min, mean and max of all the data.
+    """
+    summary = ColumnSummary("10s")
+    buffer = ColumnBuffer(ENS_DF_COLUMNS, ENS_DF_DTYPES, initial_capacity=8, max_ens=5, summary=summary)
+    for i in range(35):
+        buffer.append_columns(ens_columns(i))
+
+    # The last 5 ensembles are in the buffer, the others are in the summary
+    np.testing.assert_array_equal(buffer.column("val"), np.arange(30.0, 35.0))
+
+    df_summary = summary.to_df()
+    assert df_summary["dt"].tolist() == [pd.Timestamp("2020-01-01 00:00:00"),
+                                         pd.Timestamp("2020-01-01 00:00:10"),
+                                         pd.Timestamp("2020-01-01 00:00:20")]
+    np.testing.assert_array_equal(df_summary["min"], [0.0, 10.0, 20.0])
+    np.testing.assert_array_equal(df_summary["max"], [9.0, 19.0, 29.0])
+    np.testing.assert_allclose(df_summary["mean"], [4.5, 14.5, 24.5])
+    np.testing.assert_array_equal(df_summary["count"], [10, 10, 10])
+
+
+def test_summary_groups_and_nan():
+    """
+    Each group is summarized separately and NaN values are not included.
+    """
+    summary = ColumnSummary("1min", group_columns=("type", "beam"))
+    times = np.datetime64("2020-01-01T00:00:00", "ns") + np.arange(6) * np.timedelta64(20, "s")
+    summary.add_columns({"dt": np.repeat(times, 2),
+                         "type": np.full(12, "Range", dtype=object),
+                         "beam": np.tile([0, 1], 6),
+                         "val": np.array([1.0, 10.0, 2.0, np.nan, 3.0, 30.0, 4.0, 40.0, 5.0, 50.0, 6.0, 60.0])})
+
+    df = summary.to_df().sort_values(["beam", "dt"]).reset_index(drop=True)
+    np.testing.assert_array_equal(df["beam"], [0, 0, 1, 1])
+    np.testing.assert_array_equal(df["min"], [1.0, 4.0, 10.0, 40.0])
+    np.testing.assert_array_equal(df["max"], [3.0, 6.0, 30.0, 60.0])
+    np.testing.assert_array_equal(df["count"], [3, 3, 2, 3])
+
+
+def test_summary_open_interval_is_merged():
+    """
+    Data added in separate calls to the same interval is merged into one summary point.
+    """
+    summary = ColumnSummary("1min")
+    for i in range(4):
+        summary.add_columns(ens_columns(i))
+
+    df = summary.to_df()
+    assert len(df) == 1
+    assert df["count"].iloc[0] == 4
+    assert df["mean"].iloc[0] == 1.5
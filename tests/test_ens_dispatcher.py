@@ -0,0 +1,53 @@
+import copy
+import numpy as np
+import pytest
+
+pytest.importorskip("rti_python")
+from rti_python.Ensemble.Ensemble import Ensemble
+from rti_python.Ensemble.EarthVelocity import EarthVelocity
+from rti_python_plot.utils.ens_dispatcher import DecodedEnsemble, DATASET_EARTH_VELOCITY
+
+
+def create_ens() -> Ensemble:
+    """
+    Create an ensemble with Earth Velocity data.  The last bin is bad velocity.
+    :return: Ensemble.
+    """
+    earth = EarthVelocity(5, 4)
+    earth.Velocities = [[0.5, -0.25, 0.1, 0.0],
+                        [1.0, 0.75, -0.05, 0.0],
+                        [-0.4, 0.3, 0.0, 0.0],
+                        [0.0, -1.2, 0.2, 0.0],
+                        [Ensemble.BadVelocity, Ensemble.BadVelocity, Ensemble.BadVelocity, Ensemble.BadVelocity]]
+    earth.generate_velocity_vectors()
+
+    ens = Ensemble()
+    ens.AddEarthVelocity(earth)
+    return ens
+
+
+def test_remove_vessel_speed_matches_rti_python():
+    """
+    The vessel speed removed by DecodedEnsemble must match EarthVelocity.remove_vessel_speed().
+    """
+    bt_east, bt_north, bt_vertical = 1.5, -0.8, 0.05
+    ens = create_ens()
+
+    # Remove the vessel speed with the library on a copy of the ensemble
+    lib_ens = copy.deepcopy(ens)
+    lib_ens.EarthVelocity.remove_vessel_speed(bt_east, bt_north, bt_vertical)
+    lib_vel = np.asarray(lib_ens.EarthVelocity.Velocities, dtype=np.float64)
+
+    decoded_ens = DecodedEnsemble(ens, (DATASET_EARTH_VELOCITY,))
+    earth_vel, mag, direction = decoded_ens.remove_vessel_speed(bt_east, bt_north, bt_vertical)
+
+    # Compare the good bins
+    np.testing.assert_allclose(earth_vel[:4, :3], lib_vel[:4, :3])
+    np.testing.assert_allclose(mag[:4], np.asarray(lib_ens.EarthVelocity.Magnitude, dtype=np.float64)[:4])
+    np.testing.assert_allclose(direction[:4], np.mod(np.asarray(lib_ens.EarthVelocity.Direction, dtype=np.float64)[:4], 360.0))
+
+    # The bad bin is not changed
+    assert mag[4] == Ensemble.BadVelocity
+
+    # The shared arrays are not modified
+    np.testing.assert_allclose(decoded_ens.earth_vel, np.asarray(ens.EarthVelocity.Velocities, dtype=np.float64))
@@ -0,0 +1,170 @@
+import os
+import gc
+import numpy as np
+import pytest
+from rti_python_plot.utils.ensemble_cube import EnsembleCube
+
+
+START = np.datetime64("2020-01-01T00:00:00", "ns")
+
+
+def ens_time(index: int) -> np.datetime64:
+    """
+    Time of the ensemble.  The ensembles are 1 second apart.
+    :param index: Ensemble index.
+    :return: Datetime of the ensemble.
+    """
+    return START + np.timedelta64(index, "s")
+
+
+def fill_cube(cube: EnsembleCube, num_ens: int, num_bins: int = 3):
+    """
+    Add the ensembles one at a time.  The value of each bin is the ensemble index.
+    :param cube: Cube to fill.
+    :param num_ens: Number of ensembles.
+    :param num_bins: Number of bins.
+    """
+    for i in range(num_ens):
+        cube.append(ens_time(i), {"mag": np.full(num_bins, float(i))})
+
+
+def test_growth_keeps_data():
+    """
+    The cube grows by chunks and keeps the data of the ensembles already added.
+    """
+    cube = EnsembleCube({"mag": 1, "amp": 4}, chunk_size=8)
+    fill_cube(cube, 50)
+
+    assert len(cube) == 50
+    assert cube.capacity >= 50 and cube.capacity % 8 == 0
+    np.testing.assert_array_equal(cube.quantity("mag")[:, 0, 0], np.arange(50.0))
+
+    # The quantities not given are NaN
+    assert np.isnan(cube.quantity("amp")).all()
+    assert cube.heatmap("mag").shape == (3, 50)
+
+
+def test_bins_set_by_first_ensemble():
+    """
+    Extra bins are dropped and missing bins are NaN.
+    """
+    cube = EnsembleCube({"mag": 1})
+    cube.append(ens_time(0), {"mag": [1.0, 2.0, 3.0]})
+    cube.append(ens_time(1), {"mag": [4.0, 5.0, 6.0, 7.0]})
+    cube.append(ens_time(2), {"mag": [8.0]})
+
+    np.testing.assert_array_equal(cube.heatmap("mag"), [[1.0, 4.0, 8.0], [2.0, 5.0, np.nan], [3.0, 6.0, np.nan]])
+
+
+def test_memmap_grows_and_is_removed(tmp_path):
+    """
+    The memory mapped files are reopened larger without losing the data,
+    and the files are removed by close().
+    """
+    cube = EnsembleCube({"mag": 1}, chunk_size=4, cache_dir=str(tmp_path))
+    fill_cube(cube, 10)
+    cube.extend(np.array([ens_time(i) for i in range(10, 30)]), {"mag": np.arange(10.0, 30.0)[:, np.newaxis].repeat(3, axis=1)})
+
+    assert isinstance(cube.quantity("mag"), np.memmap)
+    assert os.path.exists(os.path.join(cube.cache_path, "mag.dat"))
+    np.testing.assert_array_equal(cube.quantity("mag")[:, 1, 0], np.arange(30.0))
+
+    cache_path = cube.cache_path
+    cube.close()
+    assert not os.path.exists(cache_path)
+
+
+def test_memmap_removed_when_collected(tmp_path):
+    """
+    The memory mapped files are removed when the cube is garbage collected.
+    """
+    cube = EnsembleCube({"mag": 1}, cache_dir=str(tmp_path), pyramid_levels=2)
+    fill_cube(cube, 10)
+    cache_path = cube.cache_path
+
+    del cube
+    gc.collect()
+    assert not os.path.exists(cache_path)
+
+
+def test_window():
+    """
+    The window is the slice of the ensembles within the time range, with the end inclusive.
+    """
+    cube = EnsembleCube({"mag": 1})
+    fill_cube(cube, 20)
+
+    assert cube.window() == slice(0, 20)
+    assert cube.window(ens_time(5), ens_time(9)) == slice(5, 10)
+    assert cube.window(ens_time(-10), ens_time(2)) == slice(0, 3)
+    assert cube.window(ens_time(30)) == slice(20, 20)
+    np.testing.assert_array_equal(cube.time_axis(cube.window(ens_time(5), ens_time(6))), [ens_time(5), ens_time(6)])
+
+
+def test_pyramid_levels_are_nanmean():
+    """
+    Each level is the nan-mean of the complete groups of ensembles.
+    """
+    cube = EnsembleCube({"mag": 1}, pyramid_levels=3, pyramid_max=True)
+    for i in range(20):
+        mag = np.array([float(i), np.nan if i % 2 else float(i), np.nan])
+        cube.append(ens_time(i), {"mag": mag})
+
+    level_1, level_2, level_3 = cube.levels
+    assert (len(level_1), len(level_2), len(level_3)) == (10, 5, 2)
+    np.testing.assert_allclose(level_2.heatmap("mag")[0], [1.5, 5.5, 9.5, 13.5, 17.5])
+    np.testing.assert_allclose(level_2.heatmap("mag")[1], [1.0, 5.0, 9.0, 13.0, 17.0])
+    assert np.isnan(level_2.heatmap("mag")[2]).all()
+    np.testing.assert_allclose(level_2.heatmap("mag_max")[0], [3.0, 7.0, 11.0, 15.0, 19.0])
+
+
+def test_pyramid_circular_mean():
+    """
+    The quantities in degrees are averaged as angles.
+    """
+    cube = EnsembleCube({"dir": 1}, pyramid_levels=1, pyramid_circular=("dir",))
+    cube.append(ens_time(0), {"dir": [350.0]})
+    cube.append(ens_time(1), {"dir": [10.0]})
+
+    assert cube.levels[0].heatmap("dir")[0, 0] == pytest.approx(0.0, abs=1e-3)
+
+
+def test_level_selects_columns():
+    """
+    level() uses the lowest level with at most max_columns columns.
+    """
+    cube = EnsembleCube({"mag": 1}, pyramid_levels=4)
+    fill_cube(cube, 64)
+
+    level, level_index = cube.level()
+    assert level is cube and level_index == slice(0, 64)
+
+    level, level_index = cube.level(max_columns=20)
+    assert level is cube.levels[1]
+    assert level_index == slice(0, 16)
+
+    # A window within the time range
+    level, level_index = cube.level(max_columns=4, index=cube.window(ens_time(16), ens_time(47)))
+    assert level is cube.levels[2]
+    assert level_index == slice(2, 6)
+    np.testing.assert_allclose(level.heatmap("mag", index=level_index)[0], [19.5, 27.5, 35.5, 43.5])
+
+
+def test_level_includes_latest_ensembles():
+    """
+    The latest ensembles that do not fill a complete group yet are the mean in the last column.
+    """
+    cube = EnsembleCube({"mag": 1}, pyramid_levels=4, pyramid_max=True)
+    fill_cube(cube, 70)
+
+    level, level_index = cube.level(max_columns=20)
+    assert len(cube.levels[1]) == 17
+    assert level_index == slice(0, 18)
+    assert level.time_axis(level_index)[-1] == ens_time(68) + np.timedelta64(500, "ms")
+    np.testing.assert_allclose(level.heatmap("mag", index=level_index)[0, -3:], [61.5, 65.5, 68.5])
+    np.testing.assert_allclose(level.heatmap("mag_max", index=level_index)[0, -2:], [67.0, 69.0])
+
+    # A window that ends before the latest ensembles uses the level itself
+    level, level_index = cube.level(max_columns=20, index=cube.window(end=ens_time(63)))
+    assert level is cube.levels[1]
+    assert level_index == slice(0, 16)
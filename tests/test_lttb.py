@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from rti_python_plot.utils.lttb import lttb_indices, lttb_downsample
+
+
+def test_keeps_all_points_when_small():
+    """
+    All the points are kept if there are not more points than the target,
+    or the target is too small or None.
+    """
+    y = np.arange(10.0)
+    for target_points in (None, 2, 10, 20):
+        np.testing.assert_array_equal(lttb_indices(np.arange(10), y, target_points), np.arange(10))
+
+    assert len(lttb_indices([], [], 5)) == 0
+
+
+def test_first_last_and_peaks():
+    """
+    The first and last points are kept, and so are the peaks of the line.
+    """
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[250] = 100.0
+    y[700] = -50.0
+
+    index = lttb_indices(x, y, 20)
+    assert len(index) == 20
+    assert index[0] == 0 and index[-1] == 999
+    assert 250 in index and 700 in index
+    assert np.all(np.diff(index) > 0)
+
+
+def test_nan_bucket():
+    """
+    NaN values are only selected if the whole bucket is NaN.
+    """
+    y = np.sin(np.arange(100) / 5.0)
+    y[40:50] = np.nan
+    y[10] = np.nan
+
+    index = lttb_indices(np.arange(100), y, 12)
+    assert len(index) == 12
+    assert 10 not in index
+
+
+def test_datetimes():
+    """
+    The x values can be datetimes or datetime strings.
+    """
+    dates = pd.date_range("2020-01-01", periods=500, freq="s")
+    y = np.random.default_rng(0).normal(size=500)
+
+    index = lttb_indices(dates, y, 50)
+    np.testing.assert_array_equal(lttb_indices(dates.strftime("%Y-%m-%d %H:%M:%S").to_numpy(), y, 50), index)
+
+    x_down, y_down = lttb_downsample(dates, y, 50)
+    assert len(x_down) == 50
+    np.testing.assert_array_equal(y_down, y[index])
+
+
+def test_downsample_unchanged():
+    """
+    The values are returned unchanged if there are not more points than the target.
+    """
+    x = [1, 2, 3]
+    y = [4.0, 5.0, 6.0]
+    assert lttb_downsample(x, y, 5) == (x, y)
+    assert lttb_downsample(x, y) == (x, y)
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from rti_python_plot.utils.query_cache import QueryCache, CACHE_FILE_EXT
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb
+
+
+def test_round_trip(tmp_path):
+    """
+    The result is the same after it is stored and loaded, including the NULL text values.
+    """
+    cache = QueryCache(str(tmp_path / "cache"))
+    df = pd.DataFrame({"dateTime": ["2020-01-01 00:00:00", None, "2020-01-01 00:00:02"],
+                       "Voltage": [12.0, np.nan, 11.5],
+                       "status": [0, 1, 2]})
+
+    key = cache.key("SELECT * FROM ensembles;", [1], (1, 2))
+    assert cache.get(key) is None
+
+    cache.put(key, df)
+    loaded = cache.get(key)
+
+    assert list(loaded.columns) == ["dateTime", "Voltage", "status"]
+    assert loaded["dateTime"].isna().tolist() == [False, True, False]
+    assert loaded["dateTime"].iloc[2] == "2020-01-01 00:00:02"
+    np.testing.assert_array_equal(loaded["Voltage"], df["Voltage"])
+    np.testing.assert_array_equal(loaded["status"], df["status"])
+
+
+def test_key():
+    """
+    The key changes with the query, the parameters and the database version.
+    """
+    key = QueryCache.key("SELECT 1;", [1], (1, 2))
+    assert key == QueryCache.key("SELECT 1;", (1,), (1, 2))
+    assert key != QueryCache.key("SELECT 2;", [1], (1, 2))
+    assert key != QueryCache.key("SELECT 1;", [2], (1, 2))
+    assert key != QueryCache.key("SELECT 1;", [1], (1, 3))
+
+
+def test_evict_least_recently_used(tmp_path):
+    """
+    The least recently used results are removed when the cache is full.
+    """
+    cache = QueryCache(str(tmp_path / "cache"))
+    df = pd.DataFrame({"val": np.random.default_rng(0).normal(size=1000)})
+    for num in range(3):
+        cache.put(str(num), df)
+        os.utime(cache.file_path(str(num)), ns=(num * 10 ** 9, num * 10 ** 9))
+
+    # Use the first result, so the second is the least recently used
+    assert cache.get("0") is not None
+    cache.max_bytes = 2 * os.path.getsize(cache.file_path("0"))
+    cache.evict()
+
+    assert sorted(os.listdir(cache.cache_dir)) == ["0" + CACHE_FILE_EXT, "2" + CACHE_FILE_EXT]
+
+
+def test_database_change_invalidates(tmp_path):
+    """
+    The cached result is used until the database file changes.
+    """
+    db_file_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_file_path)
+    conn.execute("CREATE TABLE ensembles (id INTEGER PRIMARY KEY, Voltage REAL);")
+    conn.execute("INSERT INTO ensembles (Voltage) VALUES (12.0);")
+    conn.commit()
+
+    db = RtiSqliteDb(db_file_path)
+    cache = db.enable_cache(cache_dir=str(tmp_path / "cache"))
+    try:
+        query = "SELECT Voltage FROM ensembles;"
+        assert db.read_df(query)["Voltage"].tolist() == [12.0]
+        assert len(os.listdir(cache.cache_dir)) == 1
+
+        # The same database version uses the cached result
+        assert db.read_df(query)["Voltage"].tolist() == [12.0]
+        assert len(os.listdir(cache.cache_dir)) == 1
+
+        # Change the database.  The version changes, so the query is run again.
+        conn.execute("INSERT INTO ensembles (Voltage) VALUES (11.0);")
+        conn.commit()
+        assert db.read_df(query)["Voltage"].tolist() == [12.0, 11.0]
+        assert len(os.listdir(cache.cache_dir)) == 2
+    finally:
+        conn.close()
+        db.close()
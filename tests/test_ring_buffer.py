@@ -0,0 +1,59 @@
+import numpy as np
+from rti_python_plot.utils.ring_buffer import RecordRingBuffer
+
+
+DTYPE = [("dt", "datetime64[ns]"), ("val", np.float64), ("num", np.int64)]
+
+
+def test_read_wraps_around():
+    """
+    The records that wrap around the end of the buffer are read in order.
+    """
+    ring = RecordRingBuffer(DTYPE, 4)
+    for i in range(3):
+        ring.append({"val": i, "num": i})
+    assert ring.read()["num"].tolist() == [0, 1, 2]
+
+    # The next records start at index 3 and wrap to index 0 and 1
+    for i in range(3, 6):
+        ring.append({"val": i, "num": i})
+    data = ring.read()
+    assert data["num"].tolist() == [3, 4, 5]
+    assert data["val"].flags["C_CONTIGUOUS"]
+    assert len(ring) == 0
+
+
+def test_oldest_records_are_dropped():
+    """
+    If the writer gets more than the capacity ahead, only the latest records are kept.
+    """
+    ring = RecordRingBuffer(DTYPE, 4)
+    for i in range(10):
+        ring.append({"num": i})
+
+    assert len(ring) == 4
+    assert ring.read()["num"].tolist() == [6, 7, 8, 9]
+
+
+def test_missing_fields_are_blank():
+    """
+    The fields not given are NaN and NaT, not the values of an old record.
+    """
+    ring = RecordRingBuffer(DTYPE, 2)
+    ring.append({"dt": np.datetime64("2020-01-01"), "val": 1.0, "num": 1})
+    ring.append({"num": 2})
+    ring.append({"num": 3})
+
+    data = ring.read()
+    assert np.isnan(data["val"]).all()
+    assert np.isnat(data["dt"]).all()
+
+
+def test_read_empty():
+    """
+    Reading an empty buffer gives empty columns.
+    """
+    ring = RecordRingBuffer(DTYPE, 4)
+    data = ring.read()
+    assert set(data) == {"dt", "val", "num"}
+    assert all(len(col) == 0 for col in data.values())
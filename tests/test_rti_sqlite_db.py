@@ -0,0 +1,162 @@
+import sqlite3
+import datetime
+import numpy as np
+import pytest
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, PLOT_QUERIES, QUERY_BT_RANGE
+
+
+# Number of ensembles of each project
+NUM_ENS = 100
+
+# Bad value of the voltage
+BAD_VOLTAGE = 88.888
+
+
+def create_db(db_file_path: str):
+    """
+    Create a small database with 2 projects.  Each project has NUM_ENS
+    ensembles 1 second apart.  The voltage is the ensemble number, except
+    ensemble 5 which is bad.
+    :param db_file_path: File path of the database.
+    """
+    conn = sqlite3.connect(db_file_path)
+    conn.executescript("CREATE TABLE ensembles (id INTEGER PRIMARY KEY, ensNum INTEGER, dateTime TIMESTAMP, project_id INTEGER, "
+                       "Voltage REAL, status INTEGER, heading REAL, pitch REAL, roll REAL, waterTemp REAL, sos REAL, "
+                       "sysTemp REAL, pressure REAL, xdcrDepth REAL);"
+                       "CREATE TABLE bottomtrack (id INTEGER PRIMARY KEY, ensIndex INTEGER, "
+                       "rangeBeam0 REAL, rangeBeam1 REAL, rangeBeam2 REAL, rangeBeam3 REAL);")
+    ens_id = 0
+    for project_id in (1, 2):
+        for ens_num in range(NUM_ENS):
+            ens_id += 1
+            dt = (datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds=ens_num)).strftime("%Y-%m-%d %H:%M:%S")
+            voltage = BAD_VOLTAGE if ens_num == 5 else float(ens_num)
+            conn.execute("INSERT INTO ensembles VALUES (?, ?, ?, ?, ?, 0, 1.0, 2.0, 3.0, 20.0, 1500.0, 30.0, 0.0, 0.0);",
+                         (ens_id, ens_num, dt, project_id, voltage))
+            conn.execute("INSERT INTO bottomtrack (ensIndex, rangeBeam0, rangeBeam1, rangeBeam2, rangeBeam3) VALUES (?, ?, ?, ?, ?);",
+                         (ens_id, 0.0, 1.0, 2.0, 3.0))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    Database with 2 projects.
+    """
+    db_file_path = str(tmp_path / "test.db")
+    create_db(db_file_path)
+    db = RtiSqliteDb(db_file_path)
+    yield db
+    db.close()
+
+
+def test_where():
+    """
+    The WHERE clause has a filter and a parameter for each filter given.
+    """
+    assert QueryWindow().where() == ("", [])
+
+    where, params = QueryWindow(project_id=1, start="2020-01-01 00:00:10", end="2020-01-01 00:00:20").where()
+    assert where == "WHERE ensembles.project_id = ? AND ensembles.dateTime >= ? AND ensembles.dateTime <= ?"
+    assert params == [1, "2020-01-01 00:00:10", "2020-01-01 00:00:20"]
+
+    where, params = QueryWindow(project_id=2, max_rows=10, after_id=5).where()
+    assert where == "WHERE ensembles.id IN (SELECT page.id FROM ensembles AS page " \
+                    "WHERE page.project_id = ? AND page.id > ? ORDER BY page.id LIMIT ?)"
+    assert params == [2, 5, 10]
+
+
+def test_window_reads_project_and_time(db):
+    """
+    Only the ensembles of the project within the time window are read.
+    """
+    df = db.read_window_df(QUERY_BT_RANGE, QueryWindow(project_id=2, start="2020-01-01 00:00:10", end="2020-01-01 00:00:19"))
+    assert len(df) == 10
+    assert df["dateTime"].iloc[0] == "2020-01-01 00:00:10"
+
+
+def test_next_page(db):
+    """
+    The pages cover all the ensembles of the project once.
+    """
+    window = QueryWindow(project_id=2, max_rows=30)
+    pages = []
+    while window:
+        pages.append(db.read_window_df("SELECT ensembles.id FROM ensembles {where} ORDER BY ensembles.id;", window)["id"].tolist())
+        window = window.next_page(db)
+
+    assert [len(page) for page in pages] == [30, 30, 30, 10]
+    assert sum(pages, []) == list(range(NUM_ENS + 1, 2 * NUM_ENS + 1))
+
+
+def test_read_bucket_df(db):
+    """
+    The time window is split into equal time buckets and the bad values are not included.
+    """
+    query = "SELECT dateTime, Voltage FROM ensembles {where};"
+    df = db.read_bucket_df(query, ["Voltage"], 10, QueryWindow(project_id=1), bad_value=BAD_VOLTAGE)
+
+    assert len(df) == 10
+    assert df["count"].tolist() == [10] * 10
+    assert df["dateTime"].iloc[1] == "2020-01-01 00:00:10"
+    np.testing.assert_array_equal(df["Voltage_min"], np.arange(0.0, 100.0, 10.0))
+    np.testing.assert_array_equal(df["Voltage_max"], np.arange(9.0, 100.0, 10.0))
+
+    # The bad value of ensemble 5 is not in the mean of the first bucket
+    assert df["Voltage_mean"].iloc[0] == pytest.approx(40.0 / 9.0)
+    assert df["Voltage_mean"].iloc[1] == pytest.approx(14.5)
+
+
+def test_read_bucket_df_empty(db):
+    """
+    A window without any ensembles gives an empty result with the bucket columns.
+    """
+    df = db.ensembles_buckets(["Voltage"], 10, QueryWindow(project_id=3))
+    assert df.empty
+    assert list(df.columns) == ["dateTime", "Voltage_min", "Voltage_mean", "Voltage_max", "count"]
+
+
+def test_ensembles_columns(db):
+    """
+    The columns are loaded once for the window, and loaded again when the database changes.
+    """
+    window = QueryWindow(project_id=1)
+    df_volt = db.ensembles_columns(["dateTime", "Voltage"], window)
+    df_hpr = db.ensembles_columns(["dateTime", "heading", "pitch", "roll"], window)
+
+    assert list(df_volt.columns) == ["dateTime", "Voltage"]
+    assert len(df_volt) == NUM_ENS
+    assert df_hpr["pitch"].tolist() == [2.0] * NUM_ENS
+
+    # A column not in ENS_PLOT_COLUMNS is added to the loaded columns
+    assert db.ensembles_columns(["ensNum"], window)["ensNum"].tolist() == list(range(NUM_ENS))
+
+    # Another window is loaded separately
+    assert len(db.ensembles_columns(["Voltage"], QueryWindow(project_id=2, max_rows=5))) == 5
+
+    # Add an ensemble to the database
+    conn = sqlite3.connect(db.db_file_path)
+    conn.execute("INSERT INTO ensembles (ensNum, dateTime, project_id, Voltage) VALUES (100, '2020-01-01 00:01:40', 1, 12.0);")
+    conn.commit()
+    conn.close()
+
+    assert len(db.ensembles_columns(["Voltage"], window)) == NUM_ENS + 1
+
+
+def test_prepare_database(db):
+    """
+    The indexes are created and all the plot queries are checked.
+    """
+    report = db.prepare_database(QueryWindow(project_id=1))
+
+    assert "idx_plot_bottomtrack_ensIndex" in report["created"]
+    assert report["plans"]["query"].tolist() == list(PLOT_QUERIES)
+
+    # The tables of this database are enough for the ensembles table queries
+    plans = report["plans"].set_index("query")
+    for name in ("Ensembles Columns", "Ensembles Time Span", "Ensembles Buckets", "BT Range"):
+        assert "ERROR" not in plans.loc[name, "after"]
+
+    # Running again does not create any index
+    assert db.prepare_database()["created"] == []
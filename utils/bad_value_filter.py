@@ -0,0 +1,75 @@
+import numpy as np
+from pandas import DataFrame
+
+
+# Tolerance to compare against a bad value, like BadVelocity 88.888
+BAD_VALUE_TOLERANCE = 1e-3
+
+
+def bad_value_mask(values, max_abs: float = None, bad_value: float = None) -> np.ndarray:
+    """
+    Find all the bad values.
+    :param values: Array of values.  Can be 2D to check multiple columns at once.
+    :param max_abs: Optional maximum absolute value.  Larger values are bad.
+    :param bad_value: Optional bad value.  Ex: Ensemble.BadVelocity
+    :return: Boolean array, True if the value is bad or not a number.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mask = ~np.isfinite(values)
+    with np.errstate(invalid='ignore'):
+        if max_abs is not None:
+            mask |= np.abs(values) > max_abs
+        if bad_value is not None:
+            mask |= np.abs(values - bad_value) <= BAD_VALUE_TOLERANCE
+
+    return mask
+
+
+def filter_values(values, max_abs: float = None, bad_value: float = None) -> np.ndarray:
+    """
+    Replace all the bad values with NaN.  0.0 is a good value.
+    :param values: Array of values.  Can be 2D to filter multiple columns at once.
+    :param max_abs: Optional maximum absolute value.  Larger values are bad.
+    :param bad_value: Optional bad value.  Ex: Ensemble.BadVelocity
+    :return: Float array with NaN for the bad values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(bad_value_mask(values, max_abs, bad_value), np.nan, values)
+
+
+def filter_columns(df: DataFrame, columns, max_abs: float = None, bad_value: float = None) -> DataFrame:
+    """
+    Replace all the bad values in the columns with NaN.
+    All the columns are filtered at once as a single block.
+    :param df: Dataframe to filter.  The columns are replaced.
+    :param columns: Columns to filter.
+    :param max_abs: Optional maximum absolute value.  Larger values are bad.
+    :param bad_value: Optional bad value.  Ex: Ensemble.BadVelocity
+    :return: Dataframe with the filtered columns.
+    """
+    columns = list(columns)
+    if columns:
+        df[columns] = filter_values(df[columns].to_numpy(dtype=np.float64, na_value=np.nan), max_abs, bad_value)
+
+    return df
+
+
+def sql_filter_case(column: str, max_abs: float = None, bad_value: float = None) -> str:
+    """
+    Create an SQL expression for the column that is NULL for the bad values.
+    This filters the values in the query, like filter_values().
+    :param column: Column name.
+    :param max_abs: Optional maximum absolute value.  Larger values are bad.
+    :param bad_value: Optional bad value.  Ex: Ensemble.BadVelocity
+    :return: SQL CASE expression, or the column if there is no filter.
+    """
+    conditions = []
+    if max_abs is not None:
+        conditions.append("ABS(" + column + ") <= " + repr(float(max_abs)))
+    if bad_value is not None:
+        conditions.append("ABS(" + column + " - " + repr(float(bad_value)) + ") > " + repr(BAD_VALUE_TOLERANCE))
+
+    if not conditions:
+        return column
+
+    return "CASE WHEN " + " AND ".join(conditions) + " THEN " + column + " END"
@@ -0,0 +1,410 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+# Columns and types of the DataFrame created by the ensemble datasets encode_df()
+ENS_DF_COLUMNS = ["dt", "type", "ss_code", "ss_config", "bin_num", "beam", "blank", "bin_size", "val"]
+ENS_DF_DTYPES = {"dt": "datetime64[ns]", "val": np.float64}
+
+# Columns of the summary DataFrame
+SUMMARY_DF_COLUMNS = ["dt", "min", "mean", "max", "count"]
+
+
+class ColumnSummary:
+    """
+    Coarse min/mean/max summary of the data evicted from a ColumnBuffer.
+    The data is grouped into time intervals, and by the group columns, so the
+    full history can still be displayed at a low resolution.
+
+    The data must be added in time order.  The last interval of each group is
+    kept open until data for a later interval is added.
+    """
+
+    def __init__(self, interval, group_columns: tuple = ("type",), time_column: str = "dt", value_column: str = "val"):
+        """
+        Initialize the summary.
+        :param interval: Time interval of each summary point.  Ex: "10min" or datetime.timedelta(minutes=10)
+        :param group_columns: Columns to group the data.  Each group is summarized separately.
+        :param time_column: Column with the datetime.
+        :param value_column: Column with the value to summarize.
+        """
+        self.interval = np.int64(pd.Timedelta(interval).value)
+        self.group_columns = list(group_columns)
+        self.time_column = time_column
+        self.value_column = value_column
+
+        # Closed intervals
+        self.buffer = ColumnBuffer(self.group_columns + SUMMARY_DF_COLUMNS,
+                                   {"dt": "datetime64[ns]", "min": np.float64, "mean": np.float64, "max": np.float64, "count": np.int64})
+
+        # Open interval for each group
+        # Key is the group values, value is [interval start, min, sum, max, count]
+        self.open_intervals = dict()
+
+    def __len__(self):
+        return len(self.buffer) + len(self.open_intervals)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def add_columns(self, data: dict):
+        """
+        Add the data to the summary.
+        The data is first summarized by group and interval with NumPy, then
+        each summary is merged with the open intervals.
+        :param data: Dictionary of column name to array of values.
+        """
+        times = np.asarray(data[self.time_column], dtype='datetime64[ns]').astype(np.int64)
+        vals = np.asarray(data[self.value_column], dtype=np.float64)
+
+        # Remove the NaN values
+        good = ~np.isnan(vals)
+        if not good.any():
+            return
+        vals = vals[good]
+        starts = times[good] - (times[good] % self.interval)
+        group_vals = [np.asarray(data[col], dtype=object)[good] for col in self.group_columns]
+        group_codes = [pd.factorize(group, use_na_sentinel=False)[0] for group in group_vals]
+
+        # Sort by group and interval, so each summary is a run of rows
+        order = np.lexsort([starts] + group_codes[::-1])
+        sorted_keys = [starts[order]] + [codes[order] for codes in group_codes]
+        is_first = np.zeros(len(order), dtype=bool)
+        is_first[0] = True
+        for sorted_key in sorted_keys:
+            is_first[1:] |= sorted_key[1:] != sorted_key[:-1]
+        run_starts = np.flatnonzero(is_first)
+
+        # Summarize each run
+        sorted_vals = vals[order]
+        run_min = np.minimum.reduceat(sorted_vals, run_starts)
+        run_sum = np.add.reduceat(sorted_vals, run_starts)
+        run_max = np.maximum.reduceat(sorted_vals, run_starts)
+        run_count = np.diff(np.append(run_starts, len(order)))
+
+        # Merge the runs in the order they were added
+        first_rows = order[run_starts]
+        run_keys = list(zip(*[group[first_rows].tolist() for group in group_vals]))
+        for run in np.argsort(first_rows, kind="stable"):
+            key = run_keys[run]
+            start = starts[first_rows[run]]
+
+            summary = self.open_intervals.get(key)
+            if summary is not None and summary[0] != start:
+                # New interval, so close the previous interval
+                self._close_interval(key, summary)
+                summary = None
+
+            if summary is None:
+                self.open_intervals[key] = [start, run_min[run], run_sum[run], run_max[run], int(run_count[run])]
+            else:
+                summary[1] = min(summary[1], run_min[run])
+                summary[2] += run_sum[run]
+                summary[3] = max(summary[3], run_max[run])
+                summary[4] += int(run_count[run])
+
+    def _close_interval(self, key: tuple, summary: list):
+        """
+        Add the interval to the closed intervals.
+        :param key: Group values.
+        :param summary: [interval start, min, sum, max, count]
+        """
+        start, min_val, sum_val, max_val, count = summary
+        self.buffer.append_row(list(key) + [np.datetime64(int(start), 'ns'), min_val, sum_val / count, max_val, count])
+
+    def to_df(self) -> DataFrame:
+        """
+        Get the summary of all the data, including the open intervals.
+        The time of each row is the start of the interval.
+        :return: DataFrame with the group columns and the dt, min, mean, max and count columns.
+        """
+        df = self.buffer.to_df()
+        if not self.open_intervals:
+            return df
+
+        rows = []
+        for key, (start, min_val, sum_val, max_val, count) in self.open_intervals.items():
+            rows.append(list(key) + [np.datetime64(int(start), 'ns'), min_val, sum_val / count, max_val, count])
+
+        df_open = DataFrame(rows, columns=self.buffer.columns)
+        return pd.concat([df, df_open], ignore_index=True).sort_values(self.time_column, kind="stable")
+
+
+class ColumnBuffer:
+    """
+    Growable columnar buffer to accumulate ensemble data.
+    Each column is stored in its own NumPy array.  When the arrays are full,
+    the capacity is doubled, so appending data is O(1) amortized.  This
+    replaces concatenating a DataFrame for every ensemble, which copies all
+    the previous data every time.
+
+    The data is only converted to a DataFrame when to_df() is called.  The
+    DataFrame is cached until new data is added.
+
+    The buffer can limit the data retained, by the number of ensembles and by
+    the time span of the data.  Each append is a chunk, usually one ensemble.
+    When the limit is reached, whole chunks are evicted from the front by
+    moving the start offset, so eviction is O(1).  The space at the front is
+    reused the next time the arrays are full.  If a summary is given, the
+    evicted data is added to the summary.
+    """
+
+    def __init__(self,
+                 columns: list,
+                 dtypes: dict = None,
+                 initial_capacity: int = 1024,
+                 max_ens: int = None,
+                 max_age=None,
+                 time_column: str = "dt",
+                 summary: ColumnSummary = None):
+        """
+        Create the arrays for each column.
+        :param columns: Column names.
+        :param dtypes: Optional NumPy dtype for each column name.  Columns not given are stored as objects.
+        :param initial_capacity: Number of rows to allocate initially.
+        :param max_ens: Maximum number of chunks (ensembles) to keep.  None to keep all.
+        :param max_age: Maximum time span to keep, from the latest data.  Ex: "6h".  None to keep all.
+        :param time_column: Column with the datetime used for max_age.
+        :param summary: Optional summary to add the evicted data to.
+        """
+        self.columns = list(columns)
+
+        # Set the dtype for each column
+        self.dtypes = dict()
+        for col in self.columns:
+            if dtypes and col in dtypes:
+                self.dtypes[col] = np.dtype(dtypes[col])
+            else:
+                self.dtypes[col] = np.dtype(object)
+
+        self.initial_capacity = max(1, int(initial_capacity))
+        self.capacity = self.initial_capacity
+
+        # The data is in the arrays from start to end
+        self.start = 0
+        self.end = 0
+
+        # Allocate the arrays
+        self.arrays = {col: np.empty(self.capacity, dtype=self.dtypes[col]) for col in self.columns}
+
+        # Retention
+        self.max_ens = max_ens
+        self.max_age = np.int64(pd.Timedelta(max_age).value) if max_age is not None else None
+        self.time_column = time_column
+        self.summary = summary
+
+        # Start row of each chunk.  Chunks from chunk_first to chunk_last are in the buffer
+        self.chunk_starts = np.empty(self.capacity, dtype=np.int64)
+        self.chunk_first = 0
+        self.chunk_last = 0
+
+        # Cached DataFrame of the data
+        self._df_cache = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    @property
+    def num_chunks(self) -> int:
+        return self.chunk_last - self.chunk_first
+
+    @property
+    def empty(self) -> bool:
+        return self.size == 0
+
+    def clear(self):
+        """
+        Remove all the data and release the memory.
+        """
+        self.capacity = self.initial_capacity
+        self.start = 0
+        self.end = 0
+        self.arrays = {col: np.empty(self.capacity, dtype=self.dtypes[col]) for col in self.columns}
+        self.chunk_starts = np.empty(self.capacity, dtype=np.int64)
+        self.chunk_first = 0
+        self.chunk_last = 0
+        self._df_cache = None
+
+    def _reserve(self, num_rows: int, num_chunks: int = 1):
+        """
+        Verify there is room for the given number of new rows.
+        If not, move the data to the front of the arrays.  If there is still not
+        enough room, double the capacity until it fits.
+        :param num_rows: Number of rows to add.
+        :param num_chunks: Number of chunks to add.
+        """
+        if self.end + num_rows <= self.capacity and self.chunk_last + num_chunks <= len(self.chunk_starts):
+            return
+
+        # If data was evicted, keep at least half the arrays free, so the
+        # data is not moved again until many more rows are added
+        needed = self.size + num_rows
+        if self.start > 0:
+            needed *= 2
+
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+
+        # Move the data to the front of the arrays
+        for col in self.columns:
+            if new_capacity == self.capacity:
+                self.arrays[col][:self.size] = self.arrays[col][self.start:self.end]
+            else:
+                new_array = np.empty(new_capacity, dtype=self.dtypes[col])
+                new_array[:self.size] = self.arrays[col][self.start:self.end]
+                self.arrays[col] = new_array
+
+        # Move the chunk start rows
+        kept_chunks = self.num_chunks
+        new_chunk_starts = np.empty(max(len(self.chunk_starts), 2 * (kept_chunks + num_chunks)), dtype=np.int64)
+        new_chunk_starts[:kept_chunks] = self.chunk_starts[self.chunk_first:self.chunk_last] - self.start
+        self.chunk_starts = new_chunk_starts
+        self.chunk_first = 0
+        self.chunk_last = kept_chunks
+
+        self.end = self.size
+        self.start = 0
+        self.capacity = new_capacity
+
+    def _add_chunk(self, num_rows: int):
+        """
+        Record the new chunk and evict the oldest chunks if the retention limits are reached.
+        :param num_rows: Number of rows added.
+        """
+        self.chunk_starts[self.chunk_last] = self.end
+        self.chunk_last += 1
+        self.end += num_rows
+        self._df_cache = None
+
+        self._evict()
+
+    def _add_chunks(self, chunk_sizes: np.ndarray):
+        """
+        Record the new chunks and evict the oldest chunks if the retention limits are reached.
+        :param chunk_sizes: Number of rows of each chunk added.
+        """
+        num_chunks = len(chunk_sizes)
+        self.chunk_starts[self.chunk_last:self.chunk_last + num_chunks] = self.end + np.cumsum(chunk_sizes) - chunk_sizes
+        self.chunk_last += num_chunks
+        self.end += int(chunk_sizes.sum())
+        self._df_cache = None
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Evict the oldest chunks outside the retention limits.
+        """
+        first = self.chunk_first
+
+        # Limit the number of ensembles
+        if self.max_ens is not None and self.num_chunks > self.max_ens:
+            first = self.chunk_last - self.max_ens
+
+        # Limit the time span
+        if self.max_age is not None and first < self.chunk_last:
+            times = self.arrays[self.time_column]
+            latest = np.int64(times[self.end - 1].astype('datetime64[ns]').astype(np.int64))
+            oldest = latest - self.max_age
+            while first < self.chunk_last - 1 and \
+                    times[self.chunk_starts[first]].astype('datetime64[ns]').astype(np.int64) < oldest:
+                first += 1
+
+        if first == self.chunk_first:
+            return
+
+        # Move the start to the first chunk kept
+        new_start = int(self.chunk_starts[first])
+        if self.summary is not None:
+            self.summary.add_columns({col: self.arrays[col][self.start:new_start] for col in self.columns})
+
+        self.start = new_start
+        self.chunk_first = first
+
+    def append_row(self, row):
+        """
+        Add a single row to the buffer.
+        :param row: List of values in the same order as the columns, or a dict of column to value.
+        """
+        self._reserve(1)
+
+        if isinstance(row, dict):
+            for col in self.columns:
+                self.arrays[col][self.end] = row.get(col)
+        else:
+            for col, val in zip(self.columns, row):
+                self.arrays[col][self.end] = val
+
+        self._add_chunk(1)
+
+    def append_columns(self, data: dict, chunk_sizes=None):
+        """
+        Add multiple rows to the buffer given as a column of values.
+        All the columns must have the same length.  Columns missing are set to None.
+        :param data: Dictionary of column name to list or array of values.
+        :param chunk_sizes: Optional number of rows of each chunk (ensemble), to add many ensembles at once.  Default is one chunk for all the rows.
+        """
+        num_rows = 0
+        for val in data.values():
+            num_rows = len(val)
+            break
+
+        if num_rows == 0:
+            return
+
+        if chunk_sizes is not None:
+            # Ensembles without any rows are not a chunk
+            chunk_sizes = np.asarray(chunk_sizes, dtype=np.int64)
+            chunk_sizes = chunk_sizes[chunk_sizes > 0]
+
+        self._reserve(num_rows, 1 if chunk_sizes is None else len(chunk_sizes))
+
+        start = self.end
+        end = self.end + num_rows
+        for col in self.columns:
+            if col in data:
+                self.arrays[col][start:end] = np.asarray(data[col])
+            else:
+                self.arrays[col][start:end] = None
+
+        if chunk_sizes is None:
+            self._add_chunk(num_rows)
+        else:
+            self._add_chunks(chunk_sizes)
+
+    def append_df(self, df: DataFrame):
+        """
+        Add all the rows of the DataFrame to the buffer.
+        :param df: DataFrame with the same columns as the buffer.
+        """
+        if df is None or df.empty:
+            return
+
+        self.append_columns({col: df[col].to_numpy() for col in self.columns if col in df.columns})
+
+    def column(self, col: str) -> np.ndarray:
+        """
+        Get a view of all the data for the given column.
+        :param col: Column name.
+        :return: View of the column data.
+        """
+        return self.arrays[col][self.start:self.end]
+
+    def to_df(self) -> DataFrame:
+        """
+        Create a DataFrame of all the data.  The DataFrame is cached
+        until new data is added.
+        :return: DataFrame of all the data in the buffer.
+        """
+        if self._df_cache is None:
+            self._df_cache = DataFrame({col: self.arrays[col][self.start:self.end].copy() for col in self.columns},
+                                       columns=self.columns)
+
+        return self._df_cache
@@ -0,0 +1,422 @@
+import numpy as np
+from rti_python.Ensemble.Ensemble import Ensemble
+
+
+# Datasets that can be extracted from the ensemble
+DATASET_ENSEMBLE_DATA = "EnsembleData"
+DATASET_ANCILLARY_DATA = "AncillaryData"
+DATASET_BOTTOM_TRACK = "BottomTrack"
+DATASET_EARTH_VELOCITY = "EarthVelocity"
+DATASET_SYSTEM_SETUP = "SystemSetup"
+ALL_DATASETS = frozenset([DATASET_ENSEMBLE_DATA,
+                          DATASET_ANCILLARY_DATA,
+                          DATASET_BOTTOM_TRACK,
+                          DATASET_EARTH_VELOCITY,
+                          DATASET_SYSTEM_SETUP])
+
+
+def bad_velocity_mask(values) -> np.ndarray:
+    """
+    Find all the values that are bad velocity.  Compare against the BadVelocity
+    value and not a threshold, because this is also used for direction values.
+    :param values: Array of values.
+    :return: Boolean array, True if the value is bad velocity or not a number.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return ~np.isfinite(values) | np.isclose(values, Ensemble.BadVelocity, rtol=0.0, atol=1e-3)
+
+
+class DecodedEnsemble:
+    """
+    The ensemble data extracted into NumPy arrays.
+    Each dataset is extracted only once, then the arrays are shared with
+    all the plots.  The plots must treat the arrays as read only.
+    """
+
+    def __init__(self, ens=None, datasets=ALL_DATASETS):
+        """
+        Extract the given datasets from the ensemble.
+        :param ens: Ensemble to extract the data from.
+        :param datasets: Datasets to extract.
+        """
+        # EnsembleData
+        self.is_ensemble_data = False
+        self.dt = None
+        self.ens_num = 0
+        self.num_bins = 0
+        self.num_beams = 0
+        self.status = 0
+        self.ss_code = ""
+        self.ss_config = 0
+
+        # AncillaryData
+        self.is_ancillary_data = False
+        self.blank = None
+        self.bin_size = None
+        self.heading = np.nan
+        self.pitch = np.nan
+        self.roll = np.nan
+        self.water_temp = np.nan
+        self.sys_temp = np.nan
+        self.pressure = np.nan
+        self.xdcr_depth = np.nan
+        self.sos = np.nan
+        self.is_upward_looking = False
+
+        # BottomTrack
+        self.is_bottom_track = False
+        self.bt_num_beams = 0
+        self.bt_range = np.empty(0)
+        self.bt_earth_vel = np.empty(0)
+        self.bt_avg_range = np.nan
+
+        # EarthVelocity
+        self.is_earth_velocity = False
+        self.earth_vel = np.empty((0, 0))
+        self.mag = np.empty(0)
+        self.dir = np.empty(0)
+
+        # SystemSetup
+        self.is_system_setup = False
+        self.voltage = np.nan
+
+        if ens:
+            self.decode(ens, datasets)
+
+    def decode(self, ens, datasets=ALL_DATASETS):
+        """
+        Extract the given datasets from the ensemble.
+        :param ens: Ensemble to extract the data from.
+        :param datasets: Datasets to extract.
+        """
+        if DATASET_ENSEMBLE_DATA in datasets and ens.IsEnsembleData:
+            self.is_ensemble_data = True
+            self.dt = ens.EnsembleData.datetime()
+            self.ens_num = ens.EnsembleData.EnsembleNumber
+            self.num_bins = ens.EnsembleData.NumBins
+            self.num_beams = ens.EnsembleData.NumBeams
+            self.status = ens.EnsembleData.Status
+            self.ss_code = ens.EnsembleData.SysFirmwareSubsystemCode
+            self.ss_config = ens.EnsembleData.SubsystemConfig
+
+        if DATASET_ANCILLARY_DATA in datasets and ens.IsAncillaryData:
+            self.is_ancillary_data = True
+            self.blank = ens.AncillaryData.FirstBinRange
+            self.bin_size = ens.AncillaryData.BinSize
+            self.heading = ens.AncillaryData.Heading
+            self.pitch = ens.AncillaryData.Pitch
+            self.roll = ens.AncillaryData.Roll
+            self.water_temp = ens.AncillaryData.WaterTemp
+            self.sys_temp = ens.AncillaryData.SystemTemp
+            self.pressure = ens.AncillaryData.Pressure
+            self.xdcr_depth = ens.AncillaryData.TransducerDepth
+            self.sos = ens.AncillaryData.SpeedOfSound
+            self.is_upward_looking = ens.AncillaryData.is_upward_facing()
+
+        if DATASET_BOTTOM_TRACK in datasets and ens.IsBottomTrack:
+            self.is_bottom_track = True
+            self.bt_num_beams = ens.BottomTrack.NumBeams
+            self.bt_range = np.asarray(ens.BottomTrack.Range, dtype=np.float64)
+            self.bt_earth_vel = np.asarray(ens.BottomTrack.EarthVelocity, dtype=np.float64)
+            self.bt_avg_range = ens.BottomTrack.avg_range()
+
+        if DATASET_EARTH_VELOCITY in datasets and ens.IsEarthVelocity:
+            self.is_earth_velocity = True
+            self.earth_vel = np.asarray(ens.EarthVelocity.Velocities, dtype=np.float64)
+            self.mag = np.asarray(ens.EarthVelocity.Magnitude, dtype=np.float64)
+            self.dir = np.asarray(ens.EarthVelocity.Direction, dtype=np.float64)
+
+        if DATASET_SYSTEM_SETUP in datasets and ens.IsSystemSetup:
+            self.is_system_setup = True
+            self.voltage = ens.SystemSetup.Voltage
+
+    def remove_vessel_speed(self, bt_east: float, bt_north: float, bt_vertical: float):
+        """
+        Remove the vessel speed from the Earth Velocity data.  The shared arrays are not
+        modified, new arrays are created for the Earth Velocity, Magnitude and Direction.
+        If the bottom track velocity is bad, the data is returned unchanged.
+        :param bt_east: Bottom Track East velocity.
+        :param bt_north: Bottom Track North velocity.
+        :param bt_vertical: Bottom Track Vertical velocity.
+        :return: Earth Velocity, Magnitude and Direction with the vessel speed removed.
+        """
+        if not self.is_earth_velocity or self.earth_vel.ndim != 2 or self.earth_vel.shape[1] < 3:
+            return self.earth_vel, self.mag, self.dir
+
+        if bad_velocity_mask([bt_east, bt_north, bt_vertical]).any():
+            return self.earth_vel, self.mag, self.dir
+
+        # Only remove the vessel speed from good data
+        earth_vel = self.earth_vel.copy()
+        bad = bad_velocity_mask(earth_vel[:, :3]).any(axis=1)
+        earth_vel[~bad, 0] += bt_east
+        earth_vel[~bad, 1] += bt_north
+        earth_vel[~bad, 2] += bt_vertical
+
+        # Recalculate the Magnitude and Direction
+        east = earth_vel[:, 0]
+        north = earth_vel[:, 1]
+        vertical = earth_vel[:, 2]
+        mag = np.sqrt(east ** 2 + north ** 2 + vertical ** 2)
+        direction = np.mod(np.degrees(np.arctan2(east, north)), 360.0)
+        mag[bad] = Ensemble.BadVelocity
+        direction[bad] = Ensemble.BadVelocity
+
+        return earth_vel, mag, direction
+
+    def long_form(self, data_type, vals, bin_num=0, beam=0) -> dict:
+        """
+        Create the columns in the same long form the encode_df() DataFrames use.
+        This can be added directly to a ColumnBuffer.
+        :param data_type: Data type for all the rows or a list with the data type for each row.
+        :param vals: Values for each row.
+        :param bin_num: Bin number for all the rows or an array with the bin number for each row.
+        :param beam: Beam number for all the rows or an array with the beam number for each row.
+        :return: Dictionary of the columns.
+        """
+        vals = np.atleast_1d(np.asarray(vals, dtype=np.float64))
+        num_rows = len(vals)
+
+        return {"dt": np.full(num_rows, self.dt, dtype=object),
+                "type": np.broadcast_to(np.asarray(data_type, dtype=object), (num_rows,)),
+                "ss_code": np.full(num_rows, self.ss_code, dtype=object),
+                "ss_config": np.full(num_rows, self.ss_config, dtype=object),
+                "bin_num": np.broadcast_to(bin_num, (num_rows,)),
+                "beam": np.broadcast_to(beam, (num_rows,)),
+                "blank": np.full(num_rows, self.blank, dtype=object),
+                "bin_size": np.full(num_rows, self.bin_size, dtype=object),
+                "val": vals}
+
+
+class DecodedEnsembleColumns:
+    """
+    The data of multiple decoded ensembles stored as columns of NumPy arrays.
+    Each row is an ensemble.  The arrays of the ensembles, like the Magnitude,
+    are concatenated in a single array for each dataset.  This is much faster
+    to pickle than a list of DecodedEnsemble, so the worker processes of the
+    EnsembleParallelLoader return the decoded ensembles as columns.  The plots
+    can add all the rows to their buffers at once with add_decoded_columns().
+    """
+
+    # Values of the DecodedEnsemble and the dtype of the column
+    VALUE_COLUMNS = {"is_ensemble_data": bool,
+                     "dt": "datetime64[us]",
+                     "ens_num": np.int64,
+                     "num_bins": np.int64,
+                     "num_beams": np.int64,
+                     "status": np.int64,
+                     "ss_code": str,
+                     "ss_config": np.int64,
+                     "is_ancillary_data": bool,
+                     "blank": np.float64,
+                     "bin_size": np.float64,
+                     "heading": np.float64,
+                     "pitch": np.float64,
+                     "roll": np.float64,
+                     "water_temp": np.float64,
+                     "sys_temp": np.float64,
+                     "pressure": np.float64,
+                     "xdcr_depth": np.float64,
+                     "sos": np.float64,
+                     "is_upward_looking": bool,
+                     "is_bottom_track": bool,
+                     "bt_num_beams": np.int64,
+                     "bt_avg_range": np.float64,
+                     "is_earth_velocity": bool,
+                     "is_system_setup": bool,
+                     "voltage": np.float64}
+
+    # Arrays of the DecodedEnsemble
+    ARRAY_COLUMNS = ("bt_range", "bt_earth_vel", "earth_vel", "mag", "dir")
+
+    def __init__(self, decoded_ens_list: list = ()):
+        """
+        Store the decoded ensembles as columns.
+        :param decoded_ens_list: List of DecodedEnsemble.
+        """
+        num_ens = len(decoded_ens_list)
+
+        # Column of each value
+        self.columns = dict()
+        for col, dtype in self.VALUE_COLUMNS.items():
+            self.columns[col] = np.array([getattr(decoded_ens, col) for decoded_ens in decoded_ens_list], dtype=dtype)
+
+        # Concatenated values and the shape of each array
+        self.arrays = dict()
+        self.shapes = dict()
+        for col in self.ARRAY_COLUMNS:
+            if not num_ens:
+                self.shapes[col] = np.empty((0, 1), dtype=np.int64)
+                self.arrays[col] = np.empty(0)
+                continue
+
+            ens_arrays = [np.asarray(getattr(decoded_ens, col), dtype=np.float64) for decoded_ens in decoded_ens_list]
+            self.shapes[col] = np.array([arr.shape for arr in ens_arrays], dtype=np.int64).reshape(num_ens, -1)
+            self.arrays[col] = np.concatenate([arr.ravel() for arr in ens_arrays])
+
+    def __len__(self):
+        return len(self.columns["dt"])
+
+    def column(self, col: str) -> np.ndarray:
+        """
+        Get the value of each ensemble.
+        :param col: Value name.  Ex: "voltage"
+        :return: Array with a value for each ensemble.
+        """
+        return self.columns[col]
+
+    def array_column(self, col: str, rows: np.ndarray = None) -> tuple:
+        """
+        Get the arrays of the ensembles concatenated in a single array.
+        :param col: Array name.  Ex: "bt_range"
+        :param rows: Optional boolean mask of the ensembles.  Default is all the ensembles.
+        :return: Concatenated values of the ensembles and the number of values of each ensemble.
+        """
+        counts = self.shapes[col].prod(axis=1)
+        if rows is None:
+            return self.arrays[col], counts
+
+        # Select the values of the rows
+        return self.arrays[col][np.repeat(rows, counts)], counts[rows]
+
+    def ensembles(self):
+        """
+        Create a DecodedEnsemble for each row.  The arrays are views of the columns.
+        :return: Generator of the DecodedEnsemble in row order.
+        """
+        values = {col: self.columns[col].tolist() for col in self.VALUE_COLUMNS}
+
+        # Split the concatenated arrays
+        ens_arrays = dict()
+        for col in self.ARRAY_COLUMNS:
+            shapes = self.shapes[col]
+            ends = np.cumsum(shapes.prod(axis=1))
+            ens_arrays[col] = [arr.reshape(shape) for arr, shape in zip(np.split(self.arrays[col], ends[:-1]), shapes)]
+
+        for row in range(len(self)):
+            decoded_ens = DecodedEnsemble()
+            for col in self.VALUE_COLUMNS:
+                setattr(decoded_ens, col, values[col][row])
+            for col in self.ARRAY_COLUMNS:
+                setattr(decoded_ens, col, ens_arrays[col][row])
+            yield decoded_ens
+
+    def long_form(self, data_type, vals, rows: np.ndarray, counts=1, bin_num=0, beam=0) -> dict:
+        """
+        Create the columns in the same long form as DecodedEnsemble.long_form() for
+        all the selected ensembles.  This can be added directly to a ColumnBuffer.
+        :param data_type: Data type for all the rows or an array with the data type for each row.
+        :param vals: Values of the selected ensembles in row order.
+        :param rows: Boolean mask of the selected ensembles.
+        :param counts: Number of values of each selected ensemble.
+        :param bin_num: Bin number for all the rows or an array with the bin number for each row.
+        :param beam: Beam number for all the rows or an array with the beam number for each row.
+        :return: Dictionary of the columns.
+        """
+        vals = np.asarray(vals, dtype=np.float64).ravel()
+        num_rows = len(vals)
+
+        # Ensemble of each row
+        ens_index = np.repeat(np.flatnonzero(rows), counts)
+
+        return {"dt": self.columns["dt"][ens_index],
+                "type": np.broadcast_to(np.asarray(data_type, dtype=object), (num_rows,)),
+                "ss_code": self.columns["ss_code"][ens_index].astype(object),
+                "ss_config": self.columns["ss_config"][ens_index].astype(object),
+                "bin_num": np.broadcast_to(bin_num, (num_rows,)),
+                "beam": np.broadcast_to(beam, (num_rows,)),
+                "blank": self.columns["blank"][ens_index].astype(object),
+                "bin_size": self.columns["bin_size"][ens_index].astype(object),
+                "val": vals}
+
+
+class EnsembleDispatcher:
+    """
+    Decode each ensemble once and pass the decoded data to all the subscribed plots.
+    Register the ens_handler to the RtiCheckFile ensemble_event.
+
+    rti_check = RtiCheckFile()
+    rti_check.ensemble_event += dispatcher.ens_handler
+
+    Each plot must have the function add_decoded_ens(DecodedEnsemble).  The plot can
+    set the class variable DATASETS with the datasets it uses, so only those datasets
+    are extracted from the ensemble.  The plot can also have the function
+    add_decoded_columns(DecodedEnsembleColumns) to add many ensembles at once.
+    """
+
+    def __init__(self, plots: list = None):
+        """
+        Initialize the list of subscribed plots.
+        :param plots: Optional list of plots to subscribe.
+        """
+        self.subscribers = []
+        self.datasets = set()
+
+        if plots:
+            for plot in plots:
+                self.subscribe(plot)
+
+    def subscribe(self, plot):
+        """
+        Subscribe a plot to receive the decoded ensembles.
+        :param plot: Plot with the function add_decoded_ens().
+        """
+        if plot not in self.subscribers:
+            self.subscribers.append(plot)
+            self.datasets.update(getattr(plot, "DATASETS", ALL_DATASETS))
+
+    def unsubscribe(self, plot):
+        """
+        Stop passing the decoded ensembles to the plot.
+        :param plot: Plot to remove.
+        """
+        if plot in self.subscribers:
+            self.subscribers.remove(plot)
+
+            # Update the datasets needed by the remaining plots
+            self.datasets = set()
+            for sub in self.subscribers:
+                self.datasets.update(getattr(sub, "DATASETS", ALL_DATASETS))
+
+    def ens_handler(self, sender, ens):
+        """
+        Event handler for the RtiCheckFile ensemble_event.
+        :param sender: Sender of the event.
+        :param ens: Ensemble data.
+        """
+        self.add_ens(ens)
+
+    def add_ens(self, ens):
+        """
+        Decode the ensemble once and pass it to all the plots.
+        :param ens: Ensemble data.
+        """
+        if ens and self.subscribers:
+            self.publish(DecodedEnsemble(ens, self.datasets))
+
+    def publish(self, decoded_ens: DecodedEnsemble):
+        """
+        Pass the decoded ensemble to all the plots.
+        :param decoded_ens: Decoded ensemble data.
+        """
+        for plot in self.subscribers:
+            plot.add_decoded_ens(decoded_ens)
+
+    def publish_columns(self, ens_columns: DecodedEnsembleColumns):
+        """
+        Pass multiple decoded ensembles to all the plots.  The plots with the
+        function add_decoded_columns() get all the ensembles at once.  The other
+        plots get each ensemble with add_decoded_ens().
+        :param ens_columns: Decoded ensembles stored as columns.
+        """
+        row_plots = []
+        for plot in self.subscribers:
+            if hasattr(plot, "add_decoded_columns"):
+                plot.add_decoded_columns(ens_columns)
+            else:
+                row_plots.append(plot)
+
+        if row_plots:
+            for decoded_ens in ens_columns.ensembles():
+                for plot in row_plots:
+                    plot.add_decoded_ens(decoded_ens)
@@ -0,0 +1,116 @@
+import threading
+from rti_python.Utilities.read_binary_file import ReadBinaryFile
+from rti_python_plot.utils.ens_dispatcher import EnsembleDispatcher, DecodedEnsemble
+
+
+class EnsembleIngestWorker(threading.Thread):
+    """
+    Decode a binary ensemble file in a background thread.
+    The ensembles are decoded as they are read and passed to the dispatcher
+    in chunks, so the plots can display the data already decoded while the
+    rest of the file is read.
+
+    The plots are updated from this thread.  Hold the lock while reading the
+    plot data, so a chunk is not added while the data is read.  Display the
+    plot after the lock is released, so the decoding is not blocked.
+
+    worker = EnsembleIngestWorker(file_path, dispatcher)
+    worker.start()
+
+    with worker.lock:
+        fig = heatmap.get_figure("mag", max_columns=1000)
+    heatmap.display_figure(fig)
+    """
+
+    def __init__(self, file_path: str, dispatcher: EnsembleDispatcher, chunk_size: int = 500):
+        """
+        Initialize the worker.  Call start() to begin decoding the file.
+        :param file_path: File path of the binary ensemble file.
+        :param dispatcher: Dispatcher to pass the decoded ensembles to the plots.
+        :param chunk_size: Number of ensembles to decode before passing them to the plots.
+        """
+        threading.Thread.__init__(self, name="EnsembleIngestWorker", daemon=True)
+
+        self.file_path = file_path
+        self.dispatcher = dispatcher
+        self.chunk_size = max(1, int(chunk_size))
+
+        # Lock to access the plots
+        self.lock = threading.RLock()
+
+        # Ensembles decoded and not passed to the plots yet
+        self.pending = []
+
+        self.ens_count = 0
+        self.bytes_read = 0
+        self.total_bytes = 0
+        self.error = None
+        self.is_done = False
+
+    @property
+    def progress(self) -> float:
+        """
+        Progress of reading the file.
+        :return: Value between 0.0 and 1.0.
+        """
+        if self.is_done:
+            return 1.0
+        if self.total_bytes <= 0:
+            return 0.0
+        return min(1.0, self.bytes_read / self.total_bytes)
+
+    def run(self):
+        """
+        Read the file and decode all the ensembles.
+        """
+        reader = ReadBinaryFile()
+        reader.ensemble_event += self.ens_handler
+        reader.file_progress_event += self.file_progress_handler
+
+        try:
+            reader.playback(self.file_path)
+        except Exception as ex:
+            self.error = ex
+        finally:
+            # Pass the remaining ensembles to the plots
+            self.flush()
+            self.is_done = True
+
+    def ens_handler(self, sender, ens):
+        """
+        Event handler for the ReadBinaryFile ensemble_event.
+        Decode the ensemble and pass the chunk to the plots when it is full.
+        :param sender: Sender of the event.
+        :param ens: Ensemble data.
+        """
+        if ens:
+            self.pending.append(DecodedEnsemble(ens, self.dispatcher.datasets))
+
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def file_progress_handler(self, sender, bytes_read: int, total_size: int, file_name: str):
+        """
+        Event handler for the ReadBinaryFile file_progress_event.
+        :param sender: Sender of the event.
+        :param bytes_read: Number of bytes read.
+        :param total_size: Total size of the file.
+        :param file_name: File name.
+        """
+        self.bytes_read = bytes_read
+        self.total_bytes = total_size
+
+    def flush(self):
+        """
+        Pass all the pending ensembles to the plots.
+        """
+        if not self.pending:
+            return
+
+        pending = self.pending
+        self.pending = []
+
+        with self.lock:
+            for decoded_ens in pending:
+                self.dispatcher.publish(decoded_ens)
+            self.ens_count += len(pending)
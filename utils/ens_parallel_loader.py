@@ -0,0 +1,172 @@
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from rti_python.Codecs.BinaryCodec import BinaryCodec
+from rti_python_plot.utils.ens_dispatcher import EnsembleDispatcher, DecodedEnsemble, DecodedEnsembleColumns, ALL_DATASETS
+
+
+# Ensemble binary format
+# Header: 16 bytes of 0x80, ensemble number, inverse ensemble number, payload size, inverse payload size
+ENS_SYNC = b'\x80' * 16
+ENS_HEADER_SIZE = 32
+ENS_CHECKSUM_SIZE = 4
+
+# Size of the block read to find an ensemble header
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+
+def read_ens_header(data: bytes, pos: int):
+    """
+    Read and verify the ensemble header at the given position.
+    :param data: Binary data.
+    :param pos: Position of the 16 bytes of 0x80.
+    :return: Ensemble number and total ensemble size with the header and checksum.  None if not a valid header.
+    """
+    if pos + ENS_HEADER_SIZE > len(data):
+        return None
+
+    ens_num, inv_ens_num, payload_size, inv_payload_size = struct.unpack_from('<iiii', data, pos + 16)
+    if ens_num != ~inv_ens_num or payload_size != ~inv_payload_size or payload_size < 0:
+        return None
+
+    return ens_num, ENS_HEADER_SIZE + payload_size + ENS_CHECKSUM_SIZE
+
+
+def find_ens_header(data: bytes, pos: int = 0) -> int:
+    """
+    Find the next valid ensemble header.
+    :param data: Binary data.
+    :param pos: Position to start searching.
+    :return: Position of the header or -1 if not found.
+    """
+    while True:
+        pos = data.find(ENS_SYNC, pos)
+        if pos < 0 or read_ens_header(data, pos):
+            return pos
+        pos += 1
+
+
+def find_ens_boundary(file_path: str, offset: int, file_size: int) -> int:
+    """
+    Find the first ensemble header at or after the offset in the file.
+    :param file_path: File path of the binary ensemble file.
+    :param offset: Position in the file to start searching.
+    :param file_size: Size of the file.
+    :return: Position of the header or the file size if not found.
+    """
+    with open(file_path, 'rb') as f:
+        while offset < file_size:
+            f.seek(offset)
+            data = f.read(SCAN_BLOCK_SIZE + ENS_HEADER_SIZE)
+            pos = find_ens_header(data)
+            if 0 <= pos <= SCAN_BLOCK_SIZE:
+                return offset + pos
+            offset += SCAN_BLOCK_SIZE
+
+    return file_size
+
+
+def decode_file_range(file_path: str, start: int, end: int, datasets=ALL_DATASETS) -> DecodedEnsembleColumns:
+    """
+    Decode all the ensembles that start within the byte range of the file.
+    This is run in a worker process, so the result must be picklable.  The
+    ensembles are returned as columns of NumPy arrays, which are pickled much
+    faster than a list of DecodedEnsemble.
+    :param file_path: File path of the binary ensemble file.
+    :param start: First byte of the range.
+    :param end: Last byte of the range (exclusive).
+    :param datasets: Datasets to extract from the ensembles.
+    :return: Decoded ensembles sorted by ensemble number.
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    decoded = []
+    pos = find_ens_header(data)
+    while pos >= 0:
+        ens_num, ens_size = read_ens_header(data, pos)
+        ens_bytes = data[pos:pos + ens_size]
+
+        # Verify the checksum before decoding
+        if len(ens_bytes) == ens_size and BinaryCodec.verify_ens_data(ens_bytes):
+            ens = BinaryCodec.decode_data_sets(ens_bytes)
+            if ens:
+                decoded.append(DecodedEnsemble(ens, datasets))
+            pos = find_ens_header(data, pos + ens_size)
+        else:
+            pos = find_ens_header(data, pos + 1)
+
+    decoded.sort(key=lambda decoded_ens: decoded_ens.ens_num)
+    return DecodedEnsembleColumns(decoded)
+
+
+class EnsembleParallelLoader:
+    """
+    Decode a binary ensemble file using multiple processes.
+    The file is split into byte ranges on ensemble boundaries.  Each range
+    is decoded in a worker process.  The results are passed to the dispatcher
+    in file order, as soon as all the ranges before it are decoded.  The plots
+    with add_decoded_columns() add all the ensembles of a range at once.
+
+    The worker processes import this module, so on Windows the loader must
+    be used within an if __name__ == "__main__": block.
+
+    loader = EnsembleParallelLoader(dispatcher)
+    loader.load(file_path)
+    """
+
+    def __init__(self, dispatcher: EnsembleDispatcher, max_workers: int = None, ranges_per_worker: int = 4, min_range_size: int = 4 * 1024 * 1024):
+        """
+        Initialize the loader.
+        :param dispatcher: Dispatcher to pass the decoded ensembles to the plots.
+        :param max_workers: Number of worker processes.  Default is the number of CPUs.
+        :param ranges_per_worker: Number of byte ranges for each worker.  More ranges balances the work and passes data to the plots sooner.
+        :param min_range_size: Minimum number of bytes in a range.
+        """
+        self.dispatcher = dispatcher
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.ranges_per_worker = max(1, int(ranges_per_worker))
+        self.min_range_size = max(1, int(min_range_size))
+
+    def split_file(self, file_path: str) -> list:
+        """
+        Split the file into byte ranges.  Each range starts on an ensemble header.
+        :param file_path: File path of the binary ensemble file.
+        :return: List of (start, end) byte ranges.
+        """
+        file_size = os.path.getsize(file_path)
+        num_ranges = self.max_workers * self.ranges_per_worker
+        range_size = max(self.min_range_size, file_size // num_ranges + 1)
+
+        # Move each boundary to the next ensemble header
+        boundaries = [0]
+        for offset in range(range_size, file_size, range_size):
+            boundary = find_ens_boundary(file_path, max(offset, boundaries[-1]), file_size)
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+        boundaries.append(file_size)
+
+        return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1) if boundaries[i] < boundaries[i + 1]]
+
+    def load(self, file_path: str) -> int:
+        """
+        Decode the file and pass all the ensembles to the dispatcher.
+        :param file_path: File path of the binary ensemble file.
+        :return: Number of ensembles decoded.
+        """
+        ranges = self.split_file(file_path)
+        datasets = frozenset(self.dispatcher.datasets) if self.dispatcher.datasets else ALL_DATASETS
+
+        ens_count = 0
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(decode_file_range, file_path, start, end, datasets) for start, end in ranges]
+
+            # Pass the results in file order
+            # All the ensembles of a range are added to the plots at once
+            for future in futures:
+                ens_columns = future.result()
+                self.dispatcher.publish_columns(ens_columns)
+                ens_count += len(ens_columns)
+
+        return ens_count
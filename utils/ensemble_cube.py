@@ -0,0 +1,465 @@
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+
+
+# Suffix of the nan-max quantities in the pyramid levels
+PYRAMID_MAX_SUFFIX = "_max"
+
+# Default number of pyramid levels for the heatmaps.  The top level averages 2**16 ensembles.
+HEATMAP_PYRAMID_LEVELS = 16
+
+
+class EnsembleCube:
+    """
+    Store the profile data of all the ensembles in a data cube.
+    Each quantity (Magnitude, Direction, Amplitude, ...) is a float32 array
+    with the shape [ensembles, bins, beams].  The time of each ensemble is
+    stored as int64 epoch nanoseconds.
+
+    The arrays grow in chunks of ensembles.  Heatmaps and profiles can
+    slice the arrays directly without pivoting the data.
+
+    The number of bins is set by the first ensemble added.  If a later
+    ensemble has more bins, the extra bins are dropped.  If it has less bins,
+    the missing bins are NaN.
+
+    For long deployments, give a cache directory.  The arrays are then
+    numpy.memmap files in the cache directory.  New ensembles are appended
+    to the end of the files and only the pages that are read or written are
+    kept in memory, so use window() to read only the time displayed.
+    The files are removed by close() or when the cube is garbage collected.
+
+    Give pyramid_levels to also keep time aggregated levels of the data.
+    Level 1 is the nan-mean of every pyramid_factor ensembles, level 2 of every
+    pyramid_factor**2 ensembles, and so on.  The levels are cubes themselves and
+    are updated as complete groups of ensembles are added.  Use level() to get
+    the level that matches the width of the plot, so a heatmap of any time
+    range has about the same number of columns.
+    """
+
+    def __init__(self, quantities: dict, chunk_size: int = 1024, cache_dir: str = None,
+                 pyramid_levels: int = 0, pyramid_factor: int = 2, pyramid_max: bool = False, pyramid_circular=()):
+        """
+        Initialize the cube.  The arrays are allocated when the first
+        ensemble is added and the number of bins is known.
+        :param quantities: Dictionary of quantity name to number of beams.  Ex: {"mag": 1, "amp": 4}
+        :param chunk_size: Number of ensembles to allocate at a time.
+        :param cache_dir: Optional directory to store the arrays as memory mapped files.
+        :param pyramid_levels: Number of time aggregated levels to keep.  0 for no levels.
+        :param pyramid_factor: Number of ensembles of a level combined in the next level.
+        :param pyramid_max: Flag to also keep the nan-max of each quantity in the levels.  Ex: "mag_max"
+        :param pyramid_circular: Names of the quantities in degrees, like the direction.  They are averaged as angles, so 350 and 10 average to 0.
+        """
+        self.quantities = dict(quantities)
+        self.chunk_size = max(1, int(chunk_size))
+
+        # Create a folder in the cache directory for the memory mapped files
+        self.cache_path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.cache_path = tempfile.mkdtemp(prefix="ens_cube_", dir=cache_dir)
+
+        # Remove the memory mapped files when the cube is garbage collected, if close() is not called
+        self._remove_cache = None
+        if self.cache_path is not None:
+            self._remove_cache = weakref.finalize(self, shutil.rmtree, self.cache_path, True)
+
+        # Time aggregated levels.  The memory mapped files are in the folder of this cube.
+        self.pyramid_factor = max(2, int(pyramid_factor))
+        self.pyramid_max = pyramid_max
+        self.pyramid_circular = set(pyramid_circular)
+        level_quantities = dict(self.quantities)
+        if pyramid_max:
+            for name, num_beams in self.quantities.items():
+                level_quantities[name + PYRAMID_MAX_SUFFIX] = num_beams
+        self.levels = [EnsembleCube(level_quantities, chunk_size, self.cache_path) for _ in range(max(0, int(pyramid_levels)))]
+
+        self.num_ens = 0
+        self.num_bins = 0
+        self.capacity = 0
+
+        # Bin configuration
+        self.blank = 0.0
+        self.bin_size = 0.0
+        self.is_upward_looking = False
+
+        # Time axis as epoch nanoseconds
+        self.times = np.empty(0, dtype=np.int64)
+
+        # Data for each quantity [ensembles, bins, beams]
+        self.data = dict()
+
+    def __len__(self):
+        return self.num_ens
+
+    @property
+    def empty(self) -> bool:
+        return self.num_ens == 0
+
+    def _allocate(self, capacity: int):
+        """
+        Allocate the arrays with the given capacity and copy the existing data.
+        If the arrays are memory mapped, the files are extended instead.
+        :param capacity: Number of ensembles the arrays can hold.
+        """
+        self.times = self._grow_array("time", self.times if self.capacity else None, (capacity,), np.int64, 0)
+
+        for name, num_beams in self.quantities.items():
+            self.data[name] = self._grow_array(name,
+                                               self.data.get(name),
+                                               (capacity, self.num_bins, num_beams),
+                                               np.float32,
+                                               np.nan)
+
+        self.capacity = capacity
+
+    def _grow_array(self, name: str, arr, shape: tuple, dtype, fill) -> np.ndarray:
+        """
+        Create a larger array and keep the existing data.  The new elements are set to the fill value.
+        :param name: Name of the array.  Used for the memory mapped file name.
+        :param arr: Existing array or None.
+        :param shape: New shape.  Only the first dimension can grow.
+        :param dtype: Data type of the array.
+        :param fill: Value to set the new elements.
+        :return: New array.
+        """
+        if self.cache_path is None:
+            new_arr = np.full(shape, fill, dtype=dtype)
+            if arr is not None:
+                new_arr[:self.num_ens] = arr[:self.num_ens]
+            return new_arr
+
+        # Extend the file.  The data is stored by ensemble, so the existing
+        # data stays in the same location in the file.
+        file_path = os.path.join(self.cache_path, name + ".dat")
+        if arr is None:
+            mode = "w+"
+            old_len = 0
+        else:
+            arr.flush()
+            mode = "r+"
+            old_len = arr.shape[0]
+
+        new_arr = np.memmap(file_path, dtype=dtype, mode=mode, shape=shape)
+        new_arr[old_len:] = fill
+        return new_arr
+
+    def _reserve(self, num_ens: int):
+        """
+        Verify there is room for the new ensembles.  If not, grow the arrays
+        by whole chunks.  The capacity at least doubles so adding is O(1) amortized.
+        :param num_ens: Number of ensembles to add.
+        """
+        needed = self.num_ens + num_ens
+        if needed <= self.capacity:
+            return
+
+        capacity = max(needed, self.capacity * 2)
+        capacity = int(np.ceil(capacity / self.chunk_size)) * self.chunk_size
+        self._allocate(capacity)
+
+    def set_bin_config(self, blank: float, bin_size: float, is_upward_looking: bool = False):
+        """
+        Set the bin configuration used to calculate the bin depths.
+        :param blank: Blank distance (first bin range).
+        :param bin_size: Bin size.
+        :param is_upward_looking: Flag if the ADCP is upward looking.
+        """
+        self.blank = blank
+        self.bin_size = bin_size
+        self.is_upward_looking = is_upward_looking
+
+    def append(self, dt, values: dict):
+        """
+        Add an ensemble to the cube.
+        :param dt: Datetime of the ensemble.
+        :param values: Dictionary of quantity name to the ensemble values [bins] or [bins, beams].
+        """
+        # The first ensemble sets the number of bins
+        if self.capacity == 0:
+            num_bins = 0
+            for val in values.values():
+                num_bins = max(num_bins, len(val))
+            self.num_bins = num_bins
+
+        self._reserve(1)
+
+        index = self.num_ens
+        self.times[index] = np.datetime64(dt, 'ns').astype(np.int64)
+
+        for name, val in values.items():
+            if name not in self.data:
+                continue
+
+            val = np.asarray(val, dtype=np.float32)
+            if val.ndim == 1:
+                val = val[:, np.newaxis]
+
+            num_bins = min(self.num_bins, val.shape[0])
+            num_beams = min(self.quantities[name], val.shape[1])
+            self.data[name][index, :num_bins, :num_beams] = val[:num_bins, :num_beams]
+
+        self.num_ens += 1
+        self._update_pyramid()
+
+    def extend(self, times, values: dict):
+        """
+        Add a block of ensembles to the cube.
+        :param times: Datetime of each ensemble.
+        :param values: Dictionary of quantity name to the values [ensembles, bins] or [ensembles, bins, beams].
+        """
+        times = np.asarray(times, dtype='datetime64[ns]')
+        num_ens = len(times)
+        if num_ens == 0:
+            return
+
+        # The first block sets the number of bins
+        if self.capacity == 0:
+            num_bins = 0
+            for val in values.values():
+                num_bins = max(num_bins, np.shape(val)[1])
+            self.num_bins = num_bins
+
+        self._reserve(num_ens)
+
+        start = self.num_ens
+        end = start + num_ens
+        self.times[start:end] = times.astype(np.int64)
+
+        for name, val in values.items():
+            if name not in self.data:
+                continue
+
+            val = np.asarray(val, dtype=np.float32)
+            if val.ndim == 2:
+                val = val[:, :, np.newaxis]
+
+            num_bins = min(self.num_bins, val.shape[1])
+            num_beams = min(self.quantities[name], val.shape[2])
+            self.data[name][start:end, :num_bins, :num_beams] = val[:, :num_bins, :num_beams]
+
+        self.num_ens = end
+        self._update_pyramid()
+
+    def _update_pyramid(self):
+        """
+        Add the new complete groups of ensembles to each pyramid level.
+        Only the ensembles added since the last update are read.  Each level is
+        calculated from the full resolution data, so the nan-mean is exact.
+        """
+        for level_num, level in enumerate(self.levels, start=1):
+            group_size = self.pyramid_factor ** level_num
+            num_groups = self.num_ens // group_size
+
+            # If this level has no new group, the higher levels do not either
+            if num_groups <= level.num_ens:
+                break
+
+            group_times, values = self._group_values(level.num_ens * group_size, num_groups * group_size, group_size)
+
+            level.set_bin_config(self.blank, self.bin_size, self.is_upward_looking)
+            level.extend(group_times, values)
+
+    def _group_values(self, first: int, last: int, group_size: int) -> tuple:
+        """
+        Combine each group of ensembles like a pyramid level.
+        :param first: Index of the first ensemble.
+        :param last: Index after the last ensemble.  last - first must be a multiple of group_size.
+        :param group_size: Number of ensembles in a group.
+        :return: Time of each group and the dictionary of quantity name to the values [groups, bins, beams].
+        """
+        # The time of a group is the middle of the group
+        times = self.times[first:last].reshape(-1, group_size)
+        group_times = times[:, 0] + (times[:, -1] - times[:, 0]) // 2
+
+        values = dict()
+        for name, num_beams in self.quantities.items():
+            data = self.data[name][first:last].reshape(-1, group_size, self.num_bins, num_beams)
+            if name in self.pyramid_circular:
+                values[name] = _nanmean_degrees(data, axis=1)
+            else:
+                values[name] = _nanmean(data, axis=1)
+            if self.pyramid_max:
+                values[name + PYRAMID_MAX_SUFFIX] = np.fmax.reduce(data, axis=1)
+
+        return group_times.view('datetime64[ns]'), values
+
+    def flush(self):
+        """
+        Write the memory mapped arrays to disk.
+        """
+        if self.cache_path is not None and self.capacity > 0:
+            self.times.flush()
+            for arr in self.data.values():
+                arr.flush()
+
+        for level in self.levels:
+            level.flush()
+
+    def close(self):
+        """
+        Release the arrays.  If the arrays are memory mapped, the files are removed.
+        """
+        for level in self.levels:
+            level.close()
+
+        self.times = np.empty(0, dtype=np.int64)
+        self.data = dict()
+        self.num_ens = 0
+        self.capacity = 0
+
+        if self._remove_cache is not None:
+            self._remove_cache()
+            self.cache_path = None
+
+    def window(self, start=None, end=None) -> slice:
+        """
+        Find the ensembles within the time window.  The ensembles must be
+        added in time order.  Only the time axis is searched, so this does not
+        read the data.
+        :param start: Start datetime.  None for the first ensemble.
+        :param end: End datetime (inclusive).  None for the last ensemble.
+        :return: Slice of the ensemble indexes.
+        """
+        times = self.times[:self.num_ens]
+
+        first = 0
+        if start is not None:
+            first = int(np.searchsorted(times, np.datetime64(start, 'ns').astype(np.int64), side='left'))
+
+        last = self.num_ens
+        if end is not None:
+            last = int(np.searchsorted(times, np.datetime64(end, 'ns').astype(np.int64), side='right'))
+
+        return slice(first, last)
+
+    def time_axis(self, index: slice = None) -> np.ndarray:
+        """
+        Get the time of each ensemble.  This is a view of the time axis.
+        :param index: Optional slice of the ensembles from window().
+        :return: Array of datetime64[ns].
+        """
+        return self.times[:self.num_ens][index or slice(None)].view('datetime64[ns]')
+
+    def bin_depths(self) -> np.ndarray:
+        """
+        Get the depth of each bin.
+        :return: Array of bin depths.
+        """
+        return self.blank + (np.arange(self.num_bins) * self.bin_size)
+
+    def quantity(self, name: str, index: slice = None) -> np.ndarray:
+        """
+        Get the data for the quantity.  This is a view of the data.
+        :param name: Quantity name.
+        :param index: Optional slice of the ensembles from window().
+        :return: Array [ensembles, bins, beams].
+        """
+        return self.data[name][:self.num_ens][index or slice(None)]
+
+    def heatmap(self, name: str, beam: int = 0, index: slice = None) -> np.ndarray:
+        """
+        Get the heatmap z matrix for the quantity and beam.
+        This is a transposed view of the data, no data is copied.
+        :param name: Quantity name.
+        :param beam: Beam number.
+        :param index: Optional slice of the ensembles from window().
+        :return: Array [bins, ensembles].
+        """
+        return self.quantity(name, index)[:, :, beam].T
+
+    def profile(self, name: str, index: int = -1) -> np.ndarray:
+        """
+        Get the profile of an ensemble.  This is a view of the data.
+        :param name: Quantity name.
+        :param index: Ensemble index.  Default is the latest ensemble.
+        :return: Array [bins, beams].
+        """
+        return self.quantity(name)[index]
+
+    def level(self, max_columns: int = None, index: slice = None) -> tuple:
+        """
+        Select the pyramid level to plot the ensembles with at most max_columns
+        columns.  The lowest level with few enough columns is used, so the plot
+        keeps as much detail as it can display.  If the window includes the
+        latest ensembles that do not fill a complete group yet, the mean of
+        those ensembles is added as the last column.  The level and the last
+        column are then copied into a small cube in memory.
+        :param max_columns: Maximum number of columns.  Usually the width of the plot in pixels.  None for full resolution.
+        :param index: Optional slice of the ensembles from window().
+        :return: Cube of the level and the slice of its ensembles.  The cube is this cube for full resolution.
+        """
+        start, stop, _ = (index or slice(None)).indices(self.num_ens)
+        num_ens = max(0, stop - start)
+
+        # Find the lowest level with few enough columns
+        level_num = 0
+        if max_columns:
+            while level_num < len(self.levels) and -(-num_ens // self.pyramid_factor ** level_num) > max_columns:
+                level_num += 1
+
+        # Use a lower level if the level does not have the window yet
+        while level_num > 0:
+            group_size = self.pyramid_factor ** level_num
+            level = self.levels[level_num - 1]
+            level_index = slice(start // group_size, min(-(-stop // group_size), level.num_ens))
+            if level_index.stop > level_index.start:
+                # Add the latest ensembles that are not in a complete group yet
+                tail_start = level.num_ens * group_size
+                if stop > tail_start:
+                    return self._level_with_tail(level, level_index, tail_start, stop), slice(0, level_index.stop - level_index.start + 1)
+                return level, level_index
+            level_num -= 1
+
+        return self, slice(start, stop)
+
+    def _level_with_tail(self, level, level_index: slice, tail_start: int, stop: int):
+        """
+        Copy the window of the level into a cube in memory and add the mean of the
+        ensembles that are not in a complete group of the level yet.
+        :param level: Pyramid level.
+        :param level_index: Slice of the level.  It ends at the last group of the level.
+        :param tail_start: Index of the first ensemble not in the level.
+        :param stop: Index after the last ensemble of the window.
+        :return: Cube with the level columns and the partial group as the last column.
+        """
+        cube = EnsembleCube(level.quantities, chunk_size=level_index.stop - level_index.start + 1)
+        cube.set_bin_config(self.blank, self.bin_size, self.is_upward_looking)
+        cube.extend(level.time_axis(level_index), {name: level.quantity(name, level_index) for name in level.quantities})
+
+        tail_time, tail_values = self._group_values(tail_start, stop, stop - tail_start)
+        cube.extend(tail_time, tail_values)
+
+        return cube
+
+
+def _nanmean(data: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Get the mean of the data ignoring NaN.  All NaN values give NaN without a warning.
+    :param data: Data array.
+    :param axis: Axis to average.
+    :return: Float32 array of the mean.
+    """
+    is_valid = np.isfinite(data)
+    total = np.where(is_valid, data, 0.0).sum(axis=axis, dtype=np.float64)
+    count = is_valid.sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (total / count).astype(np.float32)
+
+
+def _nanmean_degrees(data: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Get the mean of the angles ignoring NaN.  The angles are averaged as unit vectors.
+    :param data: Angles in degrees.
+    :param axis: Axis to average.
+    :return: Float32 array of the mean angle from 0 to 360.
+    """
+    radians = np.deg2rad(data.astype(np.float64))
+    mean = np.rad2deg(np.arctan2(_nanmean(np.sin(radians), axis), _nanmean(np.cos(radians), axis)))
+    mean = np.mod(mean, 360.0).astype(np.float32)
+
+    # Rounding can give 360 for a small negative angle
+    return np.where(mean >= 360.0, np.float32(0.0), mean)
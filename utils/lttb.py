@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, target_points: int) -> np.ndarray:
+    """
+    Select the points to display with the Largest-Triangle-Three-Buckets algorithm.
+    The first and last points are kept.  The other points are split into
+    target_points - 2 buckets, and the point of each bucket that makes the
+    largest triangle with the point selected in the previous bucket and the
+    average of the next bucket is kept.  This keeps the peaks of the line.
+
+    The selection of a bucket depends on the previous bucket, so the buckets
+    are done in order.  Each bucket is computed with NumPy.
+    :param x: X values in increasing order.  Numbers or datetimes.
+    :param y: Y values.
+    :param target_points: Number of points to keep.
+    :return: Indexes of the points to keep.
+    """
+    num_points = len(y)
+    if target_points is None or target_points >= num_points or target_points < 3:
+        return np.arange(num_points)
+
+    x = _to_float(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket boundaries for the points between the first and last point
+    edges = np.linspace(1, num_points - 1, target_points - 1).astype(np.intp)
+
+    # Average of each bucket, ignoring NaN.  The last point is the average after the last bucket.
+    is_valid = np.isfinite(y)
+    counts = np.add.reduceat(is_valid[1:-1], edges[:-1] - 1).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_x = np.add.reduceat(x[1:-1], edges[:-1] - 1) / np.diff(edges)
+        avg_y = np.add.reduceat(np.where(is_valid, y, 0.0)[1:-1], edges[:-1] - 1) / counts
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(target_points, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = num_points - 1
+
+    prev = 0
+    for bucket in range(target_points - 2):
+        start = edges[bucket]
+        end = edges[bucket + 1]
+
+        # Area of the triangle for each point of the bucket
+        with np.errstate(invalid='ignore'):
+            area = np.abs((x[prev] - avg_x[bucket]) * (y[start:end] - y[prev]) -
+                          (x[prev] - x[start:end]) * (avg_y[bucket] - y[prev]))
+
+        # NaN is only kept if the whole bucket is NaN
+        area = np.where(np.isnan(area), -1.0, area)
+        prev = start + int(np.argmax(area))
+        selected[bucket + 1] = prev
+
+    return selected
+
+
+def lttb_downsample(x, y, target_points: int = None) -> tuple:
+    """
+    Reduce the number of points of a line with the Largest-Triangle-Three-Buckets algorithm.
+    :param x: X values in increasing order.  Numbers or datetimes.
+    :param y: Y values.
+    :param target_points: Number of points to keep.  None to keep all the points.
+    :return: X and Y values to display.  The values are not changed if there are less points than target_points.
+    """
+    if target_points is None or len(y) <= target_points:
+        return x, y
+
+    index = lttb_indices(x, y, target_points)
+    return np.asarray(x)[index], np.asarray(y)[index]
+
+
+def _to_float(x) -> np.ndarray:
+    """
+    Convert the x values to float, so the triangle areas can be computed.
+    :param x: Numbers, datetimes or datetime strings.
+    :return: Float array.
+    """
+    values = np.asarray(x)
+    if np.issubdtype(values.dtype, np.number):
+        return values.astype(np.float64)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+
+    return pd.to_datetime(values).asi8.astype(np.float64)
@@ -0,0 +1,167 @@
+import os
+import glob
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+# File extension of the cached results
+CACHE_FILE_EXT = ".npz"
+
+
+class QueryCache:
+    """
+    Persistent cache of query results.
+    Each result is stored as a compressed numpy file with one array for each
+    column, so a result is loaded without running the query again.
+
+    The key is a hash of the query, the parameters and the version of the
+    database file.  When the database file changes, the old results are no
+    longer used and are removed by the LRU eviction.  The least recently used
+    results are removed when the total size is greater than max_bytes.
+
+    cache = QueryCache(db_file_path + ".cache")
+    df = cache.get(key)
+    if df is None:
+        df = pd.read_sql_query(query, conn)
+        cache.put(key, df)
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache.
+        :param cache_dir: Folder to store the results.  It is created if it does not exist.
+        :param max_bytes: Maximum total size of the cached results in bytes.
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max(0, int(max_bytes))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(query: str, params, version) -> str:
+        """
+        Create the key for the query result.
+        :param query: SQL query.
+        :param params: Query parameters.
+        :param version: Version of the database file.
+        :return: Key of the result.
+        """
+        text = repr((query, list(params) if params is not None else None, version))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def file_path(self, key: str) -> str:
+        """
+        Get the file path for the key.
+        :param key: Key of the result.
+        :return: File path of the result.
+        """
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXT)
+
+    def get(self, key: str):
+        """
+        Get the cached result.
+        :param key: Key of the result.
+        :return: DataFrame of the result or None if not cached.
+        """
+        file_path = self.file_path(key)
+        try:
+            with np.load(file_path, allow_pickle=False) as data:
+                columns = data["__columns__"].tolist()
+                df = DataFrame({col: self._load_column(data, i) for i, col in enumerate(columns)}, columns=columns)
+
+            # Mark the result as recently used
+            os.utime(file_path)
+        except (OSError, KeyError, ValueError):
+            return None
+
+        return df
+
+    def put(self, key: str, df: DataFrame):
+        """
+        Store the result.  The least recently used results are removed if the cache is full.
+        :param key: Key of the result.
+        :param df: DataFrame of the result.
+        """
+        arrays = {"__columns__": np.array([str(col) for col in df.columns], dtype=str)}
+        for i, col in enumerate(df.columns):
+            arrays.update(self._save_column(df.iloc[:, i], i))
+
+        # Write to a temporary file, so a partial file is never read
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, self.file_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used results until the total size is within max_bytes.
+        """
+        files = []
+        for file_path in glob.glob(os.path.join(self.cache_dir, "*" + CACHE_FILE_EXT)):
+            try:
+                stat = os.stat(file_path)
+                files.append((stat.st_mtime_ns, stat.st_size, file_path))
+            except OSError:
+                pass
+
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, file_path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            total_bytes -= size
+
+    def clear(self):
+        """
+        Remove all the cached results.
+        """
+        for file_path in glob.glob(os.path.join(self.cache_dir, "*" + CACHE_FILE_EXT)):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _save_column(col: pd.Series, index: int) -> dict:
+        """
+        Convert the column to arrays that can be saved without pickle.
+        Text columns are saved as unicode with a mask of the NULL values.
+        :param col: Column of the result.
+        :param index: Index of the column.
+        :return: Arrays to save.
+        """
+        if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+            return {"c" + str(index): col.to_numpy()}
+
+        is_null = col.isna().to_numpy()
+        values = col.where(~is_null, "").astype(str).to_numpy(dtype=str)
+        return {"c" + str(index): values, "n" + str(index): is_null}
+
+    @staticmethod
+    def _load_column(data, index: int):
+        """
+        Convert the saved arrays back to a column.
+        :param data: Loaded numpy file.
+        :param index: Index of the column.
+        :return: Values of the column.
+        """
+        values = data["c" + str(index)]
+        null_name = "n" + str(index)
+        if null_name not in data.files:
+            return values
+
+        values = values.astype(object)
+        values[data[null_name]] = None
+        return values
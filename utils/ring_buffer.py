@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class RecordRingBuffer:
+    """
+    Preallocated ring buffer of records.  All the columns are stored in a
+    single NumPy record array.  A write cursor is used to add new records and
+    a read cursor keeps track of the records that have not been read yet.
+
+    The cursors only increase, the index into the array is the cursor modulo
+    the capacity.  If the writer gets more than the capacity ahead of the reader,
+    the oldest records are dropped.
+
+    This class is not thread safe.  The caller must lock access if the buffer
+    is written and read from different threads.
+    """
+
+    def __init__(self, dtype: list, capacity: int):
+        """
+        Allocate the record array.
+        :param dtype: NumPy structured dtype description.  List of (name, type).
+        :param capacity: Maximum number of records to buffer.
+        """
+        self.dtype = np.dtype(dtype)
+        self.capacity = max(1, int(capacity))
+        self.records = np.empty(self.capacity, dtype=self.dtype)
+
+        # Value used to initialize each new record
+        self.blank_record = np.zeros(1, dtype=self.dtype)[0]
+        for name in self.dtype.names:
+            kind = self.dtype[name].kind
+            if kind == 'f':
+                self.blank_record[name] = np.nan
+            elif kind == 'M':
+                self.blank_record[name] = np.datetime64('NaT')
+
+        self.write_cursor = 0
+        self.read_cursor = 0
+
+    def __len__(self):
+        """
+        Number of records not read yet.
+        """
+        return self.write_cursor - self.read_cursor
+
+    @property
+    def names(self) -> tuple:
+        return self.dtype.names
+
+    def append(self, values: dict):
+        """
+        Add a record to the buffer.  Any fields not given are set to NaN.
+        :param values: Dictionary of field name to value.
+        """
+        index = self.write_cursor % self.capacity
+        self.records[index] = self.blank_record
+        for name, val in values.items():
+            self.records[name][index] = val
+
+        self.write_cursor += 1
+
+        # Drop the oldest records if the reader fell behind
+        if self.write_cursor - self.read_cursor > self.capacity:
+            self.read_cursor = self.write_cursor - self.capacity
+
+    def read(self) -> dict:
+        """
+        Get all the records not read yet and move the read cursor to the
+        write cursor.  Each column is one contiguous array.  If the records
+        wrap around the end of the buffer, the two slices are combined.
+        :return: Dictionary of field name to array of values.
+        """
+        start = self.read_cursor % self.capacity
+        count = self.write_cursor - self.read_cursor
+        self.read_cursor = self.write_cursor
+
+        if count == 0:
+            return {name: self.records[name][:0].copy() for name in self.names}
+
+        end = start + count
+        if end <= self.capacity:
+            return {name: np.ascontiguousarray(self.records[name][start:end]) for name in self.names}
+
+        end = end - self.capacity
+        return {name: np.concatenate((self.records[name][start:], self.records[name][:end])) for name in self.names}
@@ -0,0 +1,620 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from rti_python_plot.utils.query_cache import QueryCache
+from rti_python_plot.utils.bad_value_filter import filter_columns, sql_filter_case
+
+
+# Columns of the ensembles table used by the plots
+ENS_COLUMNS_VOLTAGE = ("dateTime", "Voltage")
+ENS_COLUMNS_STATUS = ("dateTime", "status")
+ENS_COLUMNS_HPR = ("dateTime", "heading", "pitch", "roll")
+ENS_COLUMNS_SOS_WATER_TEMP = ("dateTime", "waterTemp", "sos")
+ENS_COLUMNS_TEMP = ("dateTime", "waterTemp", "sysTemp")
+ENS_COLUMNS_PRESSURE = ("dateTime", "pressure", "xdcrDepth")
+
+# All the columns of the ensembles table used by the plots.  These are loaded
+# together, so the table is only scanned once for all the plots.
+ENS_PLOT_COLUMNS = ("dateTime", "Voltage", "status", "heading", "pitch", "roll",
+                    "waterTemp", "sos", "sysTemp", "pressure", "xdcrDepth")
+
+# Queries used by the plots
+# {where} is replaced with the WHERE clause of the QueryWindow
+QUERY_BT_RANGE = "SELECT dateTime, bottomtrack.rangeBeam0, bottomtrack.rangeBeam1, bottomtrack.rangeBeam2, bottomtrack.rangeBeam3  from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id {where};"
+QUERY_BT_BEAM_VEL = "SELECT dateTime, bottomtrack.beamVelBeam0, bottomtrack.beamVelBeam1, bottomtrack.beamVelBeam2, bottomtrack.beamVelBeam3  from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id {where};"
+QUERY_BT_VESSEL_SPEED = "SELECT dateTime, bottomtrack.vesselSpeed from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id {where};"
+QUERY_BT_VESSEL_DIR = "SELECT dateTime, bottomtrack.vesselDirection from bottomtrack INNER JOIN ensembles ON bottomtrack.ensIndex=ensembles.id {where};"
+QUERY_HEATMAP_BT_RANGE = 'SELECT ensembles.ensnum, ensembles.dateTime, ensembles.numbeams, ensembles.numbins, ' \
+                         'ensembles.binsize, ensembles.rangefirstbin, ' \
+                         'rangebeam0, rangebeam1, rangebeam2, rangebeam3, avgRange ' \
+                         'FROM ensembles ' \
+                         'INNER JOIN bottomtrack ON ensembles.id = bottomtrack.ensindex ' \
+                         '{where} ' \
+                         'ORDER BY ensembles.dateTime ASC, ensembles.id ASC;'
+QUERY_HEATMAP_MAG = 'SELECT ensembles.id AS ensId, ensembles.dateTime, ensembles.subsystemCode, ensembles.SubsystemConfig, ' \
+                    'earthMagDir.bin, ensembles.rangeFirstBin, ensembles.binSize, ensembles.isUpwardLooking, earthMagDir.mag ' \
+                    'FROM ensembles ' \
+                    'INNER JOIN earthMagDir ON ensembles.id = earthMagDir.ensindex ' \
+                    '{where} ' \
+                    'ORDER BY ensembles.dateTime ASC, ensembles.id ASC;'
+QUERY_ENS_COLUMNS = "SELECT {columns} FROM ensembles {where};"
+QUERY_ENS_PLOT_COLUMNS = QUERY_ENS_COLUMNS.format(columns=", ".join(ENS_PLOT_COLUMNS), where="{where}")
+QUERY_ENS_TIME_SPAN = "SELECT MIN(julianday(ensembles.dateTime)), MAX(julianday(ensembles.dateTime)) FROM ensembles {where};"
+
+# Queries of the plot datasets
+DATASET_QUERIES = {"BT Range": QUERY_BT_RANGE,
+                   "BT Beam Velocity": QUERY_BT_BEAM_VEL,
+                   "BT Vessel Speed": QUERY_BT_VESSEL_SPEED,
+                   "BT Vessel Direction": QUERY_BT_VESSEL_DIR,
+                   "Heatmap BT Range": QUERY_HEATMAP_BT_RANGE,
+                   "Heatmap Magnitude": QUERY_HEATMAP_MAG}
+
+# Indexes used by the plot queries
+# Index name, table and columns
+PLOT_INDEXES = [("idx_plot_bottomtrack_ensIndex", "bottomtrack", "ensIndex"),
+                ("idx_plot_earthMagDir_ensIndex", "earthMagDir", "ensIndex, bin, mag"),
+                ("idx_plot_ensembles_project_dateTime", "ensembles", "project_id, dateTime"),
+                ("idx_plot_ensembles_project_ensNum", "ensembles", "project_id, ensNum"),
+                ("idx_plot_ensembles_dateTime", "ensembles", "dateTime")]
+
+
+def check_column_name(column: str):
+    """
+    Verify the column name can be used in a query.
+    :param column: Column name.
+    """
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", column):
+        raise ValueError("Invalid column name: " + column)
+
+
+def create_bucket_query(query: str, columns, max_abs: float = None, bad_value: float = None) -> str:
+    """
+    Create the query to get the min, mean and max of the columns for each time bucket.
+    The GROUP BY has 3 parameters after the QueryWindow parameters:
+    the julianday of the first bucket, the size of a bucket in days and the last bucket.
+    :param query: SQL query with a {where} field and a dateTime column.
+    :param columns: Columns to summarize.
+    :param max_abs: Optional maximum absolute value.  Larger values are not included.
+    :param bad_value: Optional bad value.  This value is not included.
+    :return: SQL query with a {where} field.
+    """
+    # Summarize each column
+    select = ["MIN(dateTime) AS dateTime"]
+    for col in columns:
+        check_column_name(col)
+
+        # Remove the bad values, NULL is not included in the summary
+        value = sql_filter_case(col, max_abs, bad_value)
+        select += ["MIN(" + value + ") AS " + col + "_min",
+                   "AVG(" + value + ") AS " + col + "_mean",
+                   "MAX(" + value + ") AS " + col + "_max"]
+    select.append("COUNT(*) AS count")
+
+    # The last row is put in the last bucket
+    return "SELECT " + ", ".join(select) + \
+           " FROM (" + query.strip().rstrip(";") + ")" \
+           " GROUP BY MIN(CAST((julianday(dateTime) - ?) / ? AS INTEGER), ?)" \
+           " ORDER BY 1;"
+
+
+# Time buckets of the voltage plot, used to check the read_bucket_df() queries
+QUERY_ENS_VOLTAGE = QUERY_ENS_COLUMNS.format(columns=", ".join(ENS_COLUMNS_VOLTAGE), where="{where}")
+QUERY_ENS_VOLTAGE_BUCKETS = create_bucket_query(QUERY_ENS_VOLTAGE, ENS_COLUMNS_VOLTAGE[1:])
+
+# Queries checked by prepare_database()
+PLOT_QUERIES = dict(DATASET_QUERIES)
+PLOT_QUERIES.update({"Ensembles Columns": QUERY_ENS_PLOT_COLUMNS,
+                     "Ensembles Time Span": QUERY_ENS_TIME_SPAN,
+                     "Ensembles Buckets": QUERY_ENS_VOLTAGE_BUCKETS})
+
+
+class QueryWindow:
+    """
+    Select the ensembles to read from the database.
+    The ensembles can be limited by project, by a time window and by the
+    number of ensembles.  The filters are added to the WHERE clause of the
+    query, so only the ensembles selected are read.
+
+    Use next_page() for keyset pagination on ensembles.id.  Each page is the
+    next max_rows ensembles after the last id of the previous page.
+
+    window = QueryWindow(project_id=1, start="2020-01-01 00:00", end="2020-01-01 01:00")
+    fig, df = PlotlyPowerLine.get_sqlite_plot(db, window)
+    """
+
+    def __init__(self, project_id: int = None, start=None, end=None, max_rows: int = None, after_id: int = None):
+        """
+        Set the filters.  None will not filter.
+        :param project_id: Project id.
+        :param start: Start datetime (inclusive).
+        :param end: End datetime (inclusive).
+        :param max_rows: Maximum number of ensembles to read.
+        :param after_id: Only read the ensembles with an id greater than this id.
+        """
+        self.project_id = project_id
+        self.start = pd.Timestamp(start) if start is not None else None
+        self.end = pd.Timestamp(end) if end is not None else None
+        self.max_rows = max_rows
+        self.after_id = after_id
+
+    def key(self) -> tuple:
+        """
+        Get a key for the window.  Windows with the same filters have the same key.
+        :return: Tuple of the filters.
+        """
+        return self.project_id, self.start, self.end, self.max_rows, self.after_id
+
+    def _filters(self, table: str) -> tuple:
+        """
+        Create the filters on the ensembles table.
+        :param table: Name or alias of the ensembles table.
+        :return: List of the filters and list of the parameters.
+        """
+        filters = []
+        params = []
+        if self.project_id is not None:
+            filters.append(table + ".project_id = ?")
+            params.append(int(self.project_id))
+        if self.start is not None:
+            filters.append(table + ".dateTime >= ?")
+            params.append(self.start.isoformat(sep=' '))
+        if self.end is not None:
+            filters.append(table + ".dateTime <= ?")
+            params.append(self.end.isoformat(sep=' '))
+        if self.after_id is not None:
+            filters.append(table + ".id > ?")
+            params.append(int(self.after_id))
+
+        return filters, params
+
+    def where(self) -> tuple:
+        """
+        Create the WHERE clause.  If max_rows is set, the ensembles are limited
+        with a subquery, so the rows of the other tables of an ensemble are not split.
+        :return: WHERE clause and list of the parameters.
+        """
+        if self.max_rows is not None:
+            filters, params = self._filters("page")
+            sub_where = " WHERE " + " AND ".join(filters) if filters else ""
+            filters = ["ensembles.id IN (SELECT page.id FROM ensembles AS page" + sub_where + " ORDER BY page.id LIMIT ?)"]
+            params.append(int(self.max_rows))
+        else:
+            filters, params = self._filters("ensembles")
+
+        if not filters:
+            return "", []
+
+        return "WHERE " + " AND ".join(filters), params
+
+    def format(self, query: str, **kwargs) -> tuple:
+        """
+        Add the WHERE clause to the query.
+        :param query: Query with a {where} field.
+        :param kwargs: Other fields to set in the query.
+        :return: Query and list of the parameters.
+        """
+        where, params = self.where()
+        return query.format(where=where, **kwargs), params
+
+    def zoom(self, start=None, end=None) -> "QueryWindow":
+        """
+        Get a window for a smaller time range.  The other filters are the same.
+        :param start: Start datetime (inclusive).  None to keep the start of this window.
+        :param end: End datetime (inclusive).  None to keep the end of this window.
+        :return: Window of the time range within this window.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        if self.start is not None and (start is None or start < self.start):
+            start = self.start
+        if self.end is not None and (end is None or end > self.end):
+            end = self.end
+
+        return QueryWindow(self.project_id, start, end, self.max_rows, self.after_id)
+
+    def next_page(self, db) -> "QueryWindow":
+        """
+        Get the window for the next page of ensembles.
+        :param db: RtiSqliteDb.
+        :return: Window of the next page or None if there are no more ensembles.
+        """
+        query, params = self.format("SELECT MAX(ensembles.id) FROM ensembles {where};")
+        last_id = db.connection().execute(query, params).fetchone()[0]
+        if last_id is None:
+            return None
+
+        next_window = QueryWindow(self.project_id, self.start, self.end, self.max_rows, last_id)
+        query, params = next_window.format("SELECT COUNT(*) FROM (SELECT ensembles.id FROM ensembles {where} LIMIT 1);")
+        if db.connection().execute(query, params).fetchone()[0] == 0:
+            return None
+
+        return next_window
+
+
+class RtiSqliteDb:
+    """
+    Read only access to an RTI sqlite database file.
+    There is one object for each database file, use RtiSqliteDb.get() to get it.
+    Each thread gets its own cached connection, so the file is opened and the
+    schema is parsed only once per thread, and the sqlite page cache stays
+    warm between the plots.  sqlite caches the prepared statement of each
+    query on the connection.
+
+    db = RtiSqliteDb.get(db_file_path)
+    fig, df = PlotlyPowerLine.get_sqlite_plot(db)
+    """
+
+    # Database object for each file
+    _databases = dict()
+    _databases_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db):
+        """
+        Get the database object for the file.
+        :param db: File path to the sqlite db file or an RtiSqliteDb.
+        :return: Database object for the file.
+        """
+        if isinstance(db, RtiSqliteDb):
+            return db
+
+        db_file_path = os.path.abspath(db)
+        with cls._databases_lock:
+            if db_file_path not in cls._databases:
+                cls._databases[db_file_path] = RtiSqliteDb(db_file_path)
+            return cls._databases[db_file_path]
+
+    def __init__(self, db_file_path: str, cache_size_kb: int = 64 * 1024, mmap_size: int = 256 * 1024 * 1024):
+        """
+        Initialize the database.  The connections are opened when first used.
+        :param db_file_path: File path to the sqlite db file.
+        :param cache_size_kb: Size of the sqlite page cache for each connection in kilobytes.
+        :param mmap_size: Number of bytes of the file sqlite can memory map.
+        """
+        self.db_file_path = os.path.abspath(db_file_path)
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+
+        # Connection for each thread
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        # Optional persistent cache of the query results
+        self.query_cache = None
+
+        # Columns loaded from the ensembles table
+        # The columns are reloaded if the database changed
+        self._ens_columns = None
+        self._ens_columns_version = None
+        self._ens_columns_lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the read only connection for the current thread.
+        :return: sqlite connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Open the file read only
+            uri = "file:" + pathname2url(self.db_file_path) + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=128)
+
+            # Tune the connection for reading
+            conn.execute("PRAGMA query_only = ON;")
+            conn.execute("PRAGMA cache_size = -" + str(int(self.cache_size_kb)) + ";")
+            conn.execute("PRAGMA mmap_size = " + str(int(self.mmap_size)) + ";")
+
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+
+        return conn
+
+    def enable_cache(self, max_bytes: int = 512 * 1024 * 1024, cache_dir: str = None) -> QueryCache:
+        """
+        Store the query results in a persistent cache.  A query is only run
+        again if the database file changed.  This is useful for a database that
+        is no longer written, like an archived survey.
+        :param max_bytes: Maximum total size of the cached results in bytes.
+        :param cache_dir: Folder to store the results.  Default is a .cache folder next to the database file.
+        :return: Query cache.
+        """
+        self.query_cache = QueryCache(cache_dir or self.db_file_path + ".cache", max_bytes)
+        return self.query_cache
+
+    def read_df(self, query: str, params=None) -> DataFrame:
+        """
+        Run the query and get the result as a DataFrame.
+        If the cache is enabled, the cached result is used if the database did not change.
+        :param query: SQL query.
+        :param params: Optional query parameters.
+        :return: DataFrame of the result.
+        """
+        cache = self.query_cache
+        if cache is None:
+            return pd.read_sql_query(query, self.connection(), params=params)
+
+        key = cache.key(query, params, self.file_version())
+        df = cache.get(key)
+        if df is None:
+            df = pd.read_sql_query(query, self.connection(), params=params)
+            cache.put(key, df)
+
+        return df
+
+    @contextmanager
+    def read_transaction(self):
+        """
+        Run all the queries within the block on one snapshot of the database.
+        The writer can keep adding data while the transaction is open if the
+        database is in WAL mode.  Keep the block short, because an open read
+        transaction stops a WAL checkpoint from completing.
+
+        with db.read_transaction():
+            df_ens = db.read_df(query1)
+            df_bt = db.read_df(query2)
+
+        :return: sqlite connection.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            # Already in a transaction, so use the same snapshot
+            yield conn
+            return
+
+        conn.execute("BEGIN DEFERRED;")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT;")
+
+    def read_window_df(self, query: str, window: QueryWindow = None) -> DataFrame:
+        """
+        Run the query for the ensembles in the window and get the result as a DataFrame.
+        :param query: SQL query with a {where} field.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :return: DataFrame of the result.
+        """
+        query, params = (window or QueryWindow()).format(query)
+        return self.read_df(query, params)
+
+    def file_version(self) -> tuple:
+        """
+        Get the version of the database file.  This changes when the database is changed.
+        The write ahead log file is included, because a commit may only change that file.
+        :return: Modified time and size of the database file and the write ahead log file.
+        """
+        version = []
+        for file_path in (self.db_file_path, self.db_file_path + "-wal"):
+            try:
+                stat = os.stat(file_path)
+                version += [stat.st_mtime_ns, stat.st_size]
+            except OSError:
+                version += [0, 0]
+
+        return tuple(version)
+
+    def time_range(self, window: QueryWindow = None) -> tuple:
+        """
+        Get the first and last datetime of the ensembles.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :return: First and last datetime.  None if there are no ensembles.
+        """
+        query, params = (window or QueryWindow()).format("SELECT MIN(ensembles.dateTime), MAX(ensembles.dateTime) FROM ensembles {where};")
+        first, last = self.connection().execute(query, params).fetchone()
+        if first is None:
+            return None
+
+        return pd.Timestamp(first), pd.Timestamp(last)
+
+    def read_bucket_df(self, query: str, columns, num_buckets: int, window: QueryWindow = None, max_abs: float = None, bad_value: float = None) -> DataFrame:
+        """
+        Run the query and get the min, mean and max of the columns for each time bucket.
+        The time window is split into num_buckets equal time buckets, and the
+        GROUP BY is done in SQL, so only one row for each bucket is returned.
+        The query must have a dateTime column.
+        :param query: SQL query with a {where} field.
+        :param columns: Columns to summarize.
+        :param num_buckets: Number of time buckets.  Usually the width of the plot in pixels.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param max_abs: Optional maximum absolute value.  Larger values are not included.
+        :param bad_value: Optional bad value.  This value is not included.
+        :return: DataFrame with the dateTime of the first row of each bucket, <column>_min, <column>_mean, <column>_max and count.
+        """
+        columns = list(columns)
+        window = window or QueryWindow()
+        bucket_query = create_bucket_query(query, columns, max_abs, bad_value)
+
+        # Get the time span of the window
+        span_query, params = window.format(QUERY_ENS_TIME_SPAN)
+        first_day, last_day = self.connection().execute(span_query, params).fetchone()
+        if first_day is None:
+            return DataFrame(columns=["dateTime"] + [col + "_" + stat for col in columns for stat in ("min", "mean", "max")] + ["count"])
+
+        # Size of each bucket in days
+        num_buckets = max(1, int(num_buckets))
+        bucket_days = max((last_day - first_day) / num_buckets, 1e-9)
+
+        bucket_query, params = window.format(bucket_query)
+        return self.read_df(bucket_query, params + [first_day, bucket_days, num_buckets - 1])
+
+    def read_filtered_df(self, query: str, columns, window: QueryWindow = None, max_abs: float = None, bad_value: float = None, sql_filter: bool = True) -> DataFrame:
+        """
+        Run the query and replace the bad values of the columns with NaN.
+        The query must have a dateTime column.  Only the dateTime and the columns are returned.
+        :param query: SQL query with a {where} field.
+        :param columns: Columns to filter.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param max_abs: Optional maximum absolute value.  Larger values are bad.
+        :param bad_value: Optional bad value.  Ex: Ensemble.BadVelocity
+        :param sql_filter: Filter the values in the SQL query.  If False, the values are filtered with NumPy.
+        :return: DataFrame of the dateTime and the filtered columns.
+        """
+        columns = list(columns)
+        for col in columns:
+            check_column_name(col)
+
+        if sql_filter:
+            # The bad values are NULL in the result
+            inner_query, params = (window or QueryWindow()).format(query)
+            select = ["dateTime"] + [sql_filter_case(col, max_abs, bad_value) + " AS " + col for col in columns]
+            df = self.read_df("SELECT " + ", ".join(select) + " FROM (" + inner_query.strip().rstrip(";") + ");", params)
+            df[columns] = df[columns].astype(np.float64)
+            return df
+
+        df = self.read_window_df(query, window)[["dateTime"] + columns]
+        return filter_columns(df, columns, max_abs, bad_value)
+
+    def ensembles_buckets(self, columns, num_buckets: int, window: QueryWindow = None) -> DataFrame:
+        """
+        Get the min, mean and max of the ensembles table columns for each time bucket.
+        :param columns: Columns to get.  The dateTime column is always included.
+        :param num_buckets: Number of time buckets.  Usually the width of the plot in pixels.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :return: DataFrame of the buckets.  See read_bucket_df().
+        """
+        columns = [col for col in columns if col != "dateTime"]
+        for col in columns:
+            check_column_name(col)
+
+        query = QUERY_ENS_COLUMNS.format(columns=", ".join(["dateTime"] + columns), where="{where}")
+        return self.read_bucket_df(query, columns, num_buckets, window)
+
+    def ensembles_columns(self, columns, window: QueryWindow = None) -> DataFrame:
+        """
+        Get the columns from the ensembles table.  The first call loads all the
+        ENS_PLOT_COLUMNS and the requested columns in a single scan of the table.
+        The following calls for the same window get the columns from the loaded
+        data, until the database file is changed.
+        :param columns: Columns to get.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :return: DataFrame of the columns.
+        """
+        columns = list(columns)
+        for col in columns:
+            check_column_name(col)
+
+        window = window or QueryWindow()
+
+        with self._ens_columns_lock:
+            version = (self.file_version(), window.key())
+            loaded = self._ens_columns
+            if loaded is None or version != self._ens_columns_version or not set(columns).issubset(loaded.columns):
+                # Load the union of the columns in one scan
+                load_columns = list(ENS_PLOT_COLUMNS)
+                if loaded is not None and version == self._ens_columns_version:
+                    load_columns += [col for col in loaded.columns if col not in load_columns]
+                load_columns += [col for col in columns if col not in load_columns]
+
+                try:
+                    query, params = window.format(QUERY_ENS_COLUMNS, columns=", ".join(load_columns))
+                    self._ens_columns = self.read_df(query, params)
+                    self._ens_columns_version = version
+                except pd.errors.DatabaseError:
+                    # A column is missing in this database, so only get the requested columns
+                    query, params = window.format(QUERY_ENS_COLUMNS, columns=", ".join(columns))
+                    return self.read_df(query, params)
+
+            return self._ens_columns[columns]
+
+    def query_plan(self, query: str, window: QueryWindow = None, conn: sqlite3.Connection = None) -> list:
+        """
+        Get the query plan of the query.
+        :param query: SQL query with a {where} field.
+        :param window: Ensembles to read.  None to read all the ensembles.
+        :param conn: Optional connection to use.  Default is the read only connection.
+        :return: List of the query plan steps.
+        """
+        conn = conn or self.connection()
+        query, params = (window or QueryWindow()).format(query)
+
+        # The plan does not depend on the values, so set any other parameters to NULL
+        # Ex: The time bucket parameters of create_bucket_query()
+        params = params + [None] * max(0, query.count("?") - len(params))
+        return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()]
+
+    def prepare_database(self, window: QueryWindow = None) -> dict:
+        """
+        Create the indexes used by the plot queries, if they do not exist.
+        This opens a separate connection that can write to the database.
+        The query plan of each plot query is checked before and after, so
+        the report shows if the query still scans a whole table or uses a
+        temporary B-tree to sort.  This includes the ensembles table queries,
+        like the time buckets of read_bucket_df().  This can be run multiple times.
+        :param window: Window used to check the query plans.  Ex: QueryWindow(project_id=1)
+        :return: Dictionary with the list of indexes created and a DataFrame of the query plans before and after.
+        """
+        conn = sqlite3.connect(self.db_file_path)
+        try:
+            tables = {row[0].lower() for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")}
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index';")}
+
+            # Get the query plans before
+            before = dict()
+            for name, query in PLOT_QUERIES.items():
+                try:
+                    before[name] = self.query_plan(query, window, conn)
+                except sqlite3.Error as ex:
+                    before[name] = ["ERROR: " + str(ex)]
+
+            # Create the missing indexes
+            created = []
+            for index_name, table, columns in PLOT_INDEXES:
+                if table.lower() in tables and index_name not in indexes:
+                    try:
+                        conn.execute("CREATE INDEX IF NOT EXISTS " + index_name + " ON " + table + " (" + columns + ");")
+                        created.append(index_name)
+                    except sqlite3.Error:
+                        # The table does not have the columns
+                        pass
+
+            if created:
+                conn.execute("ANALYZE;")
+            conn.commit()
+
+            # Get the query plans after
+            rows = []
+            for name, query in PLOT_QUERIES.items():
+                try:
+                    after = self.query_plan(query, window, conn)
+                except sqlite3.Error as ex:
+                    after = ["ERROR: " + str(ex)]
+                rows.append([name, "\n".join(before[name]), "\n".join(after)])
+        finally:
+            conn.close()
+
+        return {"created": created, "plans": DataFrame(rows, columns=["query", "before", "after"])}
+
+    def release_connection(self):
+        """
+        Close the connection of the current thread.
+        Call this before a worker thread exits, so its connection is not kept open.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+
+        self._local.conn = None
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        """
+        Close all the connections.  New connections are opened if the database is used again.
+        """
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+        self._local = threading.local()
+        self._ens_columns = None
@@ -0,0 +1,70 @@
+from rti_python_plot.utils.rti_sqlite_db import RtiSqliteDb, QueryWindow, DATASET_QUERIES, QUERY_ENS_PLOT_COLUMNS
+
+
+# Queries polled by default
+FOLLOW_QUERIES = dict({"Ensembles": QUERY_ENS_PLOT_COLUMNS}, **DATASET_QUERIES)
+
+
+class SqliteTailFollower:
+    """
+    Follow an sqlite database that is still being written.
+    The follower remembers the last ensembles.id read.  Each poll only reads
+    the ensembles added since the last poll, with the rows joined to them.
+    The new rows can then be added to the plots, instead of reading the
+    whole database again.
+
+    All the queries of a poll are run in one read transaction, so they see
+    the same ensembles.  In WAL mode the reader never blocks the writer.
+    The writer should add an ensemble and all its rows in one transaction,
+    or a poll could read the ensemble before all its rows are written.
+
+    follower = SqliteTailFollower(db_file_path, {"BT Range": QUERY_BT_RANGE})
+    new_data = follower.poll()
+    if "BT Range" in new_data:
+        extend_traces(fig, new_data["BT Range"], "dateTime", ["rangeBeam0", "rangeBeam1"])
+    """
+
+    def __init__(self, db_file_path, queries: dict = None, project_id: int = None, last_id: int = None):
+        """
+        Initialize the follower.
+        :param db_file_path: File path to the sqlite db file or an RtiSqliteDb.
+        :param queries: Name and query to poll.  The query must have a {where} field.  Default is FOLLOW_QUERIES.
+        :param project_id: Only follow this project.  None to follow all the projects.
+        :param last_id: Last ensembles.id already read.  None to start from the first ensemble.
+        """
+        self.db = RtiSqliteDb.get(db_file_path)
+        self.queries = dict(queries) if queries else dict(FOLLOW_QUERIES)
+        self.project_id = project_id
+        self.last_id = last_id
+
+    def skip_to_end(self):
+        """
+        Skip all the ensembles already in the database.
+        The next poll will only read the ensembles added after this call.
+        """
+        window = QueryWindow(self.project_id, after_id=self.last_id)
+        query, params = window.format("SELECT MAX(ensembles.id) FROM ensembles {where};")
+        last_id = self.db.connection().execute(query, params).fetchone()[0]
+        if last_id is not None:
+            self.last_id = last_id
+
+    def poll(self, max_rows: int = None) -> dict:
+        """
+        Read the ensembles added since the last poll.
+        :param max_rows: Maximum number of ensembles to read.  None to read all the new ensembles.
+        :return: Name of the query and DataFrame of the new rows.  Empty if there are no new ensembles.
+        """
+        window = QueryWindow(self.project_id, max_rows=max_rows, after_id=self.last_id)
+
+        with self.db.read_transaction() as conn:
+            # Get the last ensemble of this poll
+            query, params = window.format("SELECT MAX(ensembles.id) FROM ensembles {where};")
+            last_id = conn.execute(query, params).fetchone()[0]
+            if last_id is None:
+                return {}
+
+            # Read the rows of the same ensembles from each table
+            new_data = {name: self.db.read_window_df(query, window) for name, query in self.queries.items()}
+
+        self.last_id = last_id
+        return new_data